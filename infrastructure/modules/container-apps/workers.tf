@@ -0,0 +1,85 @@
+module "relay_sender" {
+
+  providers = {
+    azurerm     = azurerm
+    azurerm.hub = azurerm.hub
+  }
+  source                       = "../dtos-devops-templates/infrastructure/modules/container-app"
+  name                         = "${var.app_short_name}-relay-${var.environment}"
+  container_app_environment_id = var.container_app_environment_id
+
+  # alerts
+  action_group_id        = var.action_group_id
+  enable_alerting        = var.enable_alerting
+  alert_memory_threshold = 80
+  alert_cpu_threshold    = 90
+
+  resource_group_name = azurerm_resource_group.main.name
+  # The relay shared access keys are read from the app key vault, as in the web app
+  fetch_secrets_from_app_key_vault = var.fetch_secrets_from_app_key_vault
+  infra_key_vault_name             = var.infra_key_vault_name
+  infra_key_vault_rg               = var.infra_key_vault_rg
+  app_key_vault_id                 = var.app_key_vault_id
+  docker_image                     = var.docker_image
+  user_assigned_identity_ids       = var.deploy_database_as_container ? [] : [module.db_connect_identity[0].id]
+  environment_variables = merge(
+    local.common_env,
+    var.deploy_database_as_container ? local.container_db_env : local.azure_db_env
+  )
+  secret_variables = merge(
+    { APPLICATIONINSIGHTS_CONNECTION_STRING = var.app_insights_connection_string },
+    var.deploy_database_as_container ? { DATABASE_PASSWORD = resource.random_password.admin_password[0].result } : {}
+  )
+
+  # Sends the gateway actions queued by the web app to the relays. It polls
+  # the database rather than serving requests, so it must not scale to zero.
+  container_command = ["python", "manage.py", "run_relay_sender"]
+  min_replicas      = 1
+  memory            = var.container_memory
+}
+
+module "dicom_renderer" {
+
+  providers = {
+    azurerm     = azurerm
+    azurerm.hub = azurerm.hub
+  }
+  source                       = "../dtos-devops-templates/infrastructure/modules/container-app"
+  name                         = "${var.app_short_name}-render-${var.environment}"
+  container_app_environment_id = var.container_app_environment_id
+
+  # alerts
+  action_group_id        = var.action_group_id
+  enable_alerting        = var.enable_alerting
+  alert_memory_threshold = 80
+  alert_cpu_threshold    = 90
+
+  resource_group_name = azurerm_resource_group.main.name
+  docker_image        = var.docker_image
+  user_assigned_identity_ids = flatten([
+    [module.azure_blob_storage_identity.id],
+    var.deploy_database_as_container ? [] : [module.db_connect_identity[0].id]
+  ])
+  environment_variables = merge(
+    local.common_env,
+    {
+      # The DICOM files and their previews are read from and written to blob storage
+      BLOB_MI_CLIENT_ID    = module.azure_blob_storage_identity.client_id
+      STORAGE_ACCOUNT_NAME = replace(lower(local.storage_account_name), "-", "")
+    },
+    var.deploy_database_as_container ? local.container_db_env : local.azure_db_env
+  )
+  secret_variables = merge(
+    { APPLICATIONINSIGHTS_CONNECTION_STRING = var.app_insights_connection_string },
+    var.deploy_database_as_container ? { DATABASE_PASSWORD = resource.random_password.admin_password[0].result } : {}
+  )
+
+  # Renders previews for the DerivativeJob queue filled by DICOM uploads, in
+  # a pool of one process per CPU. It polls the database rather than serving
+  # requests, so it must not scale to zero.
+  container_command = ["python", "manage.py", "render_dicom_derivatives"]
+  min_replicas      = 1
+  memory            = var.container_memory
+
+  depends_on = [module.blob_storage_role_assignment]
+}
@@ -1,7 +1,10 @@
 import { ConfigurableComponent, ElementError } from 'nhsuk-frontend'
 
 /**
- * Connect to an SSE endpoint and update the image container when new images arrive.
+ * Connect to an SSE endpoint and add images to the grid as they arrive.
+ *
+ * Each event describes one image, so only new and changed images are sent.
+ * The stream resumes from the last event received when it reconnects.
  *
  * @augments {ConfigurableComponent<ImageStreamConfig>}
  */
@@ -27,15 +30,25 @@ export class ImageStream extends ConfigurableComponent {
   }
 
   connect() {
-    this.eventSource = new EventSource(this.streamUrl)
+    const { lastEventId } = this.config
 
-    this.eventSource.addEventListener(
-      'images',
-      /** @param {MessageEvent<string>} event */ (event) => {
-        this.$root.innerHTML = event.data
-      }
+    // Skip images already on the page. Once an event has been received,
+    // browsers send its ID in the Last-Event-ID header when reconnecting.
+    this.eventSource = new EventSource(
+      lastEventId
+        ? `${this.streamUrl}?last_event_id=${lastEventId}`
+        : this.streamUrl
     )
 
+    for (const eventName of ['image-added', 'image-ready']) {
+      this.eventSource.addEventListener(
+        eventName,
+        /** @param {MessageEvent<string>} event */ (event) => {
+          this.updateImage(JSON.parse(event.data))
+        }
+      )
+    }
+
     this.eventSource.addEventListener('error', () => {
       console.warn('ImageStream: SSE connection error, reconnecting...')
     })
@@ -48,6 +61,85 @@ export class ImageStream extends ConfigurableComponent {
     }
   }
 
+  /**
+   * Add an image to its view, or replace it if it's already there
+   *
+   * @param {ImageEvent} image - Image from the stream
+   */
+  updateImage({ id, view, html }) {
+    const $view = this.$root.querySelector(`[data-image-view="${view}"]`)
+    const $list = $view?.querySelector('[data-image-list]')
+    if (!$view || !$list) {
+      return
+    }
+
+    const $template = document.createElement('template')
+    $template.innerHTML = html.trim()
+    const $image = $template.content.firstElementChild
+    if (!$image) {
+      return
+    }
+
+    const $existing = $list.querySelector(`[data-image-id="${id}"]`)
+    if ($existing) {
+      $existing.replaceWith($image)
+    } else {
+      const $next = Array.from($list.children).find(
+        ($child) => compareImages($image, $child) < 0
+      )
+      $list.insertBefore($image, $next ?? null)
+    }
+
+    $view.querySelector('[data-image-placeholder]')?.setAttribute('hidden', '')
+    $list.removeAttribute('hidden')
+
+    this.numberImages(view, $list)
+    this.updateCounts()
+  }
+
+  /**
+   * Number the images in a view in order, as the page does when rendered
+   *
+   * @param {string} view - Laterality and view, such as RCC
+   * @param {Element} $list - Images in the view
+   */
+  numberImages(view, $list) {
+    const $images = $list.querySelectorAll('[data-image-id]')
+
+    $images.forEach(($image, index) => {
+      const $img = $image.querySelector('img')
+      if ($img) {
+        $img.alt = `${view} view (${index + 1} of ${$images.length})`
+        $img.dataset.testid = `mammogram-image-${view}-${index + 1}`
+      }
+    })
+
+    const $count = this.$root.querySelector(
+      `[data-image-view-count="${view}"]`
+    )
+    if ($count instanceof HTMLInputElement) {
+      $count.value = `${$images.length}`
+    }
+  }
+
+  updateCounts() {
+    const count = this.$root.querySelectorAll('[data-image-id]').length
+
+    const $count = this.$root.querySelector('[data-image-count]')
+    if ($count) {
+      $count.textContent = `${count}`
+    }
+
+    const $noun = this.$root.querySelector('[data-image-count-noun]')
+    if ($noun) {
+      $noun.textContent = count === 1 ? 'image' : 'images'
+    }
+
+    this.$root.querySelector('[data-images-received]')?.removeAttribute('hidden')
+    this.$root.querySelector('[data-no-images]')?.setAttribute('hidden', '')
+    this.$root.querySelector('[data-image-cards]')?.removeAttribute('hidden')
+  }
+
   /**
    * Name for the component used when initialising using data-module attributes
    */
@@ -70,16 +162,55 @@ export class ImageStream extends ConfigurableComponent {
    */
   static schema = Object.freeze({
     properties: {
-      streamUrl: { type: 'string' }
+      streamUrl: { type: 'string' },
+      lastEventId: { type: 'number' }
     }
   })
 }
 
+/**
+ * Sort images by series then instance number, with unnumbered images last
+ *
+ * @param {Element} $a - Image element
+ * @param {Element} $b - Image element
+ * @returns {number} Negative if $a comes first
+ */
+function compareImages($a, $b) {
+  for (const key of ['seriesNumber', 'instanceNumber']) {
+    const a = sortValue($a, key)
+    const b = sortValue($b, key)
+    if (a !== b) {
+      return a - b
+    }
+  }
+  return 0
+}
+
+/**
+ * @param {Element} $image - Image element
+ * @param {string} key - Data attribute name
+ * @returns {number} Number from the data attribute, or Infinity if unset
+ */
+function sortValue($image, key) {
+  const value = $image instanceof HTMLElement ? $image.dataset[key] : ''
+  return value ? Number(value) : Infinity
+}
+
 /**
  * Image stream config
  *
  * @typedef {object} ImageStreamConfig
  * @property {string} [streamUrl] - The SSE endpoint URL for streaming images
+ * @property {number} [lastEventId] - Revision of the newest image on the page
+ */
+
+/**
+ * Image from the stream
+ *
+ * @typedef {object} ImageEvent
+ * @property {string} id - Image ID
+ * @property {string} view - Laterality and view, such as RCC
+ * @property {string} html - The image's thumbnail
  */
 
 /**
@@ -65,23 +65,126 @@ describe('ImageStream', () => {
     )
   })
 
-  it('updates innerHTML when receiving an images event', () => {
+  it('resumes from the last event ID on the page', () => {
     document.body.innerHTML = `
-      <div data-module="${ImageStream.moduleName}" data-stream-url="/api/images/stream">
+      <div data-module="${ImageStream.moduleName}" data-stream-url="/api/images/stream" data-last-event-id="7">
         <p>No images yet</p>
       </div>
     `
 
     createAll(ImageStream)
 
-    const container = document.querySelector(
-      `[data-module="${ImageStream.moduleName}"]`
+    expect(MockEventSource).toHaveBeenCalledWith(
+      '/api/images/stream?last_event_id=7'
     )
+  })
+
+  describe('image events', () => {
+    /** @type {HTMLElement} */
+    let container
+
+    /**
+     * @param {string} id - Image ID
+     * @param {object} [options] - Image options
+     * @param {number} [options.instance] - Instance number
+     * @param {boolean} [options.ready] - Whether the previews are rendered
+     * @returns {string} Thumbnail HTML, as sent by the stream
+     */
+    function thumbnail(id, { instance = 1, ready = true } = {}) {
+      return `
+        <div data-image-id="${id}" data-series-number="1" data-instance-number="${instance}"${ready ? '' : ' hidden'}>
+          ${ready ? `<img src="/dicom/${id}.jpeg" alt="">` : ''}
+        </div>
+      `
+    }
+
+    /**
+     * @param {string} eventName - SSE event name
+     * @param {string} id - Image ID
+     * @param {object} [options] - Image options
+     */
+    function receive(eventName, id, options) {
+      eventListeners[eventName]({
+        data: JSON.stringify({ id, view: 'RCC', html: thumbnail(id, options) })
+      })
+    }
+
+    beforeEach(() => {
+      document.body.innerHTML = `
+        <div data-module="${ImageStream.moduleName}" data-stream-url="/api/images/stream">
+          <p data-images-received hidden>
+            <span data-image-count>0</span> <span data-image-count-noun>images</span> received
+          </p>
+          <p data-no-images>No images yet</p>
+          <div data-image-cards hidden>
+            <div data-image-view="RCC">
+              <div data-image-placeholder>No image</div>
+              <div data-image-list hidden></div>
+            </div>
+          </div>
+          <input type="hidden" name="rcc_count" data-image-view-count="RCC" value="0">
+        </div>
+      `
+
+      createAll(ImageStream)
+
+      container = document.querySelector(
+        `[data-module="${ImageStream.moduleName}"]`
+      )
+    })
 
-    const newContent = '<div class="image-grid"><img src="/img/1.jpg"></div>'
-    eventListeners['images']({ data: newContent })
+    it('adds new images to their view', () => {
+      receive('image-ready', 'a', { instance: 2 })
+
+      expect(container.querySelector('[data-image-id="a"]')).not.toBeNull()
+      expect(container.querySelector('[data-image-list]')).not.toHaveAttribute(
+        'hidden'
+      )
+      expect(
+        container.querySelector('[data-image-placeholder]')
+      ).toHaveAttribute('hidden')
+      expect(container.querySelector('[data-image-cards]')).not.toHaveAttribute(
+        'hidden'
+      )
+      expect(container.querySelector('[data-no-images]')).toHaveAttribute(
+        'hidden'
+      )
+      expect(container.querySelector('[data-image-count]').textContent).toBe(
+        '1'
+      )
+      expect(
+        container.querySelector('[data-image-count-noun]').textContent
+      ).toBe('image')
+      expect(container.querySelector('[name="rcc_count"]').value).toBe('1')
+    })
+
+    it('keeps images in order and numbers them', () => {
+      receive('image-ready', 'b', { instance: 2 })
+      receive('image-ready', 'a', { instance: 1 })
+
+      const images = container.querySelectorAll('[data-image-id] img')
+      expect(Array.from(images, (img) => img.dataset.testid)).toEqual([
+        'mammogram-image-RCC-1',
+        'mammogram-image-RCC-2'
+      ])
+      expect(images[0].closest('[data-image-id]').dataset.imageId).toBe('a')
+      expect(images[1].alt).toBe('RCC view (2 of 2)')
+      expect(container.querySelector('[data-image-count]').textContent).toBe(
+        '2'
+      )
+    })
 
-    expect(container.innerHTML).toBe(newContent)
+    it('replaces an image once its previews are ready', () => {
+      receive('image-added', 'a', { ready: false })
+      receive('image-ready', 'a')
+
+      const images = container.querySelectorAll('[data-image-id="a"]')
+      expect(images).toHaveLength(1)
+      expect(images[0]).not.toHaveAttribute('hidden')
+      expect(container.querySelector('[data-image-count]').textContent).toBe(
+        '1'
+      )
+    })
   })
 
   it('logs a warning on connection error', () => {
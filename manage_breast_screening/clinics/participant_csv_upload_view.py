@@ -6,13 +6,12 @@ from functools import cached_property
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.db import transaction
 from django.http import Http404
 from django.shortcuts import redirect
 from django.utils import timezone
 from django.views.generic.edit import FormView
 
-from manage_breast_screening.core.services.auditor import Auditor
+from manage_breast_screening.core.services.auditor import Auditor, buffered_audits
 from manage_breast_screening.participants.models import (
     ParticipantAddress,
 )
@@ -241,7 +240,8 @@ class ParticipantCsvInsertService:
     def insert_data(self, transformed_rows):
         clinic_date = self.clinic.starts_at.date()
 
-        with transaction.atomic():
+        # Six records are audited for each row, so write them together
+        with buffered_audits():
             for row in transformed_rows:
                 participant = Participant(
                     first_name=row["first_name"],
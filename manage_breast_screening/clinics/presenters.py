@@ -2,8 +2,10 @@ from functools import cached_property
 
 from django.urls import reverse
 
+from ..auth.models import Permission
 from ..core.utils.date_formatting import format_date, format_time_range
 from ..core.utils.string_formatting import sentence_case
+from ..gateway.models import Relay
 from ..mammograms.presenters import AppointmentPresenter
 from .models import ClinicStatus
 
@@ -63,6 +65,15 @@ class ClinicPresenter:
     def heading(self):
         return f"{self.risk_type} screening clinic"
 
+    def can_send_worklist(self, user):
+        """Whether the user can send the remaining appointments to the modalities."""
+        return (
+            self._clinic.current_status.state
+            in (ClinicStatus.SCHEDULED, ClinicStatus.IN_PROGRESS)
+            and user.has_perm(Permission.DO_MAMMOGRAM_APPOINTMENT)
+            and Relay.for_setting(self._clinic.setting_id) is not None
+        )
+
 
 class AppointmentListPresenter:
     def __init__(self, clinic_pk, appointments, filter, counts_by_filter):
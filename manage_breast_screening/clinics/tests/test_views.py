@@ -1,10 +1,21 @@
+from unittest.mock import patch
+
 import pytest
+from django.db import IntegrityError
 from django.urls import reverse
+from pytest_django.asserts import assertRedirects
 
 from manage_breast_screening.conftest import force_mbs_login
+from manage_breast_screening.gateway.models import GatewayAction
+from manage_breast_screening.gateway.tests.factories import RelayFactory
+from manage_breast_screening.gateway.worklist_item_service import WorklistItemService
+from manage_breast_screening.participants.models.appointment import (
+    AppointmentStatusNames,
+)
+from manage_breast_screening.participants.tests.factories import AppointmentFactory
 from manage_breast_screening.users.tests.factories import UserFactory
 
-from .factories import ProviderFactory, UserAssignmentFactory
+from .factories import ClinicFactory, ProviderFactory, UserAssignmentFactory
 
 
 class TestSelectProvider:
@@ -174,3 +185,68 @@ class TestProviderSettings:
         assert response.status_code == 302
         config.refresh_from_db()
         assert config.manual_image_collection is True
+
+
+@pytest.mark.django_db
+class TestSendClinicWorklist:
+    @pytest.fixture
+    def clinic(self, clinical_user_client):
+        clinic = ClinicFactory(setting__provider=clinical_user_client.current_provider)
+        RelayFactory(setting=clinic.setting)
+        return clinic
+
+    def test_creates_actions_for_remaining_appointments(
+        self, clinical_user_client, clinic
+    ):
+        appointment = AppointmentFactory(
+            clinic_slot__clinic=clinic,
+            current_status=AppointmentStatusNames.SCHEDULED,
+        )
+
+        response = clinical_user_client.http.post(
+            reverse("clinics:send_clinic_worklist", kwargs={"pk": clinic.pk})
+        )
+
+        assertRedirects(
+            response, reverse("clinics:show_clinic", kwargs={"pk": clinic.pk})
+        )
+        assert GatewayAction.objects.get().appointment == appointment
+
+    def test_shows_an_error_when_sending_fails(self, clinical_user_client, clinic):
+        with patch.object(
+            WorklistItemService, "create_for_clinic", side_effect=IntegrityError
+        ):
+            response = clinical_user_client.http.post(
+                reverse("clinics:send_clinic_worklist", kwargs={"pk": clinic.pk}),
+                follow=True,
+            )
+
+        assert response.status_code == 200
+        assert "could not be sent to the modality worklist" in response.text
+
+    def test_requires_clinical_role(self, administrative_user_client):
+        clinic = ClinicFactory(
+            setting__provider=administrative_user_client.current_provider
+        )
+
+        response = administrative_user_client.http.post(
+            reverse("clinics:send_clinic_worklist", kwargs={"pk": clinic.pk})
+        )
+
+        assert response.status_code == 403
+
+    def test_shows_button_when_clinic_has_a_relay(self, clinical_user_client, clinic):
+        response = clinical_user_client.http.get(
+            reverse("clinics:show_clinic", kwargs={"pk": clinic.pk})
+        )
+
+        assert "Send remaining appointments to modalities" in response.text
+
+    def test_hides_button_without_a_relay(self, clinical_user_client):
+        clinic = ClinicFactory(setting__provider=clinical_user_client.current_provider)
+
+        response = clinical_user_client.http.get(
+            reverse("clinics:show_clinic", kwargs={"pk": clinic.pk})
+        )
+
+        assert "Send remaining appointments to modalities" not in response.text
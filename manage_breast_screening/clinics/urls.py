@@ -58,6 +58,11 @@ urlpatterns = [
         name="list_clinic_appointments_complete",
         kwargs={"filter": "complete"},
     ),
+    path(
+        "<uuid:pk>/send-worklist/",
+        views.send_clinic_worklist,
+        name="send_clinic_worklist",
+    ),
     path(
         "<uuid:pk>/upload-csv/",
         participant_csv_upload_view.ParticipantCsvUploadView.as_view(),
@@ -1,3 +1,5 @@
+import logging
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, render
@@ -8,12 +10,15 @@ from manage_breast_screening.auth.models import Permission
 
 from ..core.decorators import current_provider_exempt
 from ..core.utils.relative_redirects import extract_relative_redirect_url
+from ..gateway.worklist_item_service import WorklistItemService
 from ..participants.models import Appointment
 from .forms import UpdateProviderSettingsForm
 from .models import Clinic
 from .presenters import AppointmentListPresenter, ClinicPresenter, ClinicsPresenter
 from .services import get_user_providers_with_roles
 
+logger = logging.getLogger(__name__)
+
 
 def list_clinics(request, filter="today"):
     provider = request.user.current_provider
@@ -57,6 +62,35 @@ def list_clinic_appointments(request, pk, filter="remaining"):
     )
 
 
+@require_http_methods(["POST"])
+@permission_required(Permission.DO_MAMMOGRAM_APPOINTMENT, raise_exception=True)
+def send_clinic_worklist(request, pk):
+    provider = request.user.current_provider
+    clinic = provider.clinics.get(pk=pk)
+
+    try:
+        actions = WorklistItemService.create_for_clinic(clinic)
+    except Exception:
+        logger.exception("Failed to send the worklist for clinic %s", clinic.pk)
+        messages.info(
+            request,
+            "The appointments could not be sent to the modality worklist. Try again.",
+        )
+        return redirect("clinics:show_clinic", pk=pk)
+
+    if actions:
+        messages.success(
+            request,
+            f"Sending {len(actions)} appointments to the modality worklist.",
+        )
+    else:
+        messages.info(
+            request, "All remaining appointments are already on the modality worklist."
+        )
+
+    return redirect("clinics:show_clinic", pk=pk)
+
+
 @current_provider_exempt
 @login_required
 def select_provider(request):
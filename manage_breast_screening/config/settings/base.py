@@ -187,6 +187,13 @@ if DJANGO_ENV != "production":
                 "azure_container": "dicom",
             },
         }
+        audit_archive_storage_options = {
+            "BACKEND": "storages.backends.azure_storage.AzureStorage",
+            "OPTIONS": {
+                "connection_string": environ.get("BLOB_STORAGE_CONNECTION_STRING"),
+                "azure_container": "audit-archive",
+            },
+        }
     else:
         # In non-production environments without a connection string, use local file storage
         dicom_storage_options = {
@@ -196,6 +203,10 @@ if DJANGO_ENV != "production":
                 "base_url": "/dicom/",
             },
         }
+        audit_archive_storage_options = {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": BASE_DIR / "data" / "audit-archive"},
+        }
 else:
     # In production, authenticate to Azure Blob Storage using managed identity.
     dicom_storage_options = {
@@ -205,14 +216,71 @@ else:
             "azure_container": "dicom",
         },
     }
+    audit_archive_storage_options = {
+        "BACKEND": "manage_breast_screening.config.azure_blob_storage.ManagedIdentityAzureStorage",
+        "OPTIONS": {
+            "account_name": environ.get("STORAGE_ACCOUNT_NAME"),
+            "azure_container": "audit-archive",
+        },
+    }
 
 STORAGES = {
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
     "dicom": dicom_storage_options,
+    # Audit log partitions archived by manage_audit_partitions
+    "audit_archive": audit_archive_storage_options,
 }
 
+# Pixel data is decoded and previews encoded by the render_dicom_derivatives
+# command in a pool of worker processes, never in the gevent web workers.
+# The pool defaults to one process per CPU.
+DICOM_RENDER_WORKERS = int(environ.get("DICOM_RENDER_WORKERS", "0")) or None
+# Each process is replaced after this many images, releasing memory held
+# after decoding large images
+DICOM_RENDER_MAX_TASKS_PER_CHILD = int(
+    environ.get("DICOM_RENDER_MAX_TASKS_PER_CHILD", "50")
+)
+
+# Scheme for Azure Relay connections. Set to "ws" to connect to the fake relay
+# from the nonprod app, which doesn't use TLS.
+RELAY_URL_SCHEME = environ.get("RELAY_URL_SCHEME", "wss")
+
+# DICOM attributes, by keyword, copied to Image.metadata when an image is
+# received so they can be queried without reading the DICOM file
+DICOM_METADATA_TAGS = [
+    "AcquisitionDate",
+    "AcquisitionTime",
+    "AcquisitionDateTime",
+    "Manufacturer",
+    "ManufacturerModelName",
+    "DeviceSerialNumber",
+    "StationName",
+    "KVP",
+    "Exposure",
+    "ExposureTime",
+    "XRayTubeCurrent",
+    "ExposureInuAs",
+    "AnodeTargetMaterial",
+    "FilterMaterial",
+    "CompressionForce",
+    "BodyPartThickness",
+    "OrganDose",
+    "EntranceDoseInmGy",
+    "RelativeXRayExposure",
+    "PositionerPrimaryAngle",
+    "DetectorTemperature",
+    "PresentationIntentType",
+]
+
+# Uploaded DICOM files are stored by their SHA-256 digest, so compute it as
+# each upload is received rather than reading the file again afterwards
+FILE_UPLOAD_HANDLERS = [
+    "manage_breast_screening.dicom.upload_handlers.Sha256MemoryFileUploadHandler",
+    "manage_breast_screening.dicom.upload_handlers.Sha256TemporaryFileUploadHandler",
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -308,6 +376,27 @@ LOGGING = {
 
 AUDIT_EXCLUDED_FIELDS = ["password", "token", "created_at", "updated_at", "id"]
 
+# Updates to these models made in a buffered_audits block are audited as
+# the fields that changed. Every AUDIT_CHECKPOINT_INTERVAL entries for an
+# object has a full snapshot, so the object's state can be rebuilt from a
+# few recent entries.
+AUDIT_DELTA_MODELS = [
+    "dicom.Study",
+    "participants.Appointment",
+    "participants.BenignLumpHistoryItem",
+    "participants.BreastAugmentationHistoryItem",
+    "participants.BreastCancerHistoryItem",
+    "participants.CystHistoryItem",
+    "participants.ImplantedMedicalDeviceHistoryItem",
+    "participants.MastectomyOrLumpectomyHistoryItem",
+    "participants.OtherProcedureHistoryItem",
+]
+AUDIT_CHECKPOINT_INTERVAL = 10
+
+# Months of audit log kept in the database. Older monthly partitions are
+# archived to the audit_archive storage by manage_audit_partitions.
+AUDIT_LOG_ONLINE_MONTHS = int(environ.get("AUDIT_LOG_ONLINE_MONTHS", "24"))
+
 if PERSONAS_ENABLED:
     LOGIN_URL = "auth:persona_login"
 else:
@@ -27,6 +27,9 @@ STORAGES = {
         "BACKEND": "django.core.files.storage.InMemoryStorage",
         "OPTIONS": {"base_url": "/dicom/"},
     },
+    "audit_archive": {
+        "BACKEND": "django.core.files.storage.InMemoryStorage",
+    },
 }
 
 MIDDLEWARE.remove("whitenoise.middleware.WhiteNoiseMiddleware")
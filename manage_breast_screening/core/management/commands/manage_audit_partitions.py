@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from manage_breast_screening.core.services.audit_partitions import (
+    add_months,
+    archive_partition,
+    create_partitions,
+    detach_partitions,
+    detached_partitions,
+    month_start,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the audit log's partitions for the coming months, and archive "
+        "partitions older than AUDIT_LOG_ONLINE_MONTHS to blob storage"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Number of months after this one to create partitions for",
+        )
+        parser.add_argument(
+            "--no-archive",
+            action="store_true",
+            help="Only create partitions, leaving old ones in place",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        for name in create_partitions(now, options["months_ahead"]):
+            self.stdout.write(f"Created {name}")
+
+        if options["no_archive"]:
+            return
+
+        cutoff = add_months(month_start(now), -settings.AUDIT_LOG_ONLINE_MONTHS)
+        for name in detach_partitions(before=cutoff):
+            self.stdout.write(f"Detached {name}")
+
+        # Includes partitions detached by earlier runs that failed to archive them
+        for name in detached_partitions():
+            count = archive_partition(name, storages["audit_archive"])
+            self.stdout.write(f"Archived {count} entries from {name}")
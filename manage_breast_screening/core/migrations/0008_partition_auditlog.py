@@ -0,0 +1,159 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations
+
+# The audit log becomes a table partitioned by month on created_at. Postgres
+# requires the partition key in the primary key, so the key becomes
+# (id, created_at); Django still treats id as the primary key.
+#
+# Rather than copying the existing rows, the old table is attached as the
+# partition core_auditlog_legacy, holding everything before next month.
+# Monthly partitions are created after it, and a default partition catches
+# anything outside them until manage_audit_partitions creates its month.
+#
+# Attaching a partition scans it to check its rows are within its bounds,
+# while holding an ACCESS EXCLUSIVE lock. A validated CHECK constraint that
+# implies the bounds lets Postgres skip that scan, and validating it only
+# takes a lock that allows writes. So the migration isn't atomic: the
+# constraint is added and validated in their own transactions, and the
+# partitioning then runs as a single DO block, so it still happens all at
+# once or not at all.
+BOUNDS_CHECK_SQL = """
+DO $$
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE core_auditlog ADD CONSTRAINT core_auditlog_legacy_created_at_check '
+        'CHECK (created_at IS NOT NULL AND created_at < %L) NOT VALID',
+        (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '1 month')
+            AT TIME ZONE 'UTC'
+    );
+END
+$$;
+"""
+
+VALIDATE_SQL = """
+ALTER TABLE core_auditlog VALIDATE CONSTRAINT core_auditlog_legacy_created_at_check;
+"""
+
+DROP_BOUNDS_CHECK_SQL = """
+ALTER TABLE core_auditlog
+    DROP CONSTRAINT IF EXISTS core_auditlog_legacy_created_at_check;
+"""
+
+PARTITION_SQL = """
+DO $$
+DECLARE
+    next_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC')
+        + interval '1 month';
+    month_start timestamp;
+BEGIN
+    ALTER TABLE core_auditlog RENAME TO core_auditlog_legacy;
+    ALTER TABLE core_auditlog_legacy DROP CONSTRAINT core_auditlog_pkey;
+    ALTER TABLE core_auditlog_legacy
+        DROP CONSTRAINT core_auditlog_actor_id_ab091f3c_fk_users_user_id;
+    ALTER TABLE core_auditlog_legacy
+        DROP CONSTRAINT core_auditlog_content_type_id_0a26d6b4_fk_django_co;
+    ALTER INDEX core_auditlog_actor_id_ab091f3c
+        RENAME TO core_auditlog_legacy_actor_id;
+    ALTER INDEX core_auditlog_content_type_id_0a26d6b4
+        RENAME TO core_auditlog_legacy_content_type_id;
+    ALTER INDEX core_auditl_content_e3f5a7_idx
+        RENAME TO core_auditlog_legacy_content_type_id_object_id_created_at;
+    ALTER INDEX core_auditl_system__cabccb_idx
+        RENAME TO core_auditlog_legacy_system_update_id_created_at;
+    ALTER INDEX core_auditl_actor_i_41600a_idx
+        RENAME TO core_auditlog_legacy_actor_id_created_at;
+
+    CREATE TABLE core_auditlog (LIKE core_auditlog_legacy)
+        PARTITION BY RANGE (created_at);
+    ALTER TABLE core_auditlog
+        ADD CONSTRAINT core_auditlog_pkey PRIMARY KEY (id, created_at);
+    ALTER TABLE core_auditlog
+        ADD CONSTRAINT core_auditlog_actor_id_ab091f3c_fk_users_user_id
+        FOREIGN KEY (actor_id) REFERENCES users_user (id)
+        DEFERRABLE INITIALLY DEFERRED;
+    ALTER TABLE core_auditlog
+        ADD CONSTRAINT core_auditlog_content_type_id_0a26d6b4_fk_django_co
+        FOREIGN KEY (content_type_id) REFERENCES django_content_type (id)
+        DEFERRABLE INITIALLY DEFERRED;
+    CREATE INDEX core_auditlog_actor_id_ab091f3c ON core_auditlog (actor_id);
+    CREATE INDEX core_auditlog_content_type_id_0a26d6b4
+        ON core_auditlog (content_type_id);
+    CREATE INDEX core_auditl_content_e3f5a7_idx
+        ON core_auditlog (content_type_id, object_id, created_at);
+    CREATE INDEX core_auditl_system__cabccb_idx
+        ON core_auditlog (system_update_id, created_at);
+    CREATE INDEX core_auditl_actor_i_41600a_idx
+        ON core_auditlog (actor_id, created_at);
+
+    EXECUTE format(
+        'ALTER TABLE core_auditlog ATTACH PARTITION core_auditlog_legacy '
+        'FOR VALUES FROM (MINVALUE) TO (%L)',
+        next_month AT TIME ZONE 'UTC'
+    );
+    FOR months_ahead IN 0..2 LOOP
+        month_start := next_month + make_interval(months => months_ahead);
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF core_auditlog FOR VALUES FROM (%L) TO (%L)',
+            'core_auditlog_p' || to_char(month_start, 'YYYY_MM'),
+            month_start AT TIME ZONE 'UTC',
+            (month_start + interval '1 month') AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+
+    CREATE TABLE core_auditlog_default PARTITION OF core_auditlog DEFAULT;
+    ALTER TABLE core_auditlog_legacy
+        DROP CONSTRAINT core_auditlog_legacy_created_at_check;
+END
+$$;
+"""
+
+# Copies the rows back into an ordinary table. Partitions that have been
+# detached are left as they are.
+UNPARTITION_SQL = """
+DO $$
+BEGIN
+    CREATE TABLE core_auditlog_unpartitioned (LIKE core_auditlog);
+    INSERT INTO core_auditlog_unpartitioned SELECT * FROM core_auditlog;
+    DROP TABLE core_auditlog;
+    ALTER TABLE core_auditlog_unpartitioned RENAME TO core_auditlog;
+
+    ALTER TABLE core_auditlog ADD CONSTRAINT core_auditlog_pkey PRIMARY KEY (id);
+    ALTER TABLE core_auditlog
+        ADD CONSTRAINT core_auditlog_actor_id_ab091f3c_fk_users_user_id
+        FOREIGN KEY (actor_id) REFERENCES users_user (id)
+        DEFERRABLE INITIALLY DEFERRED;
+    ALTER TABLE core_auditlog
+        ADD CONSTRAINT core_auditlog_content_type_id_0a26d6b4_fk_django_co
+        FOREIGN KEY (content_type_id) REFERENCES django_content_type (id)
+        DEFERRABLE INITIALLY DEFERRED;
+    CREATE INDEX core_auditlog_actor_id_ab091f3c ON core_auditlog (actor_id);
+    CREATE INDEX core_auditlog_content_type_id_0a26d6b4
+        ON core_auditlog (content_type_id);
+    CREATE INDEX core_auditl_content_e3f5a7_idx
+        ON core_auditlog (content_type_id, object_id, created_at);
+    CREATE INDEX core_auditl_system__cabccb_idx
+        ON core_auditlog (system_update_id, created_at);
+    CREATE INDEX core_auditl_actor_i_41600a_idx
+        ON core_auditlog (actor_id, created_at);
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_auditlog_is_delta'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(BOUNDS_CHECK_SQL, reverse_sql=DROP_BOUNDS_CHECK_SQL),
+        migrations.RunSQL(VALIDATE_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(PARTITION_SQL, reverse_sql=UNPARTITION_SQL),
+    ]
@@ -47,6 +47,26 @@ class BaseModel(models.Model):
                     setattr(self, field.name, value.strip())
 
 
+class AuditLogQuerySet(models.QuerySet):
+    """
+    The audit log is partitioned by month on created_at, so filtering on
+    created_at lets Postgres skip the partitions outside the range.
+    """
+
+    def between(self, start, end):
+        """Entries created at or after start and before end."""
+        return self.filter(created_at__gte=start, created_at__lt=end)
+
+    def for_object(self, obj, since=None):
+        """Entries for a model instance, optionally only those since a time."""
+        entries = self.filter(
+            content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk
+        )
+        if since is not None:
+            entries = entries.filter(created_at__gte=since)
+        return entries
+
+
 class AuditLog(models.Model):
     class Operations:
         CREATE = "create"
@@ -72,10 +92,14 @@ class AuditLog(models.Model):
     object_id = models.UUIDField()
     operation = models.CharField(choices=OperationChoices)
     snapshot = models.JSONField(encoder=DjangoJSONEncoder)
+    # Whether the snapshot only has the fields changed since the entry before
+    is_delta = models.BooleanField(default=False)
     actor = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.PROTECT, null=True
     )
     system_update_id = models.CharField(null=True)
 
+    objects = AuditLogQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.get_operation_display()} {self.content_type} ({self.object_id})"
@@ -0,0 +1,203 @@
+"""
+Monthly partitions of the audit log.
+
+core_auditlog is partitioned by range on created_at. Each month's entries are
+kept in a partition named core_auditlog_pYYYY_MM, and a default partition
+catches entries for months that don't have one yet. Entries from before the
+table was partitioned are in core_auditlog_legacy.
+
+Partitions older than AUDIT_LOG_ONLINE_MONTHS are detached from the table,
+written to the audit_archive storage as gzipped JSON lines and dropped, so
+the size of the table, and its indexes, stays roughly constant.
+"""
+
+import gzip
+import logging
+import re
+import tempfile
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from django.core.files import File
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+TABLE = "core_auditlog"
+DEFAULT_PARTITION = "core_auditlog_default"
+LEGACY_PARTITION = "core_auditlog_legacy"
+ARCHIVE_BATCH_SIZE = 5000
+
+BOUNDS_PATTERN = re.compile(r"FOR VALUES FROM \((.+)\) TO \((.+)\)")
+
+
+@dataclass(frozen=True)
+class AuditLogPartition:
+    name: str
+    # None for the legacy partition, which has no lower bound
+    start: datetime | None
+    end: datetime
+
+
+def month_start(value: datetime) -> datetime:
+    """The start of the month containing value, in UTC."""
+    return value.astimezone(UTC).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def _parse_bound(value: str) -> datetime | None:
+    if value == "MINVALUE":
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def attached_partitions() -> list[AuditLogPartition]:
+    """The monthly and legacy partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)"
+            " FROM pg_inherits"
+            " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+            " WHERE pg_inherits.inhparent = %s::regclass",
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bounds in rows:
+        match = BOUNDS_PATTERN.fullmatch(bounds)
+        if match is None:
+            continue
+        start, end = match.groups()
+        partitions.append(
+            AuditLogPartition(name, _parse_bound(start), _parse_bound(end))
+        )
+    return sorted(partitions, key=lambda partition: partition.end)
+
+
+def detached_partitions() -> list[str]:
+    """Partitions that have been detached but not yet archived."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class"
+            " WHERE relkind = 'r' AND NOT relispartition"
+            " AND (relname ~ %s OR relname = %s)"
+            " ORDER BY relname",
+            [f"^{TABLE}_p[0-9]{{4}}_[0-9]{{2}}$", LEGACY_PARTITION],
+        )
+        return [name for (name,) in cursor.fetchall()]
+
+
+def create_partitions(now: datetime, months_ahead: int) -> list[str]:
+    """
+    Create partitions for this month and the months_ahead after it, where
+    they don't exist, returning their names.
+    """
+    partitions = attached_partitions()
+    created = []
+    for offset in range(months_ahead + 1):
+        start = add_months(month_start(now), offset)
+        if any(
+            (partition.start is None or partition.start <= start)
+            and start < partition.end
+            for partition in partitions
+        ):
+            continue
+        create_partition(start)
+        created.append(partition_name(start))
+    return created
+
+
+def create_partition(start: datetime):
+    """
+    Create the partition for the month beginning at start.
+
+    Entries for the month that are already in the default partition are
+    moved into it.
+    """
+    end = add_months(start, 1)
+    name = connection.ops.quote_name(partition_name(start))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE})")
+        cursor.execute(
+            f"WITH moved AS ("
+            f" DELETE FROM {DEFAULT_PARTITION}"
+            f" WHERE created_at >= %s AND created_at < %s RETURNING *"
+            f") INSERT INTO {name} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+
+
+def detach_partitions(before: datetime) -> list[str]:
+    """Detach the partitions that end on or before a time, returning their names."""
+    detached = []
+    for partition in attached_partitions():
+        if partition.end > before:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {TABLE} DETACH PARTITION"
+                f" {connection.ops.quote_name(partition.name)}"
+            )
+        detached.append(partition.name)
+    return detached
+
+
+def archive_partition(name: str, storage) -> int:
+    """
+    Write a detached partition's entries to storage as gzipped JSON lines,
+    one entry per line, then drop the partition. Returns the number of
+    entries archived.
+    """
+    table = connection.ops.quote_name(name)
+    path = f"{name}.jsonl.gz"
+    count = 0
+    with tempfile.TemporaryFile() as file:
+        with gzip.GzipFile(fileobj=file, mode="wb") as archive:
+            after = None
+            while True:
+                with connection.cursor() as cursor:
+                    if after is None:
+                        cursor.execute(
+                            f"SELECT created_at, id, to_jsonb(entry)::text"
+                            f" FROM {table} entry ORDER BY created_at, id LIMIT %s",
+                            [ARCHIVE_BATCH_SIZE],
+                        )
+                    else:
+                        cursor.execute(
+                            f"SELECT created_at, id, to_jsonb(entry)::text"
+                            f" FROM {table} entry WHERE (created_at, id) > (%s, %s)"
+                            f" ORDER BY created_at, id LIMIT %s",
+                            [*after, ARCHIVE_BATCH_SIZE],
+                        )
+                    rows = cursor.fetchall()
+                if not rows:
+                    break
+                archive.writelines(f"{row[2]}\n".encode() for row in rows)
+                count += len(rows)
+                after = rows[-1][:2]
+
+        file.seek(0)
+        # Replace an archive left by a run that failed before dropping the table
+        if storage.exists(path):
+            storage.delete(path)
+        storage.save(path, File(file))
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {table}")
+    logger.info("Archived %d audit log entries from %s to %s", count, name, path)
+    return count
@@ -1,6 +1,16 @@
+import json
+import threading
+from contextlib import contextmanager
+
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.db.models import F, Field, Q, Window
+from django.db.models.functions import RowNumber
+from django.dispatch import receiver
+from django.utils.encoding import is_protected_type
 
 from ..models import AuditLog
 
@@ -13,24 +23,65 @@ class AuditAfterDeleteError(Exception):
     pass
 
 
-def make_snapshot(obj):
+def compile_snapshot(model):
     """
-    Turn a model object into a python dictionary that can be stored in a JSON field
+    Build a function that snapshots instances of a model.
+
+    The snapshots are the same as the "python" serializer's fields, but the
+    fields to include are worked out once rather than for every object.
     """
-    fields = [
-        field.name
-        for field in obj._meta.fields
-        if field.name not in settings.AUDIT_EXCLUDED_FIELDS
-    ]
-    snapshot = serializers.serialize("python", [obj], fields=fields)[0]
-    return snapshot["fields"]
+    excluded = set(settings.AUDIT_EXCLUDED_FIELDS)
+    plain_fields = []
+    other_fields = []
+    for field in model._meta.concrete_model._meta.local_fields:
+        if not field.serialize or field.name in excluded:
+            continue
+        # Most fields are stored as is, so skip the serializer's method calls
+        if (
+            type(field).value_from_object is Field.value_from_object
+            and type(field).value_to_string is Field.value_to_string
+        ):
+            plain_fields.append((field.name, field.attname))
+        else:
+            other_fields.append(field)
 
+    def snapshot(obj):
+        data = {}
+        for name, attname in plain_fields:
+            value = getattr(obj, attname)
+            data[name] = value if is_protected_type(value) else str(value)
+        for field in other_fields:
+            value = field.value_from_object(obj)
+            data[field.name] = (
+                value if is_protected_type(value) else field.value_to_string(obj)
+            )
+        return data
 
-def _log_action(object, operation, actor, system_update_id):
+    return snapshot
+
+
+_snapshot_functions = {}
+
+
+def make_snapshot(obj):
     """
-    Create an audit record from a model instance
+    Turn a model object into a python dictionary that can be stored in a JSON field
     """
-    return AuditLog.objects.create(
+    model = type(obj)
+    snapshot = _snapshot_functions.get(model)
+    if snapshot is None:
+        snapshot = _snapshot_functions[model] = compile_snapshot(model)
+    return snapshot(obj)
+
+
+@receiver(setting_changed)
+def _clear_snapshot_functions(*, setting, **kwargs):
+    if setting == "AUDIT_EXCLUDED_FIELDS":
+        _snapshot_functions.clear()
+
+
+def _build_entry(object, operation, actor, system_update_id):
+    return AuditLog(
         content_type=ContentType.objects.get_for_model(object),
         object_id=object.pk,
         operation=operation,
@@ -42,27 +93,227 @@ def _log_action(object, operation, actor, system_update_id):
     )
 
 
+def _log_action(object, operation, actor, system_update_id):
+    """
+    Create an audit record from a model instance
+    """
+    log_entry = _build_entry(object, operation, actor, system_update_id)
+    buffer = _current_buffer()
+    if buffer is not None:
+        buffer.add([log_entry])
+    else:
+        log_entry.save()
+    return log_entry
+
+
 def _log_actions(objects, operation, actor, system_update_id):
     """
     Create audit records from a queryset or list of model instances
     """
     log_entry_list = [
-        AuditLog(
-            content_type=ContentType.objects.get_for_model(object),
-            object_id=object.pk,
-            operation=operation,
-            snapshot=(
-                {} if operation == AuditLog.Operations.DELETE else make_snapshot(object)
-            ),
-            actor=actor,
-            system_update_id=system_update_id,
-        )
-        for object in objects
+        _build_entry(object, operation, actor, system_update_id) for object in objects
     ]
-    AuditLog.objects.bulk_create(log_entry_list)
+    buffer = _current_buffer()
+    if buffer is not None:
+        buffer.add(log_entry_list)
+    else:
+        AuditLog.objects.bulk_create(log_entry_list)
     return log_entry_list
 
 
+def _as_stored(snapshot):
+    """A snapshot as it reads back from the database."""
+    return json.loads(json.dumps(snapshot, cls=DjangoJSONEncoder))
+
+
+def _replay(history):
+    """
+    The state after a list of entries, oldest first, and how many deltas
+    there have been since the last full snapshot.
+
+    The state is None if there's no full snapshot to start from.
+    """
+    for index in range(len(history) - 1, -1, -1):
+        entry = history[index]
+        if entry.is_delta:
+            continue
+        if entry.operation == AuditLog.Operations.DELETE:
+            return None, 0
+
+        state = _as_stored(entry.snapshot)
+        for delta in history[index + 1 :]:
+            state.update(_as_stored(delta.snapshot))
+        return state, len(history) - index - 1
+    return None, 0
+
+
+def _recent_history(keys):
+    """
+    The last AUDIT_CHECKPOINT_INTERVAL entries for each (content type id,
+    object id), oldest first, which always includes a full snapshot.
+    """
+    condition = Q()
+    for content_type_id, object_id in keys:
+        condition |= Q(content_type_id=content_type_id, object_id=object_id)
+
+    entries = (
+        AuditLog.objects.filter(condition)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F("content_type_id"), F("object_id")],
+                order_by=F("created_at").desc(),
+            )
+        )
+        .filter(position__lte=settings.AUDIT_CHECKPOINT_INTERVAL)
+        .only("content_type_id", "object_id", "operation", "snapshot", "is_delta")
+        .order_by("created_at")
+    )
+    history = {}
+    for entry in entries:
+        history.setdefault((entry.content_type_id, entry.object_id), []).append(entry)
+    return history
+
+
+def _apply_deltas(log_entries):
+    """
+    Reduce updates to AUDIT_DELTA_MODELS to the fields that have changed,
+    unless the entry is due to be a full snapshot.
+
+    This needs a query for the recent history, so it's only done when a
+    buffer is flushed. Unbuffered writes store full snapshots.
+    """
+    delta_models = {label.lower() for label in settings.AUDIT_DELTA_MODELS}
+    keys = {
+        (entry.content_type_id, entry.object_id)
+        for entry in log_entries
+        if entry.operation == AuditLog.Operations.UPDATE
+        and f"{entry.content_type.app_label}.{entry.content_type.model}" in delta_models
+    }
+    if not keys:
+        return
+
+    history = _recent_history(keys)
+    for entry in log_entries:
+        key = (entry.content_type_id, entry.object_id)
+        if key not in keys:
+            continue
+
+        previous = history.setdefault(key, [])
+        if entry.operation == AuditLog.Operations.UPDATE:
+            state, deltas = _replay(previous)
+            if state is not None and deltas + 1 < settings.AUDIT_CHECKPOINT_INTERVAL:
+                stored = _as_stored(entry.snapshot)
+                entry.snapshot = {
+                    name: value
+                    for name, value in entry.snapshot.items()
+                    if name not in state or state[name] != stored[name]
+                }
+                entry.is_delta = True
+        previous.append(entry)
+
+
+def snapshot_at(model, object_id, at=None):
+    """
+    Rebuild the audited state of an object, as it was at a point in time or
+    after the latest change.
+
+    Values are as stored in the audit log, so dates and UUIDs are strings.
+    Returns None if the object wasn't audited as existing at that time.
+    """
+    entries = AuditLog.objects.filter(
+        content_type=ContentType.objects.get_for_model(model), object_id=object_id
+    )
+    if at is not None:
+        entries = entries.filter(created_at__lte=at)
+
+    deltas = []
+    for entry in entries.order_by("-created_at").iterator(
+        chunk_size=settings.AUDIT_CHECKPOINT_INTERVAL
+    ):
+        if entry.is_delta:
+            deltas.append(entry)
+            continue
+        if entry.operation == AuditLog.Operations.DELETE:
+            return None
+        return _replay([entry, *reversed(deltas)])[0]
+    return None
+
+
+class AuditBuffer:
+    """
+    Audit records waiting to be written at the end of a transaction.
+
+    Snapshots are taken when each change is audited, so later changes to
+    the objects don't affect them. Records are kept per nested block, so
+    those made in a block that is rolled back can be dropped.
+    """
+
+    def __init__(self):
+        self.levels = [[]]
+
+    def add(self, log_entries):
+        self.levels[-1].extend(log_entries)
+
+    @contextmanager
+    def savepoint(self):
+        """Run a nested block, dropping its records if it is rolled back."""
+        self.levels.append([])
+        try:
+            with transaction.atomic():
+                yield
+        except BaseException:
+            self.levels.pop()
+            raise
+        log_entries = self.levels.pop()
+        self.levels[-1].extend(log_entries)
+
+    def flush(self):
+        """Write the records made in blocks that weren't rolled back."""
+        (log_entries,) = self.levels
+        self.levels = [[]]
+        if log_entries:
+            _apply_deltas(log_entries)
+            AuditLog.objects.bulk_create(log_entries)
+
+
+_local = threading.local()
+
+
+def _current_buffer():
+    buffer = getattr(_local, "buffer", None)
+    if buffer is not None and connection.in_atomic_block:
+        return buffer
+    return None
+
+
+@contextmanager
+def buffered_audits():
+    """
+    Run a block in a transaction, and write the audit records made in it
+    with one query just before the transaction commits.
+
+    Nested uses share the outermost buffer, and records made in a nested
+    use that is rolled back are not written. Use it as a decorator or a
+    context manager in place of transaction.atomic, including for nested
+    blocks that may be rolled back: the buffer can't see savepoints rolled
+    back by a plain transaction.atomic block.
+    """
+    buffer = getattr(_local, "buffer", None)
+    if buffer is not None:
+        with buffer.savepoint():
+            yield
+        return
+
+    _local.buffer = AuditBuffer()
+    try:
+        with transaction.atomic():
+            yield
+            _local.buffer.flush()
+    finally:
+        _local.buffer = None
+
+
 class Auditor:
     @classmethod
     def from_request(cls, request):
@@ -0,0 +1,199 @@
+import gzip
+import json
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+import pytest
+import time_machine
+from django.core.files.storage import InMemoryStorage, storages
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from manage_breast_screening.core.admin import EstimatedCountPaginator
+from manage_breast_screening.core.models import AuditLog
+from manage_breast_screening.core.services.audit_partitions import (
+    LEGACY_PARTITION,
+    archive_partition,
+    attached_partitions,
+    create_partitions,
+    detach_partitions,
+    detached_partitions,
+)
+from manage_breast_screening.core.services.auditor import Auditor
+from manage_breast_screening.participants.tests.factories import ParticipantFactory
+
+MARCH_2040 = datetime(2040, 3, 15, tzinfo=UTC)
+
+
+def count_in(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+        return cursor.fetchone()[0]
+
+
+@pytest.fixture
+def log():
+    log = Auditor(system_update_id="test").audit_create(ParticipantFactory.create())
+    # Run the deferred foreign key checks now, otherwise Postgres won't drop
+    # the partition in the same transaction
+    with connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+    return log
+
+
+def move_to(log, created_at):
+    AuditLog.objects.filter(pk=log.pk).update(created_at=created_at)
+
+
+@pytest.mark.django_db
+class TestAuditPartitions:
+    def test_creates_partitions_for_the_coming_months(self):
+        assert create_partitions(MARCH_2040, months_ahead=1) == [
+            "core_auditlog_p2040_03",
+            "core_auditlog_p2040_04",
+        ]
+        assert create_partitions(MARCH_2040, months_ahead=1) == []
+
+        partition = attached_partitions()[-1]
+        assert partition.name == "core_auditlog_p2040_04"
+        assert partition.start == datetime(2040, 4, 1, tzinfo=UTC)
+        assert partition.end == datetime(2040, 5, 1, tzinfo=UTC)
+
+    def test_moves_entries_from_the_default_partition(self, log):
+        move_to(log, datetime(2040, 3, 20, tzinfo=UTC))
+        assert count_in("core_auditlog_default") == 1
+
+        create_partitions(MARCH_2040, months_ahead=0)
+
+        assert count_in("core_auditlog_default") == 0
+        assert count_in("core_auditlog_p2040_03") == 1
+        assert AuditLog.objects.get(pk=log.pk).created_at.year == 2040
+
+    @patch(
+        "manage_breast_screening.core.services.audit_partitions.ARCHIVE_BATCH_SIZE", 1
+    )
+    def test_detaches_and_archives_old_partitions(self, log):
+        other = Auditor(system_update_id="test").audit_update(
+            ParticipantFactory.create()
+        )
+        move_to(log, datetime(2040, 3, 20, tzinfo=UTC))
+        move_to(other, datetime(2040, 3, 21, tzinfo=UTC))
+        create_partitions(MARCH_2040, months_ahead=1)
+        storage = InMemoryStorage()
+
+        detached = detach_partitions(before=datetime(2040, 4, 1, tzinfo=UTC))
+
+        assert detached[0] == LEGACY_PARTITION
+        assert detached[-1] == "core_auditlog_p2040_03"
+        assert [partition.name for partition in attached_partitions()] == [
+            "core_auditlog_p2040_04"
+        ]
+        assert not AuditLog.objects.exists()
+
+        assert archive_partition("core_auditlog_p2040_03", storage) == 2
+
+        with storage.open("core_auditlog_p2040_03.jsonl.gz") as file:
+            lines = gzip.decompress(file.read()).decode().splitlines()
+        assert [json.loads(line)["id"] for line in lines] == [
+            str(log.pk),
+            str(other.pk),
+        ]
+        assert json.loads(lines[0])["snapshot"] == log.snapshot | {
+            "date_of_birth": log.snapshot["date_of_birth"].isoformat()
+        }
+        assert "core_auditlog_p2040_03" not in detached_partitions()
+
+    def test_ignores_tables_that_only_look_like_partitions(self):
+        with connection.cursor() as cursor:
+            for name in ["coreXauditlogXp2040_03", "core_auditlog_pending"]:
+                cursor.execute(f"CREATE TABLE {name} (id int)")
+
+        assert detached_partitions() == []
+
+
+@pytest.mark.django_db
+class TestManageAuditPartitions:
+    @pytest.fixture
+    def archive(self):
+        storage = storages["audit_archive"]
+        yield storage
+        for name in storage.listdir("")[1]:
+            storage.delete(name)
+
+    @time_machine.travel(MARCH_2040)
+    def test_creates_partitions_and_archives_old_ones(self, log, archive, settings):
+        settings.AUDIT_LOG_ONLINE_MONTHS = 1
+
+        call_command("manage_audit_partitions", "--months-ahead", "1")
+
+        assert [partition.name for partition in attached_partitions()] == [
+            "core_auditlog_p2040_03",
+            "core_auditlog_p2040_04",
+        ]
+        assert detached_partitions() == []
+        with archive.open(f"{LEGACY_PARTITION}.jsonl.gz") as file:
+            assert str(log.pk) in gzip.decompress(file.read()).decode()
+
+    @time_machine.travel(MARCH_2040)
+    def test_leaves_old_partitions_when_not_archiving(self, log, archive):
+        call_command("manage_audit_partitions", "--no-archive")
+
+        assert AuditLog.objects.filter(pk=log.pk).exists()
+        assert archive.listdir("")[1] == []
+
+
+@pytest.mark.django_db
+class TestAuditLogQuerySet:
+    def test_between_only_reads_the_partitions_in_range(self):
+        partition = next(
+            partition
+            for partition in attached_partitions()
+            if partition.start is not None
+        )
+
+        plan = AuditLog.objects.between(partition.start, partition.end).explain()
+
+        assert partition.name in plan
+        assert LEGACY_PARTITION not in plan
+
+    def test_for_object(self, log):
+        participant = ParticipantFactory.create()
+        Auditor(system_update_id="test").audit_create(participant)
+
+        assert list(AuditLog.objects.for_object(participant)) == [
+            AuditLog.objects.get(object_id=participant.pk)
+        ]
+        assert not AuditLog.objects.for_object(
+            participant, since=datetime(2040, 1, 1, tzinfo=UTC)
+        ).exists()
+
+
+@pytest.mark.django_db
+class TestAuditLogAdmin:
+    def test_lists_entries(self, superuser_client, log):
+        superuser_client.user.is_staff = True
+        superuser_client.user.save()
+
+        response = superuser_client.http.get(reverse("admin:core_auditlog_changelist"))
+
+        assert response.status_code == 200
+        assert str(log.object_id) in response.text
+
+    def test_estimates_the_size_of_a_large_log(self, log):
+        with (
+            patch("manage_breast_screening.core.admin.EXACT_COUNT_LIMIT", 0),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            EstimatedCountPaginator(AuditLog.objects.all(), 10).count
+
+        assert len(queries) == 1
+        assert "reltuples" in queries[0]["sql"]
+
+    def test_counts_filtered_lists_exactly(self, log):
+        paginator = EstimatedCountPaginator(
+            AuditLog.objects.filter(operation=AuditLog.Operations.CREATE), 10
+        )
+
+        assert paginator.count == AuditLog.objects.count()
@@ -1,11 +1,29 @@
+from datetime import UTC, datetime
+
 import pytest
+import time_machine
+from django.contrib.contenttypes.models import ContentType
+from django.core import serializers
+from django.db import DatabaseError
 from django.test import RequestFactory
 
 from manage_breast_screening.clinics.models import Provider
 from manage_breast_screening.clinics.tests.factories import ProviderFactory
-from manage_breast_screening.core.services.auditor import AnonymousAuditError, Auditor
+from manage_breast_screening.core.models import AuditLog
+from manage_breast_screening.core.services.auditor import (
+    AnonymousAuditError,
+    Auditor,
+    buffered_audits,
+    make_snapshot,
+    snapshot_at,
+)
+from manage_breast_screening.dicom.models import Study
+from manage_breast_screening.dicom.tests import factories as dicom_factories
 from manage_breast_screening.participants.models import Participant
-from manage_breast_screening.participants.tests.factories import ParticipantFactory
+from manage_breast_screening.participants.tests.factories import (
+    AppointmentFactory,
+    ParticipantFactory,
+)
 
 from ..factories import UserFactory
 
@@ -191,3 +209,243 @@ class TestAuditor:
             match="Attempted to audit an operation with no logged in user and no system_update_id",
         ):
             Auditor.from_request(request)
+
+
+@pytest.mark.django_db
+class TestBufferedAudits:
+    def test_writes_records_when_the_block_ends(self):
+        auditor = Auditor(system_update_id="test")
+        a = ParticipantFactory.create()
+        b = ParticipantFactory.create()
+
+        with buffered_audits():
+            log = auditor.audit_create(a)
+            auditor.audit_bulk_update([a, b])
+            assert not AuditLog.objects.exists()
+
+        assert AuditLog.objects.count() == 3
+        log.refresh_from_db()
+        assert log.snapshot["first_name"] == a.first_name
+
+    def test_writes_records_in_one_query(self, django_assert_num_queries):
+        auditor = Auditor(system_update_id="test")
+        participants = ParticipantFactory.create_batch(3)
+        ContentType.objects.get_for_model(Participant)
+
+        # Savepoint, insert, release
+        with django_assert_num_queries(3):
+            with buffered_audits():
+                for participant in participants:
+                    auditor.audit_update(participant)
+
+        assert AuditLog.objects.count() == 3
+
+    def test_snapshots_objects_when_they_are_audited(self):
+        auditor = Auditor(system_update_id="test")
+        participant = ParticipantFactory.create(first_name="ABC")
+
+        with buffered_audits():
+            log = auditor.audit_update(participant)
+            participant.first_name = "DEF"
+
+        log.refresh_from_db()
+        assert log.snapshot["first_name"] == "ABC"
+
+    def test_drops_records_from_rolled_back_savepoints(self):
+        auditor = Auditor(system_update_id="test")
+        kept = ParticipantFactory.create()
+        rolled_back = ParticipantFactory.create()
+
+        with buffered_audits():
+            auditor.audit_update(kept)
+            try:
+                with buffered_audits():
+                    auditor.audit_update(rolled_back)
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+
+        assert list(AuditLog.objects.values_list("object_id", flat=True)) == [kept.pk]
+
+    def test_drops_records_from_blocks_nested_in_a_rolled_back_block(self):
+        auditor = Auditor(system_update_id="test")
+        kept = ParticipantFactory.create()
+        rolled_back = ParticipantFactory.create()
+
+        with buffered_audits():
+            auditor.audit_update(kept)
+            try:
+                with buffered_audits():
+                    with buffered_audits():
+                        auditor.audit_update(rolled_back)
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+
+        assert list(AuditLog.objects.values_list("object_id", flat=True)) == [kept.pk]
+
+    def test_writes_nothing_if_the_block_fails(self):
+        auditor = Auditor(system_update_id="test")
+        participant = ParticipantFactory.create()
+
+        with pytest.raises(DatabaseError):
+            with buffered_audits():
+                auditor.audit_update(participant)
+                raise DatabaseError
+
+        assert not AuditLog.objects.exists()
+
+    def test_nested_blocks_write_with_the_outermost(self):
+        auditor = Auditor(system_update_id="test")
+        participant = ParticipantFactory.create()
+
+        with buffered_audits():
+            with buffered_audits():
+                auditor.audit_update(participant)
+            assert not AuditLog.objects.exists()
+
+        assert AuditLog.objects.count() == 1
+
+    def test_writes_immediately_outside_a_block(self):
+        auditor = Auditor(system_update_id="test")
+        participant = ParticipantFactory.create()
+
+        auditor.audit_update(participant)
+
+        assert AuditLog.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestMakeSnapshot:
+    @pytest.mark.parametrize(
+        "create",
+        [
+            ParticipantFactory.create,
+            lambda: ParticipantFactory.create().address,
+            AppointmentFactory.create,
+            dicom_factories.StudyFactory.create,
+            dicom_factories.ImageFactory.create,
+        ],
+    )
+    def test_matches_the_python_serializer(self, create, settings):
+        obj = create()
+        fields = [
+            field.name
+            for field in obj._meta.fields
+            if field.name not in settings.AUDIT_EXCLUDED_FIELDS
+        ]
+        serialized = serializers.serialize("python", [obj], fields=fields)[0]
+
+        assert make_snapshot(obj) == serialized["fields"]
+
+    def test_excludes_fields_when_the_setting_changes(self, settings):
+        participant = ParticipantFactory.create()
+        assert "nhs_number" in make_snapshot(participant)
+
+        settings.AUDIT_EXCLUDED_FIELDS = [
+            *settings.AUDIT_EXCLUDED_FIELDS,
+            "nhs_number",
+        ]
+
+        assert "nhs_number" not in make_snapshot(participant)
+
+
+@pytest.mark.django_db
+class TestDeltaSnapshots:
+    @pytest.fixture(autouse=True)
+    def checkpoint_interval(self, settings):
+        settings.AUDIT_CHECKPOINT_INTERVAL = 3
+
+    @pytest.fixture
+    def auditor(self):
+        return Auditor(system_update_id="test")
+
+    @pytest.fixture
+    def study(self, auditor):
+        study = dicom_factories.StudyFactory.create()
+        auditor.audit_create(study)
+        return study
+
+    def update(self, auditor, study, **changes):
+        with buffered_audits():
+            for name, value in changes.items():
+                setattr(study, name, value)
+            study.save()
+            return auditor.audit_update(study)
+
+    def test_stores_the_fields_changed_by_an_update(self, auditor, study):
+        log = self.update(auditor, study, additional_details="Patient moved")
+
+        log.refresh_from_db()
+        assert log.is_delta
+        assert log.snapshot == {"additional_details": "Patient moved"}
+
+    def test_stores_a_full_snapshot_at_each_checkpoint(self, auditor, study):
+        for index in range(5):
+            self.update(auditor, study, additional_details=f"Update {index}")
+
+        entries = AuditLog.objects.filter(object_id=study.pk).order_by("created_at")
+        assert [entry.is_delta for entry in entries] == [
+            False,
+            True,
+            True,
+            False,
+            True,
+            True,
+        ]
+        assert entries[3].snapshot == make_snapshot(study) | {
+            "additional_details": "Update 2"
+        }
+
+    def test_stores_full_snapshots_outside_a_buffered_block(
+        self, auditor, study, django_assert_num_queries
+    ):
+        study.additional_details = "Patient moved"
+
+        # Only the insert, without looking up the history
+        with django_assert_num_queries(1):
+            log = auditor.audit_update(study)
+
+        assert not log.is_delta
+        assert log.snapshot == make_snapshot(study)
+
+    def test_stores_full_snapshots_for_other_models(self, auditor):
+        participant = ParticipantFactory.create()
+        auditor.audit_create(participant)
+
+        with buffered_audits():
+            log = auditor.audit_update(participant)
+
+        assert not log.is_delta
+        assert log.snapshot == make_snapshot(participant)
+
+    def test_compares_with_updates_earlier_in_the_transaction(self, auditor, study):
+        with buffered_audits():
+            self.update(auditor, study, additional_details="First")
+            self.update(auditor, study, completeness="PARTIAL")
+
+        entries = AuditLog.objects.filter(object_id=study.pk).order_by("created_at")
+        assert [entry.snapshot for entry in entries[1:]] == [
+            {"additional_details": "First"},
+            {"completeness": "PARTIAL"},
+        ]
+
+    def test_rebuilds_the_state_at_a_point_in_time(self, auditor):
+        with time_machine.travel(datetime(2026, 1, 1, 9, tzinfo=UTC), tick=False):
+            study = dicom_factories.StudyFactory.create(additional_details="")
+            auditor.audit_create(study)
+        for day in range(2, 7):
+            with time_machine.travel(datetime(2026, 1, day, 9, tzinfo=UTC)):
+                self.update(auditor, study, additional_details=f"Day {day}")
+
+        state = snapshot_at(Study, study.pk, datetime(2026, 1, 4, 12, tzinfo=UTC))
+
+        assert state["additional_details"] == "Day 4"
+        assert state["study_instance_uid"] == study.study_instance_uid
+        assert snapshot_at(Study, study.pk)["additional_details"] == "Day 6"
+        assert snapshot_at(Study, study.pk, datetime(2025, 12, 31, tzinfo=UTC)) is None
+
+    def test_rebuilds_nothing_after_a_delete(self, auditor, study):
+        auditor.audit_delete(study)
+
+        assert snapshot_at(Study, study.pk) is None
@@ -1,19 +1,26 @@
 import logging
+import time
 from typing import Any
 
 import ninja
 import pydicom
+from django.core.files import File as DjangoFile
 from django.utils import timezone
+from django.utils.http import parse_header_parameters
 from ninja import File, Router
 from ninja.files import UploadedFile
 
 from manage_breast_screening.core.api_schema import ErrorResponse, StatusResponse
 from manage_breast_screening.gateway.models import GatewayAction, GatewayActionStatus
 
-from .dicom_recorder import DicomRecorder
+from .dicom_recorder import DicomProcessingError, DicomRecorder
+from .models import Image
+from .multipart_related import MultipartRelatedError, boundary_for, iter_parts
 
 router = Router()
 
+DICOM_MEDIA_TYPE = "application/dicom"
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,6 +35,19 @@ class FailurePayload(ninja.Schema):
     error: str
 
 
+class InstanceResult(ninja.Schema):
+    # Position of the instance's part in the request
+    index: int
+    sop_instance_uid: str | None = None
+    instance_id: Any = None
+    error: str | None = None
+
+
+class StoreInstancesResponse(ninja.Schema):
+    stored: list[InstanceResult]
+    failed: list[InstanceResult]
+
+
 @router.put(
     "/{source_message_id}",
     response={
@@ -89,6 +109,131 @@ def upload(request, source_message_id: str, file: File[UploadedFile]):
     }
 
 
+@router.api_operation(
+    ["HEAD"],
+    "/files/{sha256}",
+    response={200: None, 403: StatusResponse, 404: None},
+)
+def file_exists(request, sha256: str):
+    """
+    Check whether a DICOM file with the given SHA-256 digest has been
+    recorded, so the gateway can skip uploading it again.
+    """
+    if Image.objects.filter(sha256=sha256.lower()).exists():
+        return 200, None
+    return 404, None
+
+
+@router.post(
+    "/{source_message_id}/studies",
+    response={
+        200: StoreInstancesResponse,
+        202: StoreInstancesResponse,
+        400: ErrorResponse,
+        403: StatusResponse,
+        409: StoreInstancesResponse,
+        415: ErrorResponse,
+    },
+)
+def store_instances(request, source_message_id: str):
+    """
+    Accepts POST with several DICOM files in a multipart/related body, in the
+    style of a DICOMweb STOW-RS request.
+
+    Instances are recorded in the order they were sent, each in its own
+    transaction, and the results list which were stored and which failed.
+    The status is 200 if every instance was stored, 409 if none were and
+    202 otherwise.
+    """
+    try:
+        boundary = boundary_for(
+            request.META.get("CONTENT_TYPE", ""), expected_type=DICOM_MEDIA_TYPE
+        )
+    except MultipartRelatedError as e:
+        return 415, {
+            "title": "Unsupported media type",
+            "status": 415,
+            "detail": str(e),
+        }
+
+    if not DicomRecorder.appointment_in_progress(source_message_id):
+        return 400, {
+            "title": "Appointment not in progress",
+            "status": 400,
+            "detail": "Images can only be uploaded while the appointment is in progress.",
+        }
+
+    stored = []
+    failed = []
+    # Each instance is committed on its own, so an instance's rows aren't
+    # locked while later parts upload, and a failure part way through the
+    # body keeps the instances already stored
+    parts = enumerate(iter_parts(request, boundary))
+    index = 0
+    while True:
+        try:
+            index, part = next(parts)
+        except StopIteration:
+            break
+        except MultipartRelatedError as e:
+            if not stored and not failed:
+                return 400, {
+                    "title": "Invalid multipart body",
+                    "status": 400,
+                    "detail": str(e),
+                }
+            failed.append(
+                InstanceResult(index=index + 1, error=f"Invalid multipart body: {e}")
+            )
+            break
+
+        part_type, _ = parse_header_parameters(
+            part.headers.get("content-type", DICOM_MEDIA_TYPE)
+        )
+        if part_type != DICOM_MEDIA_TYPE:
+            result = InstanceResult(
+                index=index, error="Each part must be application/dicom."
+            )
+        else:
+            dicom_file = DjangoFile(part.content, name=f"{index}.dcm")
+            dicom_file.sha256 = part.sha256
+            result = _store_instance(index, source_message_id, dicom_file)
+        (failed if result.error else stored).append(result)
+        # Reading headers and hashing don't yield, so let other
+        # greenlets run between instances under gevent
+        time.sleep(0)
+
+    if not failed:
+        return 200, {"stored": stored, "failed": failed}
+    if not stored:
+        return 409, {"stored": stored, "failed": failed}
+    return 202, {"stored": stored, "failed": failed}
+
+
+def _store_instance(
+    index: int, source_message_id: str, dicom_file: DjangoFile
+) -> InstanceResult:
+    try:
+        # record() commits its upserts before storing the file, so the rows
+        # aren't locked while it uploads
+        _, _, image = DicomRecorder.record(source_message_id, dicom_file)
+    except pydicom.errors.InvalidDicomError:
+        return InstanceResult(index=index, error="The file is not a valid DICOM file.")
+    except AttributeError:
+        return InstanceResult(
+            index=index, error="The DICOM file is missing required UID attributes."
+        )
+    except DicomProcessingError as e:
+        return InstanceResult(index=index, error=str(e))
+    except Exception as e:
+        logger.error("Error processing DICOM file: %s", e, exc_info=True)
+        return InstanceResult(index=index, error="An unexpected error occurred.")
+
+    return InstanceResult(
+        index=index, sop_instance_uid=image.sop_instance_uid, instance_id=image.id
+    )
+
+
 @router.patch(
     "/{source_message_id}/failure",
     response={
@@ -0,0 +1,104 @@
+import logging
+from datetime import timedelta
+
+import pydicom
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .dicom_recorder import DicomRecorder
+from .image_notifications import record_image_change
+from .models import DerivativeJob, DerivativeJobStatus, Image
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# A job still marked as running after this long is assumed to belong to a
+# worker that died, and can be claimed again.
+STALE_JOB_SECONDS = 600
+
+
+def render_image_derivatives(image_id) -> None:
+    """Render and store the preview images for an Image."""
+    image = Image.objects.select_related("series__study").get(pk=image_id)
+    with image.dicom_file.open("rb") as dicom_file:
+        ds = pydicom.dcmread(dicom_file)
+
+    renditions = DicomRecorder.dataset_to_renditions(image.sop_instance_uid, ds)
+    for field_name, jpeg in renditions.items():
+        getattr(image, field_name).save(jpeg.name, jpeg, save=False)
+    with transaction.atomic():
+        record_image_change(image, image.series.study.source_message_id)
+        image.save(update_fields=[*renditions, "revision"])
+
+
+def render_in_worker_process(image_id) -> None:
+    """
+    Entry point for render_image_derivatives in a process pool.
+
+    Worker processes outlive any single job, so they manage their own
+    database connection rather than relying on request signals.
+    """
+    close_old_connections()
+    try:
+        render_image_derivatives(image_id)
+    finally:
+        close_old_connections()
+
+
+class DerivativeService:
+    """Database-backed queue of images waiting for their previews to be rendered."""
+
+    @staticmethod
+    def claim(batch_size: int) -> list[DerivativeJob]:
+        """
+        Claim up to batch_size jobs for this worker.
+
+        Rows locked by another worker are skipped, so several workers can drain
+        the queue at the same time without rendering the same image twice.
+        """
+        stale_before = timezone.now() - timedelta(seconds=STALE_JOB_SECONDS)
+
+        with transaction.atomic():
+            jobs = list(
+                DerivativeJob.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=DerivativeJobStatus.PENDING)
+                    | Q(status=DerivativeJobStatus.RUNNING, updated_at__lt=stale_before)
+                )
+                .order_by("created_at")[:batch_size]
+            )
+            DerivativeJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=DerivativeJobStatus.RUNNING,
+                attempts=F("attempts") + 1,
+                updated_at=timezone.now(),
+            )
+
+        for job in jobs:
+            job.status = DerivativeJobStatus.RUNNING
+            job.attempts += 1
+
+        return jobs
+
+    @staticmethod
+    def complete(job: DerivativeJob):
+        job.status = DerivativeJobStatus.COMPLETE
+        job.last_error = ""
+        job.save(update_fields=["status", "last_error", "updated_at"])
+
+    @staticmethod
+    def fail(job: DerivativeJob, error: str):
+        """Record a failed render, returning the job to the queue until it runs out of attempts."""
+        logger.error(
+            "Failed to render derivatives for image %s (attempt %s): %s",
+            job.image_id,
+            job.attempts,
+            error,
+        )
+        job.status = (
+            DerivativeJobStatus.FAILED
+            if job.attempts >= MAX_ATTEMPTS
+            else DerivativeJobStatus.PENDING
+        )
+        job.last_error = error
+        job.save(update_fields=["status", "last_error", "updated_at"])
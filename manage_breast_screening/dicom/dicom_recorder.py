@@ -1,16 +1,23 @@
+import hashlib
 import io
 import logging
 from datetime import datetime
 
-import numpy as np
 import pydicom
 from django.core.files import File
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.db import connection, models, transaction
 from PIL import Image as PILImage
 
 from manage_breast_screening.gateway.models import GatewayAction
+from manage_breast_screening.participants.models.appointment import (
+    AppointmentStatusNames,
+)
 
-from .models import Image, Series, Study
+from . import windowing
+from .image_notifications import record_image_change
+from .metadata import extract_metadata
+from .models import DerivativeJob, Image, Series, Study
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +39,17 @@ class DicomRecorder:
                 "because the associated appointment is not in progress."
             )
 
-        ds = pydicom.dcmread(dicom_file)
+        return __class__.record(source_message_id, dicom_file)
+
+    @staticmethod
+    def record(source_message_id: str, dicom_file: File) -> tuple[Study, Series, Image]:
+        """
+        Record dicom_file without checking the appointment is in progress.
+
+        For callers that have already checked the appointment, such as when
+        several images are uploaded for it in one request.
+        """
+        ds = __class__.read_header(dicom_file)
         study_uid = ds.StudyInstanceUID
         series_uid = ds.SeriesInstanceUID
         sop_uid = ds.SOPInstanceUID
@@ -45,59 +62,166 @@ class DicomRecorder:
             f"PatientID={anonymised_patient_id}, source_message_id={source_message_id}"
         )
 
-        study, _ = Study.objects.get_or_create(
-            study_instance_uid=study_uid,
-            source_message_id=source_message_id,
-            defaults={
-                "patient_id": patient_id,
-                "date_and_time": __class__.study_date_and_time(ds),
-                "description": getattr(ds, "StudyDescription", ""),
-            },
-        )
-
-        series, _ = Series.objects.get_or_create(
-            series_instance_uid=series_uid,
-            study=study,
-            defaults={
-                "modality": getattr(ds, "Modality", ""),
-                "series_number": getattr(ds, "SeriesNumber", None),
-            },
-        )
-
         laterality = getattr(ds, "ImageLaterality", "")
         view_position = getattr(ds, "ViewPosition", "")
 
-        if series.images.count() > 0:
-            series_laterality = series.images.first().laterality
-            series_view_position = series.images.first().view_position
+        # Images from the same study often arrive in parallel, so each record
+        # is upserted in a single statement rather than with get_or_create,
+        # which can fail with an IntegrityError when two requests race.
+        with transaction.atomic():
+            study = __class__.upsert(
+                Study(
+                    study_instance_uid=study_uid,
+                    source_message_id=source_message_id,
+                    patient_id=patient_id,
+                    date_and_time=__class__.study_date_and_time(ds),
+                    description=getattr(ds, "StudyDescription", ""),
+                ),
+                "study_instance_uid",
+            )
+            # The upsert matches on the UID alone, so check the study isn't
+            # another action's before attaching images to it
+            if str(study.source_message_id) != str(source_message_id):
+                raise DicomProcessingError(
+                    f"Study {study_uid} belongs to source_message_id="
+                    f"{study.source_message_id}, not {source_message_id}."
+                )
 
-            if laterality != series_laterality or view_position != series_view_position:
+            series = __class__.upsert(
+                Series(
+                    series_instance_uid=series_uid,
+                    study=study,
+                    modality=getattr(ds, "Modality", ""),
+                    series_number=getattr(ds, "SeriesNumber", None),
+                    laterality=laterality,
+                    view_position=view_position,
+                ),
+                "series_instance_uid",
+            )
+
+            if laterality != series.laterality or view_position != series.view_position:
                 raise DicomProcessingError(
                     f"Inconsistent laterality and view position for series {series_uid}: "
-                    f"existing images have laterality={series_laterality} and "
-                    f"view_position={series_view_position}, but new image has "
+                    f"existing images have laterality={series.laterality} and "
+                    f"view_position={series.view_position}, but new image has "
                     f"laterality={laterality} and view_position={view_position}."
                 )
 
-        image, created = Image.objects.get_or_create(
-            sop_instance_uid=sop_uid,
-            series=series,
-            defaults={
-                "instance_number": getattr(ds, "InstanceNumber", None),
-                "laterality": laterality,
-                "view_position": view_position,
-                "implant_present": getattr(ds, "BreastImplantPresent", "").upper()
-                == "YES",
-            },
-        )
-        if created:
-            image.dicom_file.save(f"{sop_uid}.dcm", dicom_file)
-            image.image_file.save(
-                f"{sop_uid}.jpeg", __class__.dataset_to_jpeg(sop_uid, ds)
+            image = __class__.upsert(
+                Image(
+                    sop_instance_uid=sop_uid,
+                    series=series,
+                    instance_number=getattr(ds, "InstanceNumber", None),
+                    columns=getattr(ds, "Columns", None),
+                    laterality=laterality,
+                    view_position=view_position,
+                    implant_present=getattr(ds, "BreastImplantPresent", "").upper()
+                    == "YES",
+                    metadata=extract_metadata(ds),
+                ),
+                "sop_instance_uid",
             )
 
+        # The file is stored after the transaction so row locks aren't held
+        # during the upload. Any request that finds the image without a file
+        # stores it, so a retry completes an image whose earlier upload
+        # failed after its row was committed.
+        if not image.dicom_file:
+            __class__.store_dicom_file(image, dicom_file)
+            with transaction.atomic():
+                stored = (
+                    Image.objects.select_for_update()
+                    .values_list("dicom_file", flat=True)
+                    .get(pk=image.pk)
+                )
+                # Another request may have stored the file while this one was
+                # uploading it, in which case keep theirs
+                if stored:
+                    image.refresh_from_db(fields=["dicom_file", "sha256", "revision"])
+                else:
+                    record_image_change(image, source_message_id)
+                    image.save(update_fields=["dicom_file", "sha256", "revision"])
+                    # Previews are rendered by the render_dicom_derivatives worker
+                    DerivativeJob.objects.create(image=image)
+
         return study, series, image
 
+    @staticmethod
+    def upsert(record: models.Model, unique_field: str) -> models.Model:
+        """
+        Insert record, or fetch the existing row with the same unique_field.
+
+        Uses INSERT ... ON CONFLICT so the row is created or locked in one
+        round trip. The returned instance has an `inserted` attribute that is
+        True if this call created the row.
+        """
+        model = type(record)
+        fields = model._meta.concrete_fields
+        quote_name = connection.ops.quote_name
+        table = quote_name(model._meta.db_table)
+        columns = ", ".join(quote_name(field.column) for field in fields)
+        placeholders = ", ".join(["%s"] * len(fields))
+        conflict_column = quote_name(model._meta.get_field(unique_field).column)
+
+        # A no-op update, rather than DO NOTHING, so RETURNING includes the
+        # existing row. xmax is only zero for rows inserted by this statement.
+        sql = (
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({conflict_column}) "
+            f"DO UPDATE SET {conflict_column} = EXCLUDED.{conflict_column} "
+            f"RETURNING {columns}, (xmax = 0) AS inserted"
+        )
+        params = [
+            field.get_db_prep_save(field.pre_save(record, add=True), connection)
+            for field in fields
+        ]
+        return next(iter(model.objects.raw(sql, params)))
+
+    @staticmethod
+    def store_dicom_file(image: Image, dicom_file: File):
+        """
+        Store dicom_file under its SHA-256 digest, without saving image.
+
+        If a file with the same content has already been stored, for example
+        by a retried upload, it is reused rather than written again.
+        """
+        image.sha256 = __class__.sha256(dicom_file)
+        name = Image.dicom_file_name(image.sha256)
+        if image.dicom_file.storage.exists(name):
+            image.dicom_file.name = name
+        else:
+            image.dicom_file.save(name, dicom_file, save=False)
+
+    @staticmethod
+    def sha256(dicom_file: File) -> str:
+        """
+        Return the hex SHA-256 digest of dicom_file.
+
+        Uses the digest computed while the file was received if there is one,
+        otherwise reads the file and rewinds it.
+        """
+        if digest := getattr(dicom_file, "sha256", None):
+            return digest
+
+        dicom_file.seek(0)
+        digest = hashlib.file_digest(dicom_file, "sha256").hexdigest()
+        dicom_file.seek(0)
+        return digest
+
+    @staticmethod
+    def read_header(dicom_file: File) -> pydicom.Dataset:
+        """
+        Parse the DICOM header without reading the pixel data.
+
+        The file is rewound afterwards so it can be streamed on to storage.
+        Large uploads are spooled to a temporary file by Django's upload
+        handlers, so only the header needs to be held in memory here.
+        """
+        dicom_file.seek(0)
+        ds = pydicom.dcmread(dicom_file, stop_before_pixels=True)
+        dicom_file.seek(0)
+        return ds
+
     @staticmethod
     def study_date_and_time(ds) -> datetime | None:
         study_date = getattr(ds, "StudyDate", "")
@@ -111,25 +235,48 @@ class DicomRecorder:
     @staticmethod
     def dataset_to_jpeg(sop_uid: str, ds: pydicom.Dataset) -> InMemoryUploadedFile:
         """Convert a DICOM dataset to a JPEG image and return it as an InMemoryUploadedFile."""
-        # Normalize pixel data to 0-255 and convert to uint8
-        pixel_array = ds.pixel_array
-        pixel_array = pixel_array.astype(np.float32)
-
-        if getattr(ds, "PhotometricInterpretation", "") == "MONOCHROME1":
-            pixel_array = np.max(pixel_array) - pixel_array
-
-        pixel_array -= pixel_array.min()
-        pixel_array /= pixel_array.max()
-        pixel_array *= 255.0
-        pixel_array = pixel_array.astype(np.uint8)
-        # Create a PIL image from the pixel array
-        image = PILImage.fromarray(pixel_array, mode="L")
+        return __class__.encode_jpeg(f"{sop_uid}.jpeg", __class__.dataset_to_pil(ds))
+
+    @staticmethod
+    def dataset_to_renditions(
+        sop_uid: str, ds: pydicom.Dataset
+    ) -> dict[str, InMemoryUploadedFile]:
+        """
+        Convert a DICOM dataset to thumbnail, screen and full resolution JPEGs.
+
+        The pixel data is decoded once and each rendition is downsized from
+        that, keyed by the Image field it should be saved to.
+        """
+        image = __class__.dataset_to_pil(ds)
+        renditions = {"image_file": __class__.encode_jpeg(f"{sop_uid}.jpeg", image)}
+
+        for field_name, name, width in [
+            ("screen_file", "screen", Image.SCREEN_WIDTH),
+            ("thumbnail_file", "thumbnail", Image.THUMBNAIL_WIDTH),
+        ]:
+            # Each rendition is reduced from the previous, larger one
+            image = image.copy()
+            image.thumbnail((width, image.height))
+            renditions[field_name] = __class__.encode_jpeg(
+                f"{sop_uid}_{name}.jpeg", image
+            )
+
+        return renditions
+
+    @staticmethod
+    def dataset_to_pil(ds: pydicom.Dataset) -> PILImage.Image:
+        """Convert a DICOM dataset's pixel data to an 8-bit greyscale PIL image."""
+        pixel_array = windowing.to_display(ds, ds.pixel_array)
+        return PILImage.fromarray(pixel_array, mode="L")
+
+    @staticmethod
+    def encode_jpeg(name: str, image: PILImage.Image) -> InMemoryUploadedFile:
         in_memory_file = io.BytesIO()
         image.save(in_memory_file, format="JPEG")
 
         return InMemoryUploadedFile(
             in_memory_file,
-            name=f"{sop_uid}.jpeg",
+            name=name,
             field_name="file",
             content_type="image/jpeg",
             size=in_memory_file.getbuffer().nbytes,
@@ -138,7 +285,10 @@ class DicomRecorder:
 
     @staticmethod
     def appointment_in_progress(source_message_id: str) -> bool:
-        gateway_action = GatewayAction.objects.filter(id=source_message_id).first()
-        if not gateway_action or not gateway_action.appointment:
-            return False
-        return gateway_action.appointment.current_status.is_in_progress()
+        """Check the action's appointment status in one query."""
+        current_status_name = (
+            GatewayAction.objects.filter(id=source_message_id)
+            .values_list("appointment__current_status_name", flat=True)
+            .first()
+        )
+        return current_status_name == AppointmentStatusNames.IN_PROGRESS
@@ -0,0 +1,99 @@
+"""
+Notifies open image streams when an appointment's images change, using
+Postgres LISTEN/NOTIFY.
+
+Each time ingest stores an Image or renders its previews, the image is
+given the next revision for its gateway action and the appointment's id is
+published on IMAGES_CHANNEL. The notification is only delivered once the
+ingesting transaction commits, so a listener that hears it can read the
+new rows straight away.
+"""
+
+import logging
+import uuid
+
+from django.db import connection
+
+from manage_breast_screening.gateway.models import GatewayAction
+
+from .models import Image
+
+logger = logging.getLogger(__name__)
+
+IMAGES_CHANNEL = "dicom_images"
+
+
+def record_image_change(image: Image, source_message_id: str):
+    """
+    Set image.revision to the next revision for its gateway action, and
+    notify listeners for the action's appointment.
+
+    Call this in the transaction that saves the image, and save the
+    revision with it. The action's row stays locked until that transaction
+    commits, so the revisions of an action's images become visible in
+    increasing order and a stream can resume from the last one it sent.
+    """
+    try:
+        action_id = uuid.UUID(str(source_message_id))
+    except ValueError:
+        return
+
+    # Bump the revision and notify in the same statement
+    table = connection.ops.quote_name(GatewayAction._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH action AS ("
+            f" UPDATE {table} SET last_image_revision = last_image_revision + 1"
+            f" WHERE id = %s RETURNING appointment_id, last_image_revision"
+            f") SELECT last_image_revision, pg_notify(%s, appointment_id::text)"
+            f" FROM action",
+            [action_id, IMAGES_CHANNEL],
+        )
+        row = cursor.fetchone()
+
+    if row is not None:
+        image.revision = row[0]
+
+
+class ImageNotificationListener:
+    """
+    Waits for notifications about any appointment's images.
+
+    Each listener holds its own database connection for as long as it is
+    open, separate from the connection Django uses for queries. Use it as a
+    context manager so the connection is closed when it is done with.
+    """
+
+    def __init__(self):
+        self.pgconn = None
+
+    def __enter__(self) -> "ImageNotificationListener":
+        self.pgconn = connection.get_new_connection(connection.get_connection_params())
+        self.pgconn.autocommit = True
+        self.pgconn.execute(f"LISTEN {IMAGES_CHANNEL}")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pgconn.close()
+        self.pgconn = None
+
+    def wait(self, timeout: float) -> set[str]:
+        """
+        Wait up to timeout seconds for notifications.
+
+        Returns the ids of the appointments notified about, as soon as there
+        are any, or an empty set if none arrived in time. A burst of
+        notifications is returned together.
+        """
+        appointment_ids = set()
+        # The generator holds the connection's lock until it is closed
+        notifies = self.pgconn.notifies(timeout=timeout, stop_after=1)
+        try:
+            appointment_ids.update(notify.payload for notify in notifies)
+        finally:
+            notifies.close()
+
+        if appointment_ids:
+            for notify in self.pgconn.notifies(timeout=0):
+                appointment_ids.add(notify.payload)
+        return appointment_ids
@@ -0,0 +1,56 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from manage_breast_screening.dicom.dicom_recorder import DicomRecorder
+from manage_breast_screening.dicom.metadata import extract_metadata
+from manage_breast_screening.dicom.models import Image
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract the DICOM_METADATA_TAGS attributes of stored DICOM files into "
+        "Image.metadata, for images received before the setting changed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing-only",
+            action="store_true",
+            help="Only index images that have no metadata yet",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of images to update at a time",
+        )
+
+    def handle(self, *args, **options):
+        images = Image.objects.exclude(dicom_file="").only("id", "dicom_file")
+        if options["missing_only"]:
+            images = images.filter(metadata={})
+
+        batch = []
+        count = 0
+        for image in images.iterator(chunk_size=options["batch_size"]):
+            try:
+                with image.dicom_file.open("rb") as dicom_file:
+                    image.metadata = extract_metadata(
+                        DicomRecorder.read_header(dicom_file)
+                    )
+            except Exception as e:
+                logger.error("Could not read DICOM file for image %s: %s", image.id, e)
+                continue
+
+            batch.append(image)
+            if len(batch) >= options["batch_size"]:
+                count += Image.objects.bulk_update(batch, ["metadata"])
+                batch = []
+
+        if batch:
+            count += Image.objects.bulk_update(batch, ["metadata"])
+
+        self.stdout.write(f"Indexed metadata for {count} images")
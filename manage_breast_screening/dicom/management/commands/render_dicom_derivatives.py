@@ -0,0 +1,109 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from manage_breast_screening.dicom.derivative_service import (
+    DerivativeService,
+    render_in_worker_process,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Render preview images for uploaded DICOM files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.DICOM_RENDER_WORKERS or os.cpu_count() or 1,
+            help="Number of rendering processes (defaults to DICOM_RENDER_WORKERS)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Jobs to claim at a time (defaults to twice the number of workers)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait before polling an empty queue again",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling for new jobs",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        batch_size = options["batch_size"] or workers * 2
+
+        pool = self.create_pool(workers)
+        try:
+            while True:
+                jobs = DerivativeService.claim(batch_size)
+
+                if not jobs:
+                    if options["once"]:
+                        return
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                if not self.render(pool, jobs):
+                    # A worker died mid-job, for example when it ran out of
+                    # memory, and the pool can't take any more work
+                    logger.error("Rendering pool broke, starting a new one")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.create_pool(workers)
+        finally:
+            pool.shutdown()
+
+    def create_pool(self, workers):
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+            max_tasks_per_child=settings.DICOM_RENDER_MAX_TASKS_PER_CHILD,
+        )
+
+    def render(self, pool, jobs):
+        """
+        Render a batch of jobs, returning False if the pool broke.
+
+        Every job that didn't finish is failed, which returns it to the
+        queue until it runs out of attempts. We can't tell which job killed
+        the worker, so this also stops one bad image retrying forever.
+        """
+        pool_ok = True
+        futures = {}
+        for job in jobs:
+            try:
+                futures[pool.submit(render_in_worker_process, job.image_id)] = job
+            except BrokenProcessPool as e:
+                pool_ok = False
+                DerivativeService.fail(job, str(e))
+
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    pool_ok = False
+                DerivativeService.fail(job, str(e))
+            else:
+                DerivativeService.complete(job)
+                logger.info("Rendered derivatives for image %s", job.image_id)
+
+        return pool_ok
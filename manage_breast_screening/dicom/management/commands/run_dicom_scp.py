@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from manage_breast_screening.dicom.storage_scp import (
+    DEFAULT_MAX_ASSOCIATIONS,
+    DEFAULT_PORT,
+    StorageSCP,
+)
+
+
+class Command(BaseCommand):
+    help = "Receive DICOM images from modalities over C-STORE"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ae-title",
+            default=os.getenv("DICOM_SCP_AE_TITLE", "MANAGE"),
+            help="AE title that modalities must call (defaults to DICOM_SCP_AE_TITLE)",
+        )
+        parser.add_argument("--host", default="0.0.0.0", help="Address to listen on")
+        parser.add_argument(
+            "--port",
+            type=int,
+            default=int(os.getenv("DICOM_SCP_PORT", DEFAULT_PORT)),
+            help="Port to listen on (defaults to DICOM_SCP_PORT)",
+        )
+        parser.add_argument(
+            "--max-associations",
+            type=int,
+            default=DEFAULT_MAX_ASSOCIATIONS,
+            help="Number of associations to handle at the same time",
+        )
+
+    def handle(self, *args, **options):
+        scp = StorageSCP(
+            ae_title=options["ae_title"],
+            max_associations=options["max_associations"],
+        )
+        scp.start((options["host"], options["port"]))
@@ -0,0 +1,61 @@
+"""
+Extract DICOM attributes into the JSON stored on Image.metadata.
+
+The attributes to keep are configured by keyword in the DICOM_METADATA_TAGS
+setting. Values are stored as JSON numbers, strings or lists, so they can be
+filtered and aggregated in the database without reading the DICOM file.
+"""
+
+from decimal import Decimal
+
+import pydicom
+from django.conf import settings
+from pydicom.multival import MultiValue
+from pydicom.valuerep import VR
+
+# Sequences and binary data aren't useful to query and can be large
+BINARY_VRS = {
+    VR.SQ,
+    VR.OB,
+    VR.OD,
+    VR.OF,
+    VR.OL,
+    VR.OV,
+    VR.OW,
+    VR.UN,
+    VR.OB_OW,
+    VR.US_OW,
+    VR.US_SS_OW,
+}
+
+
+def extract_metadata(ds: pydicom.Dataset, keywords=None) -> dict:
+    """
+    Return the attributes in ds with the given keywords, defaulting to the
+    DICOM_METADATA_TAGS setting.
+
+    Attributes that are missing, empty, sequences or binary are left out.
+    """
+    if keywords is None:
+        keywords = settings.DICOM_METADATA_TAGS
+
+    metadata = {}
+    for keyword in keywords:
+        if keyword not in ds:
+            continue
+        elem = ds[keyword]
+        if elem.is_empty or elem.VR in BINARY_VRS:
+            continue
+        metadata[keyword] = _json_value(elem.value)
+    return metadata
+
+
+def _json_value(value):
+    if isinstance(value, MultiValue | list | tuple):
+        return [_json_value(item) for item in value]
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float | Decimal):
+        return float(value)
+    # Strings, dates, times and person names
+    return str(value)
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:05
+
+import manage_breast_screening.dicom.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dicom', '0008_derivativejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='columns',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='screen_file',
+            field=models.FileField(blank=True, null=True, storage=manage_breast_screening.dicom.models.dicom_storage, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='thumbnail_file',
+            field=models.FileField(blank=True, null=True, storage=manage_breast_screening.dicom.models.dicom_storage, upload_to=''),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copy_from_first_image(apps, schema_editor):
+    Image = apps.get_model("dicom", "Image")
+    Series = apps.get_model("dicom", "Series")
+
+    first_image = Image.objects.filter(series=OuterRef("pk")).order_by("pk")
+    Series.objects.update(
+        laterality=Coalesce(Subquery(first_image.values("laterality")[:1]), Value("")),
+        view_position=Coalesce(
+            Subquery(first_image.values("view_position")[:1]), Value("")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dicom', '0009_image_columns_image_screen_file_image_thumbnail_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='series',
+            name='laterality',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='series',
+            name='view_position',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.RunPython(copy_from_first_image, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.3 on 2026-10-18 12:40
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dicom', '0011_image_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['metadata'], name='dicom_image_metadata_gin'),
+        ),
+    ]
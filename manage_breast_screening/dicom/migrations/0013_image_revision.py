@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dicom', '0012_image_metadata_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,9 +1,13 @@
 import uuid
 
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.files.storage import storages
 from django.db import models
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
 
+from manage_breast_screening.core.models import BaseModel
 from manage_breast_screening.manual_images.models import (
     IncompleteImagesReason,
     RepeatReason,
@@ -82,6 +86,9 @@ class Series(models.Model):
     study = models.ForeignKey(Study, on_delete=models.CASCADE, related_name="series")
     modality = models.CharField(max_length=16, blank=True)
     series_number = models.IntegerField(null=True, blank=True)
+    # Every image in a series shares its laterality and view position
+    laterality = models.CharField(max_length=16, blank=True)
+    view_position = models.CharField(max_length=16, blank=True)
     repeat_type = models.CharField(
         max_length=20, choices=RepeatType.choices, blank=True, null=True
     )
@@ -106,37 +113,71 @@ class Series(models.Model):
             return 0
         return self.images.count() - 1
 
-    @property
-    def laterality(self):
-        if not self.first_image:
-            return ""
-        return self.first_image.laterality
-
-    @property
-    def view_position(self):
-        if not self.first_image:
-            return ""
-        return self.first_image.view_position
-
     def __str__(self):
         return str(self.first_image) if self.first_image else self.series_instance_uid
 
 
+class ImageQuerySet(models.QuerySet):
+    def with_metadata(self, **values):
+        """
+        Filter to images whose metadata has all the given values, for example
+        with_metadata(Manufacturer="HOLOGIC", AnodeTargetMaterial="TUNGSTEN").
+        These lookups can use the GIN index on metadata.
+        """
+        return self.filter(metadata__contains=values)
+
+    def has_metadata(self, *keywords):
+        """Filter to images whose metadata includes all the given keywords."""
+        return self.filter(metadata__has_keys=keywords)
+
+    def annotate_metadata(self, keyword, output_field):
+        """
+        Annotate each image with a metadata value cast to output_field, so it
+        can be filtered on as a range or aggregated, for example
+        annotate_metadata("KVP", models.FloatField()).aggregate(Avg("KVP")).
+        """
+        return self.annotate(
+            **{keyword: Cast(KeyTextTransform(keyword, "metadata"), output_field)}
+        )
+
+
 class Image(models.Model):
+    # Widths of the downsized JPEG renditions, alongside the full resolution image_file
+    THUMBNAIL_WIDTH = 256
+    SCREEN_WIDTH = 1024
+
+    objects = ImageQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["sop_instance_uid"]),
+            GinIndex(fields=["metadata"], name="dicom_image_metadata_gin"),
         ]
 
     id = models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True)
     sop_instance_uid = models.CharField(max_length=128, unique=True)
     series = models.ForeignKey(Series, on_delete=models.CASCADE, related_name="images")
     instance_number = models.IntegerField(null=True, blank=True)
+    columns = models.PositiveIntegerField(null=True, blank=True)
     dicom_file = models.FileField(storage=dicom_storage)
+    # Hex SHA-256 digest of the DICOM file, which is stored under this key
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     image_file = models.FileField(storage=dicom_storage, null=True, blank=True)
+    screen_file = models.FileField(storage=dicom_storage, null=True, blank=True)
+    thumbnail_file = models.FileField(storage=dicom_storage, null=True, blank=True)
     laterality = models.CharField(max_length=16, blank=True)
     view_position = models.CharField(max_length=16, blank=True)
     implant_present = models.BooleanField(default=False)
+    # Attributes listed in the DICOM_METADATA_TAGS setting, by keyword
+    metadata = models.JSONField(default=dict, blank=True)
+    # Increases each time the image is stored or its previews are rendered,
+    # in the order those changes commit. Zero until the DICOM file is stored.
+    revision = models.PositiveIntegerField(default=0)
+
+    @staticmethod
+    def dicom_file_name(sha256: str) -> str:
+        """Storage name for a DICOM file, keyed by the digest of its content."""
+        return f"sha256/{sha256}.dcm"
 
     @property
     def laterality_and_view(self):
@@ -144,5 +185,57 @@ class Image(models.Model):
             return f"{self.laterality}{self.view_position}".upper()
         return ""
 
+    @property
+    def srcset(self) -> str:
+        """
+        The rendered JPEGs as an img srcset, smallest first, so browsers only
+        download the full resolution image when it is displayed at that size.
+        """
+        if not self.columns:
+            return ""
+
+        candidates = [
+            (self.thumbnail_file, min(self.THUMBNAIL_WIDTH, self.columns)),
+            (self.screen_file, min(self.SCREEN_WIDTH, self.columns)),
+            (self.image_file, self.columns),
+        ]
+        widths = set()
+        entries = []
+        for file, width in candidates:
+            if file and width not in widths:
+                widths.add(width)
+                entries.append(f"{file.url} {width}w")
+        return ", ".join(entries)
+
     def __str__(self):
         return self.laterality_and_view
+
+
+class DerivativeJobStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    RUNNING = "running", "Running"
+    COMPLETE = "complete", "Complete"
+    FAILED = "failed", "Failed"
+
+
+class DerivativeJob(BaseModel):
+    """Queued request to render the preview images for an uploaded DICOM file."""
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "updated_at"]),
+        ]
+
+    image = models.OneToOneField(
+        Image, on_delete=models.CASCADE, related_name="derivative_job"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=DerivativeJobStatus.choices,
+        default=DerivativeJobStatus.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.image_id} ({self.status})"
@@ -0,0 +1,153 @@
+"""
+Streaming parser for multipart/related request bodies, as used by DICOMweb
+STOW-RS to upload several DICOM instances in one request.
+
+Django only parses multipart/form-data, so this reads the body in chunks and
+spools each part to a temporary file, keeping at most
+FILE_UPLOAD_MAX_MEMORY_SIZE of a part in memory at a time.
+"""
+
+import hashlib
+from collections.abc import Iterator
+from email.parser import BytesHeaderParser
+from tempfile import SpooledTemporaryFile
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils.http import parse_header_parameters
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MultipartRelatedError(ValueError):
+    pass
+
+
+class Part(NamedTuple):
+    headers: dict[str, str]
+    content: SpooledTemporaryFile
+    # Hex SHA-256 digest of the content, computed as it was read
+    sha256: str
+
+
+def boundary_for(content_type: str, expected_type: str) -> bytes:
+    """
+    Return the boundary from a multipart/related Content-Type header.
+
+    Raises MultipartRelatedError if the header is not multipart/related with
+    a type parameter of expected_type.
+    """
+    media_type, params = parse_header_parameters(content_type)
+    if media_type != "multipart/related":
+        raise MultipartRelatedError(f"Expected multipart/related, not {media_type}")
+
+    part_type = params.get("type", "").lower()
+    if part_type != expected_type:
+        raise MultipartRelatedError(
+            f"Expected parts of type {expected_type}, not {part_type or 'unknown'}"
+        )
+
+    boundary = params.get("boundary")
+    if not boundary:
+        raise MultipartRelatedError("No boundary in Content-Type")
+
+    return boundary.encode("latin-1")
+
+
+def iter_parts(stream, boundary: bytes) -> Iterator[Part]:
+    """
+    Yield each part of a multipart body in stream.
+
+    Each part's content is rewound ready to be read, and is closed when the
+    next part is requested.
+    """
+    reader = _BoundaryReader(stream, boundary)
+    reader.skip_preamble()
+
+    while not reader.at_end():
+        headers = {
+            name.lower(): value
+            for name, value in BytesHeaderParser()
+            .parsebytes(reader.read_headers())
+            .items()
+        }
+        with SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        ) as content:
+            sha256 = hashlib.sha256()
+
+            def write(data):
+                sha256.update(data)
+                content.write(data)
+
+            reader.read_part_into(write)
+            content.seek(0)
+            yield Part(headers, content, sha256.hexdigest())
+
+
+class _BoundaryReader:
+    def __init__(self, stream, boundary: bytes):
+        self.stream = stream
+        self.delimiter = b"--" + boundary
+        self.buffer = b""
+        self.exhausted = False
+
+    def _fill(self) -> bool:
+        if self.exhausted:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.exhausted = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def _read_until(self, separator: bytes, write=None):
+        """
+        Consume the buffer up to and including separator, passing everything
+        before it to write. Only enough bytes to hold a partial separator are
+        kept between reads, so write receives the content as it streams in.
+        """
+        while True:
+            index = self.buffer.find(separator)
+            if index != -1:
+                if write:
+                    write(self.buffer[:index])
+                self.buffer = self.buffer[index + len(separator) :]
+                return
+
+            keep = len(separator) - 1
+            if write and len(self.buffer) > keep:
+                write(self.buffer[:-keep])
+                self.buffer = self.buffer[-keep:]
+            if not self._fill():
+                raise MultipartRelatedError("Unexpected end of multipart body")
+
+    def skip_preamble(self):
+        self._read_until(self.delimiter)
+
+    def _fill_to(self, size: int):
+        while len(self.buffer) < size and self._fill():
+            pass
+
+    def at_end(self) -> bool:
+        """Consume the end of a delimiter line, returning True if it was the last."""
+        self._fill_to(2)
+        if self.buffer.startswith(b"--"):
+            return True
+        self._read_until(b"\r\n")
+        return False
+
+    def read_headers(self) -> bytes:
+        self._fill_to(2)
+        if self.buffer.startswith(b"\r\n"):
+            # A part with no headers
+            self.buffer = self.buffer[2:]
+            return b""
+
+        headers = []
+        self._read_until(b"\r\n\r\n", headers.append)
+        return b"".join(headers)
+
+    def read_part_into(self, write):
+        self._read_until(b"\r\n" + self.delimiter, write)
@@ -0,0 +1,137 @@
+"""
+DICOM C-STORE SCP that records images received directly from a modality.
+
+This is an alternative to the gateway uploading each image to the
+`dicom.api.upload` endpoint. Received datasets are written straight to a
+temporary file by pynetdicom, without being decoded, and then passed to
+DicomRecorder exactly as an upload would be, so large objects such as
+tomosynthesis images are never held in memory.
+"""
+
+import logging
+
+import pydicom
+from django.core.files import File
+from django.db import close_old_connections
+from pynetdicom import (
+    AE,
+    ALL_TRANSFER_SYNTAXES,
+    StoragePresentationContexts,
+    _config,
+    evt,
+)
+
+from manage_breast_screening.gateway.models import GatewayAction
+
+from .dicom_recorder import DicomProcessingError, DicomRecorder
+
+logger = logging.getLogger(__name__)
+
+# C-STORE response statuses, from PS3.4 Annex B.2.3
+STATUS_SUCCESS = 0x0000
+STATUS_OUT_OF_RESOURCES = 0xA700
+STATUS_CANNOT_UNDERSTAND = 0xC000
+STATUS_REJECTED = 0xC001
+
+DEFAULT_PORT = 11112
+DEFAULT_MAX_ASSOCIATIONS = 10
+
+
+class StorageSCP:
+    def __init__(self, ae_title: str, max_associations=DEFAULT_MAX_ASSOCIATIONS):
+        self.ae_title = ae_title
+        self.max_associations = max_associations
+
+    def build_ae(self) -> AE:
+        # Write received datasets to a temporary file instead of decoding them
+        _config.STORE_RECV_CHUNKED_DATASET = True
+
+        ae = AE(ae_title=self.ae_title)
+        ae.require_called_aet = True
+        ae.maximum_associations = self.max_associations
+        for context in StoragePresentationContexts:
+            ae.add_supported_context(context.abstract_syntax, ALL_TRANSFER_SYNTAXES)
+        return ae
+
+    def start(self, address: tuple[str, int], block=True):
+        """
+        Listen for associations on address.
+
+        Each association is handled in its own thread, up to max_associations
+        at once.
+        """
+        logger.info(
+            "Starting C-STORE SCP %s on %s:%s", self.ae_title, address[0], address[1]
+        )
+        return self.build_ae().start_server(
+            address,
+            block=block,
+            evt_handlers=[(evt.EVT_C_STORE, handle_store)],
+        )
+
+
+def handle_store(event) -> int:
+    """
+    Handle evt.EVT_C_STORE, returning the status to respond with.
+
+    Like a request, each dataset starts and ends by closing database
+    connections that have expired, as the association threads are never
+    passed Django's request signals.
+    """
+    close_old_connections()
+    try:
+        return record_dataset(event)
+    finally:
+        close_old_connections()
+
+
+def record_dataset(event) -> int:
+    calling_ae_title = event.assoc.requestor.ae_title
+
+    try:
+        with open(event.dataset_path, "rb") as dicom_file:
+            accession_number = getattr(
+                DicomRecorder.read_header(dicom_file), "AccessionNumber", ""
+            )
+            source_message_id = source_message_id_for(accession_number)
+            if source_message_id is None:
+                logger.warning(
+                    "Rejected C-STORE from %s: no gateway action for accession number %r",
+                    calling_ae_title,
+                    accession_number,
+                )
+                return STATUS_REJECTED
+
+            _, _, image = DicomRecorder.get_or_create_records(
+                source_message_id, File(dicom_file, name=event.dataset_path.name)
+            )
+
+    except DicomProcessingError as e:
+        logger.warning("Rejected C-STORE from %s: %s", calling_ae_title, e)
+        return STATUS_REJECTED
+    except (pydicom.errors.InvalidDicomError, AttributeError) as e:
+        logger.warning("Could not read C-STORE from %s: %s", calling_ae_title, e)
+        return STATUS_CANNOT_UNDERSTAND
+    except Exception as e:
+        logger.error("Error processing C-STORE: %s", e, exc_info=True)
+        return STATUS_OUT_OF_RESOURCES
+
+    logger.info(
+        "Stored image %s from %s for source_message_id=%s",
+        image.id,
+        calling_ae_title,
+        source_message_id,
+    )
+    return STATUS_SUCCESS
+
+
+def source_message_id_for(accession_number: str) -> str | None:
+    if not accession_number:
+        return None
+
+    action_id = (
+        GatewayAction.objects.filter(accession_number=accession_number)
+        .values_list("id", flat=True)
+        .first()
+    )
+    return str(action_id) if action_id else None
@@ -1,6 +1,6 @@
 import uuid
 
-from factory.declarations import Sequence, SubFactory
+from factory.declarations import SelfAttribute, Sequence, SubFactory
 from factory.django import DjangoModelFactory, FileField
 
 from .. import models
@@ -25,6 +25,8 @@ class SeriesFactory(DjangoModelFactory):
     study = SubFactory(StudyFactory)
     modality = "MG"
     series_number = Sequence(lambda n: n)
+    laterality = "L"
+    view_position = "CC"
 
 
 class ImageFactory(DjangoModelFactory):
@@ -34,6 +36,6 @@ class ImageFactory(DjangoModelFactory):
     sop_instance_uid = Sequence(lambda n: f"SOP{n:04d}")
     series = SubFactory("manage_breast_screening.dicom.tests.factories.SeriesFactory")
     instance_number = Sequence(lambda n: n)
-    laterality = "L"
-    view_position = "CC"
+    laterality = SelfAttribute("series.laterality")
+    view_position = SelfAttribute("series.view_position")
     image_file = FileField(filename="image.jpg")
@@ -1,3 +1,4 @@
+import hashlib
 import io
 import os
 from unittest.mock import MagicMock, patch
@@ -5,13 +6,20 @@ from unittest.mock import MagicMock, patch
 import pydicom
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
 from ninja.testing import TestClient
 
 from manage_breast_screening.core.api import api
 from manage_breast_screening.dicom.dicom_recorder import DicomRecorder
 from manage_breast_screening.dicom.models import Study
+from manage_breast_screening.dicom.tests.factories import ImageFactory
 from manage_breast_screening.gateway.models import GatewayActionStatus
 from manage_breast_screening.gateway.tests.factories import GatewayActionFactory
+from manage_breast_screening.participants.models.appointment import (
+    AppointmentStatusNames,
+)
+from manage_breast_screening.participants.tests.factories import AppointmentFactory
 
 os.environ["NINJA_SKIP_REGISTRY"] = "yes"
 
@@ -50,6 +58,32 @@ def test_upload_success(dataset, dicom_file, monkeypatch):
         assert study.source_message_id == "abc123"
 
 
+@pytest.mark.django_db
+def test_upload_stores_file_by_digest(client, dataset, monkeypatch):
+    monkeypatch.setenv("API_ENABLED", "true")
+    monkeypatch.setenv("API_AUTH_TOKEN", "testtoken")
+
+    with io.BytesIO() as buffer:
+        pydicom.dcmwrite(buffer, dataset, enforce_file_format=True)
+        content = buffer.getvalue()
+
+    with patch.object(DicomRecorder, "appointment_in_progress", return_value=True):
+        response = client.put(
+            "/api/v1/dicom/abc123",
+            data=encode_multipart(
+                BOUNDARY,
+                {"file": SimpleUploadedFile("temp.dcm", content)},
+            ),
+            content_type=MULTIPART_CONTENT,
+            headers={"Authorization": "Bearer testtoken"},
+        )
+
+    assert response.status_code == 201
+    image = Study.objects.get().images().get()
+    assert image.sha256 == hashlib.sha256(content).hexdigest()
+    assert image.dicom_file.name == f"sha256/{image.sha256}.dcm"
+
+
 def test_upload_no_file(monkeypatch):
     monkeypatch.setenv("API_ENABLED", "true")
     monkeypatch.setenv("API_AUTH_TOKEN", "testtoken")
@@ -211,3 +245,195 @@ def test_report_failure_action_not_found(monkeypatch):
 
     assert response.status_code == 404
     assert response.json()["title"] == "Not Found"
+
+
+@pytest.mark.django_db
+class TestStoreInstances:
+    @pytest.fixture(autouse=True)
+    def api_enabled(self, monkeypatch):
+        monkeypatch.setenv("API_ENABLED", "true")
+        monkeypatch.setenv("API_AUTH_TOKEN", "testtoken")
+
+    @pytest.fixture
+    def gateway_action(self):
+        return GatewayActionFactory(
+            appointment=AppointmentFactory(
+                current_status=AppointmentStatusNames.IN_PROGRESS
+            )
+        )
+
+    def encode(self, ds) -> bytes:
+        with io.BytesIO() as buffer:
+            pydicom.dcmwrite(buffer, ds, enforce_file_format=True)
+            return buffer.getvalue()
+
+    def post(self, client, source_message_id, *parts, content_type=None):
+        body = b""
+        for part in parts:
+            body += b"--BOUNDARY\r\nContent-Type: application/dicom\r\n\r\n"
+            body += part + b"\r\n"
+        body += b"--BOUNDARY--\r\n"
+
+        return client.post(
+            f"/api/v1/dicom/{source_message_id}/studies",
+            data=body,
+            content_type=content_type
+            or 'multipart/related; type="application/dicom"; boundary=BOUNDARY',
+            headers={"Authorization": "Bearer testtoken"},
+        )
+
+    def test_stores_each_instance(self, client, dataset, gateway_action):
+        first = self.encode(dataset)
+        dataset.SOPInstanceUID = pydicom.uid.generate_uid()
+        dataset.InstanceNumber = 2
+        second = self.encode(dataset)
+
+        response = self.post(client, gateway_action.id, first, second)
+
+        assert response.status_code == 200
+        assert response.json()["failed"] == []
+        stored = response.json()["stored"]
+        assert [instance["index"] for instance in stored] == [0, 1]
+        assert stored[1]["sop_instance_uid"] == dataset.SOPInstanceUID
+
+        study = Study.objects.get(source_message_id=str(gateway_action.id))
+        assert [str(image.id) for image in study.images()] == [
+            instance["instance_id"] for instance in stored
+        ]
+
+    def test_reports_failed_instances(self, client, dataset, gateway_action):
+        response = self.post(
+            client, gateway_action.id, self.encode(dataset), b"not a dicom file"
+        )
+
+        assert response.status_code == 202
+        assert len(response.json()["stored"]) == 1
+        assert response.json()["failed"] == [
+            {
+                "index": 1,
+                "sop_instance_uid": None,
+                "instance_id": None,
+                "error": "The file is not a valid DICOM file.",
+            }
+        ]
+
+    def test_all_instances_failed(self, client, gateway_action):
+        response = self.post(client, gateway_action.id, b"not a dicom file")
+
+        assert response.status_code == 409
+        assert response.json()["stored"] == []
+        assert not Study.objects.exists()
+
+    def test_inconsistent_instance_is_rolled_back(
+        self, client, dataset, gateway_action
+    ):
+        first = self.encode(dataset)
+        dataset.SOPInstanceUID = pydicom.uid.generate_uid()
+        dataset.ViewPosition = "MLO"
+        second = self.encode(dataset)
+
+        response = self.post(client, gateway_action.id, first, second)
+
+        assert response.status_code == 202
+        assert response.json()["failed"][0]["index"] == 1
+        assert Study.objects.get().images().count() == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_stores_files_outside_a_transaction(self, client, dataset, gateway_action):
+        store_dicom_file = DicomRecorder.store_dicom_file
+        in_atomic_block = []
+
+        def store_and_check(image, dicom_file):
+            in_atomic_block.append(connection.in_atomic_block)
+            store_dicom_file(image, dicom_file)
+
+        with patch.object(
+            DicomRecorder, "store_dicom_file", side_effect=store_and_check
+        ):
+            response = self.post(client, gateway_action.id, self.encode(dataset))
+
+        assert response.status_code == 200
+        assert in_atomic_block == [False]
+
+    def test_appointment_not_in_progress(self, client, dataset):
+        action = GatewayActionFactory(
+            appointment=AppointmentFactory(
+                current_status=AppointmentStatusNames.SCREENED
+            )
+        )
+
+        response = self.post(client, action.id, self.encode(dataset))
+
+        assert response.status_code == 400
+        assert response.json()["title"] == "Appointment not in progress"
+
+    def test_unsupported_content_type(self, client, dataset, gateway_action):
+        response = self.post(
+            client,
+            gateway_action.id,
+            self.encode(dataset),
+            content_type="multipart/form-data; boundary=BOUNDARY",
+        )
+
+        assert response.status_code == 415
+
+    def test_truncated_body(self, client, gateway_action):
+        response = client.post(
+            f"/api/v1/dicom/{gateway_action.id}/studies",
+            data=b"--BOUNDARY\r\n\r\ntruncated",
+            content_type='multipart/related; type="application/dicom"; boundary=BOUNDARY',
+            headers={"Authorization": "Bearer testtoken"},
+        )
+
+        assert response.status_code == 400
+        assert response.json()["title"] == "Invalid multipart body"
+
+    def test_keeps_stored_instances_when_body_is_truncated(
+        self, client, dataset, gateway_action
+    ):
+        body = b"--BOUNDARY\r\nContent-Type: application/dicom\r\n\r\n"
+        body += self.encode(dataset) + b"\r\n--BOUNDARY\r\n\r\ntruncated"
+
+        response = client.post(
+            f"/api/v1/dicom/{gateway_action.id}/studies",
+            data=body,
+            content_type='multipart/related; type="application/dicom"; boundary=BOUNDARY',
+            headers={"Authorization": "Bearer testtoken"},
+        )
+
+        assert response.status_code == 202
+        assert [instance["index"] for instance in response.json()["stored"]] == [0]
+        assert response.json()["failed"][0]["index"] == 1
+        assert "Invalid multipart body" in response.json()["failed"][0]["error"]
+        assert Study.objects.get().images().count() == 1
+
+
+@pytest.mark.django_db
+class TestFileExists:
+    @pytest.fixture(autouse=True)
+    def api_enabled(self, monkeypatch):
+        monkeypatch.setenv("API_ENABLED", "true")
+        monkeypatch.setenv("API_AUTH_TOKEN", "testtoken")
+
+    def test_file_exists(self, client):
+        image = ImageFactory.create(sha256="ab" * 32)
+
+        response = client.head(
+            f"/api/v1/dicom/files/{image.sha256}",
+            headers={"Authorization": "Bearer testtoken"},
+        )
+
+        assert response.status_code == 200
+
+    def test_file_does_not_exist(self, client):
+        response = client.head(
+            f"/api/v1/dicom/files/{'ab' * 32}",
+            headers={"Authorization": "Bearer testtoken"},
+        )
+
+        assert response.status_code == 404
+
+    def test_no_auth(self, client):
+        response = client.head(f"/api/v1/dicom/files/{'ab' * 32}")
+
+        assert response.status_code == 401
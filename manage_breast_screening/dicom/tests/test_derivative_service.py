@@ -0,0 +1,101 @@
+import io
+from datetime import timedelta
+
+import pydicom
+import pytest
+import time_machine
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from manage_breast_screening.dicom.derivative_service import (
+    MAX_ATTEMPTS,
+    STALE_JOB_SECONDS,
+    DerivativeService,
+    render_image_derivatives,
+)
+from manage_breast_screening.dicom.models import DerivativeJob, DerivativeJobStatus
+from manage_breast_screening.dicom.tests.factories import ImageFactory
+
+
+@pytest.mark.django_db
+class TestDerivativeService:
+    @pytest.fixture
+    def image(self, dataset):
+        image = ImageFactory.create(
+            sop_instance_uid=dataset.SOPInstanceUID, image_file=None
+        )
+        with io.BytesIO() as buffer:
+            pydicom.dcmwrite(buffer, dataset, enforce_file_format=True)
+            image.dicom_file.save(
+                f"{dataset.SOPInstanceUID}.dcm", ContentFile(buffer.getvalue())
+            )
+        return image
+
+    def test_render_image_derivatives(self, image, dataset):
+        render_image_derivatives(image.id)
+
+        image.refresh_from_db()
+        assert image.image_file.name.endswith(f"{dataset.SOPInstanceUID}.jpeg")
+        assert image.image_file.size > 0
+        assert image.image_file.storage.exists(image.image_file.name)
+        assert image.screen_file.name.endswith(f"{dataset.SOPInstanceUID}_screen.jpeg")
+        assert image.thumbnail_file.name.endswith(
+            f"{dataset.SOPInstanceUID}_thumbnail.jpeg"
+        )
+
+    def test_claim_marks_jobs_running(self, image):
+        job = DerivativeJob.objects.create(image=image)
+
+        claimed = DerivativeService.claim(batch_size=10)
+
+        assert claimed == [job]
+        job.refresh_from_db()
+        assert job.status == DerivativeJobStatus.RUNNING
+        assert job.attempts == 1
+
+    def test_claim_respects_batch_size(self):
+        for image in ImageFactory.create_batch(3):
+            DerivativeJob.objects.create(image=image)
+
+        assert len(DerivativeService.claim(batch_size=2)) == 2
+        assert len(DerivativeService.claim(batch_size=2)) == 1
+        assert DerivativeService.claim(batch_size=2) == []
+
+    def test_claim_reclaims_stale_running_jobs(self, image):
+        job = DerivativeJob.objects.create(image=image)
+        DerivativeService.claim(batch_size=10)
+
+        assert DerivativeService.claim(batch_size=10) == []
+
+        with time_machine.travel(
+            timezone.now() + timedelta(seconds=STALE_JOB_SECONDS + 1)
+        ):
+            assert DerivativeService.claim(batch_size=10) == [job]
+
+    def test_complete(self, image):
+        job = DerivativeJob.objects.create(image=image)
+        [job] = DerivativeService.claim(batch_size=10)
+
+        DerivativeService.complete(job)
+
+        job.refresh_from_db()
+        assert job.status == DerivativeJobStatus.COMPLETE
+
+    def test_fail_requeues_job(self, image):
+        DerivativeJob.objects.create(image=image)
+        [job] = DerivativeService.claim(batch_size=10)
+
+        DerivativeService.fail(job, "broken")
+
+        job.refresh_from_db()
+        assert job.status == DerivativeJobStatus.PENDING
+        assert job.last_error == "broken"
+
+    def test_fail_gives_up_after_max_attempts(self, image):
+        DerivativeJob.objects.create(image=image, attempts=MAX_ATTEMPTS - 1)
+        [job] = DerivativeService.claim(batch_size=10)
+
+        DerivativeService.fail(job, "broken")
+
+        job.refresh_from_db()
+        assert job.status == DerivativeJobStatus.FAILED
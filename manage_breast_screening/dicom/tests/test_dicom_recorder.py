@@ -1,3 +1,4 @@
+import hashlib
 import tempfile
 import uuid
 from datetime import datetime
@@ -6,12 +7,21 @@ from unittest.mock import patch
 import numpy as np
 import pydicom
 import pytest
+from django.core.files import File
+from django.utils import timezone
+from PIL import Image as PILImage
 
 from manage_breast_screening.dicom.dicom_recorder import (
     DicomProcessingError,
     DicomRecorder,
 )
-from manage_breast_screening.dicom.models import Image, Series, Study
+from manage_breast_screening.dicom.models import (
+    DerivativeJobStatus,
+    Image,
+    Series,
+    Study,
+)
+from manage_breast_screening.dicom.tests.factories import StudyFactory
 from manage_breast_screening.gateway.tests.factories import GatewayActionFactory
 from manage_breast_screening.participants.models.appointment import (
     AppointmentStatusNames,
@@ -19,6 +29,33 @@ from manage_breast_screening.participants.models.appointment import (
 from manage_breast_screening.participants.tests.factories import AppointmentFactory
 
 
+@pytest.mark.django_db
+class TestUpsert:
+    def test_inserts_new_record(self):
+        study = DicomRecorder.upsert(
+            Study(study_instance_uid="1.2.3", source_message_id="abc"),
+            "study_instance_uid",
+        )
+
+        assert study.inserted
+        assert Study.objects.get(pk=study.pk).study_instance_uid == "1.2.3"
+
+    def test_returns_existing_record(self):
+        existing = StudyFactory.create(study_instance_uid="1.2.3", description="Old")
+
+        study = DicomRecorder.upsert(
+            Study(
+                study_instance_uid="1.2.3", source_message_id="abc", description="New"
+            ),
+            "study_instance_uid",
+        )
+
+        assert not study.inserted
+        assert study.pk == existing.pk
+        assert study.description == "Old"
+        assert Study.objects.count() == 1
+
+
 @pytest.mark.django_db
 class TestDicomRecorder:
     @pytest.fixture
@@ -37,7 +74,8 @@ class TestDicomRecorder:
     def test_get_or_create_records(self, source_message_id, dataset, gateway_action):
         """
         Test that when a valid DICOM file is processed, the correct Study, Series, and Image records
-        are created with the expected attributes, and that the DICOM and JPEG files are stored correctly.
+        are created with the expected attributes, that the DICOM file is stored correctly, and that
+        a job is queued to render the JPEG.
         """
         with tempfile.NamedTemporaryFile() as temp_file:
             pydicom.filewriter.dcmwrite(
@@ -47,6 +85,8 @@ class TestDicomRecorder:
                 records = DicomRecorder.get_or_create_records(
                     source_message_id, dicom_file
                 )
+            with open(temp_file.name, "rb") as dicom_file:
+                sha256 = hashlib.file_digest(dicom_file, "sha256").hexdigest()
 
         assert records is not None
         study, series, image = records
@@ -58,21 +98,25 @@ class TestDicomRecorder:
         assert series.series_instance_uid == dataset.SeriesInstanceUID
         assert image.sop_instance_uid == dataset.SOPInstanceUID
         assert study.patient_id == dataset.PatientID
-        assert study.date_and_time == datetime(2024, 1, 1, 12, 0, 0)
+        assert study.date_and_time == timezone.make_aware(
+            datetime(2024, 1, 1, 12, 0, 0)
+        )
         assert study.description == dataset.StudyDescription
         assert series.modality == dataset.Modality
         assert series.series_number == dataset.SeriesNumber
         assert image.instance_number == dataset.InstanceNumber
         assert image.laterality == dataset.ImageLaterality
         assert image.view_position == dataset.ViewPosition
+        assert image.columns == dataset.Columns
+        assert image.metadata == {}
 
-        assert image.dicom_file.name.endswith(f"{dataset.SOPInstanceUID}.dcm")
+        assert image.sha256 == sha256
+        assert image.dicom_file.name == f"sha256/{sha256}.dcm"
         assert image.dicom_file.size > 0
         assert image.dicom_file.storage.exists(image.dicom_file.name)
 
-        assert image.image_file.name.endswith(f"{dataset.SOPInstanceUID}.jpeg")
-        assert image.image_file.size > 0
-        assert image.image_file.storage.exists(image.image_file.name)
+        assert not image.image_file
+        assert image.derivative_job.status == DerivativeJobStatus.PENDING
 
     def test_get_or_create_records_duplicate(
         self, source_message_id, dataset, gateway_action
@@ -99,6 +143,121 @@ class TestDicomRecorder:
                     image,
                 )
 
+    def test_get_or_create_records_duplicate_does_not_store_file_again(
+        self, source_message_id, dataset, gateway_action
+    ):
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                _, _, image = DicomRecorder.get_or_create_records(
+                    source_message_id, dicom_file
+                )
+
+            with open(temp_file.name, "rb") as dicom_file:
+                with patch.object(
+                    image.dicom_file.storage,
+                    "save",
+                    wraps=image.dicom_file.storage.save,
+                ) as save:
+                    _, _, duplicate = DicomRecorder.get_or_create_records(
+                        source_message_id, dicom_file
+                    )
+
+        save.assert_not_called()
+        assert duplicate.dicom_file.name == image.dicom_file.name
+        assert Image.objects.count() == 1
+
+    def test_get_or_create_records_reuses_stored_file_with_same_content(
+        self, source_message_id, dataset, gateway_action
+    ):
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                sha256 = hashlib.file_digest(dicom_file, "sha256").hexdigest()
+                storage = Image.dicom_file.field.storage
+                storage.save(Image.dicom_file_name(sha256), dicom_file)
+
+            with open(temp_file.name, "rb") as dicom_file:
+                with patch.object(storage, "save", wraps=storage.save) as save:
+                    _, _, image = DicomRecorder.get_or_create_records(
+                        source_message_id, dicom_file
+                    )
+
+        save.assert_not_called()
+        assert image.dicom_file.name == Image.dicom_file_name(sha256)
+
+    def test_get_or_create_records_uses_digest_computed_on_upload(
+        self, source_message_id, dataset, gateway_action
+    ):
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                upload = File(dicom_file, name="upload.dcm")
+                upload.sha256 = "a" * 64
+                _, _, image = DicomRecorder.get_or_create_records(
+                    source_message_id, upload
+                )
+
+        assert image.sha256 == "a" * 64
+
+    def test_get_or_create_records_extracts_metadata(
+        self, source_message_id, dataset, gateway_action, settings
+    ):
+        settings.DICOM_METADATA_TAGS = ["KVP", "CompressionForce", "Manufacturer"]
+        dataset.KVP = "29"
+        dataset.CompressionForce = "98.5"
+
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                _, _, image = DicomRecorder.get_or_create_records(
+                    source_message_id, dicom_file
+                )
+
+        image.refresh_from_db()
+        assert image.metadata == {"KVP": 29.0, "CompressionForce": 98.5}
+
+    def test_get_or_create_records_stores_laterality_and_view_on_series(
+        self, source_message_id, dataset, gateway_action
+    ):
+        dataset.ImageLaterality = "R"
+        dataset.ViewPosition = "MLO"
+
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                _, series, _ = DicomRecorder.get_or_create_records(
+                    source_message_id, dicom_file
+                )
+
+        series.refresh_from_db()
+        assert series.laterality == "R"
+        assert series.view_position == "MLO"
+
+    def test_get_or_create_records_query_count(
+        self, source_message_id, dataset, gateway_action, django_assert_num_queries
+    ):
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                # Status check, three upserts, locking the image, saving the
+                # file name, queueing the derivative job and notifying image
+                # streams, plus a savepoint pair for each transaction
+                with django_assert_num_queries(12):
+                    DicomRecorder.get_or_create_records(source_message_id, dicom_file)
+
     def test_get_or_create_records_invalid_laterality_and_view_position(
         self, source_message_id, dataset, gateway_action
     ):
@@ -126,6 +285,76 @@ class TestDicomRecorder:
                 with pytest.raises(DicomProcessingError):
                     DicomRecorder.get_or_create_records(source_message_id, dicom_file)
 
+    def test_get_or_create_records_invalid_laterality_and_view_position_rolls_back(
+        self, source_message_id, dataset, gateway_action
+    ):
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                DicomRecorder.get_or_create_records(source_message_id, dicom_file)
+
+        dataset.ViewPosition = "MLO"
+        dataset.SOPInstanceUID = pydicom.uid.generate_uid()
+
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                with pytest.raises(DicomProcessingError):
+                    DicomRecorder.get_or_create_records(source_message_id, dicom_file)
+
+        assert not Image.objects.filter(
+            sop_instance_uid=dataset.SOPInstanceUID
+        ).exists()
+
+    def test_get_or_create_records_rejects_study_of_another_action(
+        self, source_message_id, dataset, gateway_action
+    ):
+        StudyFactory.create(
+            study_instance_uid=dataset.StudyInstanceUID,
+            source_message_id=str(uuid.uuid4()),
+        )
+
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                with pytest.raises(DicomProcessingError):
+                    DicomRecorder.get_or_create_records(source_message_id, dicom_file)
+
+        assert not Image.objects.exists()
+
+    def test_get_or_create_records_stores_file_missed_by_failed_upload(
+        self, source_message_id, dataset, gateway_action
+    ):
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                with (
+                    patch.object(
+                        DicomRecorder, "store_dicom_file", side_effect=OSError
+                    ),
+                    pytest.raises(OSError),
+                ):
+                    DicomRecorder.get_or_create_records(source_message_id, dicom_file)
+
+            assert not Image.objects.get().dicom_file
+
+            with open(temp_file.name, "rb") as dicom_file:
+                _, _, image = DicomRecorder.get_or_create_records(
+                    source_message_id, dicom_file
+                )
+
+        assert image.dicom_file.storage.exists(image.dicom_file.name)
+        assert Image.objects.get().dicom_file.name == image.dicom_file.name
+        assert image.derivative_job.status == DerivativeJobStatus.PENDING
+
     def test_get_or_create_records_invalid_dicom(
         self, source_message_id, gateway_action
     ):
@@ -196,6 +425,21 @@ class TestDicomRecorder:
         assert image.implant_present is expected
 
 
+class TestReadHeader:
+    def test_read_header_stops_before_pixel_data(self, dataset):
+        with tempfile.NamedTemporaryFile() as temp_file:
+            pydicom.filewriter.dcmwrite(
+                temp_file.name, dataset, write_like_original=False
+            )
+            with open(temp_file.name, "rb") as dicom_file:
+                ds = DicomRecorder.read_header(dicom_file)
+
+                assert ds.SOPInstanceUID == dataset.SOPInstanceUID
+                assert ds.ImageLaterality == dataset.ImageLaterality
+                assert "PixelData" not in ds
+                assert dicom_file.tell() == 0
+
+
 class TestJpegConversion:
     def test_dataset_to_jpeg(self, dataset):
         expected_pixel_array = self.expected_pixel_array(dataset)
@@ -209,6 +453,7 @@ class TestJpegConversion:
             assert mock_fromarray.call_args[1]["mode"] == "L"
 
     def test_dataset_to_jpeg_monochrome1(self, dataset):
+        dataset.PhotometricInterpretation = "MONOCHROME1"
         expected_pixel_array = self.expected_pixel_array(dataset)
 
         with patch(f"{DicomRecorder.__module__}.PILImage.fromarray") as mock_fromarray:
@@ -217,11 +462,45 @@ class TestJpegConversion:
             assert mock_fromarray.call_args[0][0].shape == expected_pixel_array.shape
             assert np.array_equal(mock_fromarray.call_args[0][0], expected_pixel_array)
 
+    def test_dataset_to_renditions(self, dataset):
+        dataset.Rows = 256
+        dataset.Columns = 128
+        dataset.PixelData = np.zeros((256, 128), dtype=np.int16).tobytes()
+
+        renditions = DicomRecorder.dataset_to_renditions(
+            dataset.SOPInstanceUID, dataset
+        )
+
+        sizes = {
+            field_name: PILImage.open(jpeg).size
+            for field_name, jpeg in renditions.items()
+        }
+        assert sizes == {
+            "image_file": (128, 256),
+            "screen_file": (128, 256),
+            "thumbnail_file": (128, 256),
+        }
+
+    def test_dataset_to_renditions_downsizes_large_images(self, dataset):
+        dataset.Rows = 2048
+        dataset.Columns = 1536
+        dataset.PixelData = np.zeros((2048, 1536), dtype=np.int16).tobytes()
+
+        renditions = DicomRecorder.dataset_to_renditions(
+            dataset.SOPInstanceUID, dataset
+        )
+
+        assert renditions["image_file"].name == f"{dataset.SOPInstanceUID}.jpeg"
+        assert PILImage.open(renditions["image_file"]).size == (1536, 2048)
+        assert PILImage.open(renditions["screen_file"]).size == (1024, 1365)
+        assert PILImage.open(renditions["thumbnail_file"]).size == (256, 341)
+
     def expected_pixel_array(self, dataset):
-        pixel_array = dataset.pixel_array.astype(np.float32)
-        if getattr(dataset, "PhotometricInterpretation", "") == "MONOCHROME1":
-            pixel_array = np.max(pixel_array) - pixel_array
+        pixel_array = dataset.pixel_array.astype(np.float64)
         pixel_array -= pixel_array.min()
         pixel_array /= pixel_array.max()
         pixel_array *= 255.0
-        return pixel_array.astype(np.uint8)
+        pixel_array = np.round(pixel_array).astype(np.uint8)
+        if getattr(dataset, "PhotometricInterpretation", "") == "MONOCHROME1":
+            pixel_array = 255 - pixel_array
+        return pixel_array
@@ -0,0 +1,65 @@
+import pytest
+
+from manage_breast_screening.dicom.image_notifications import (
+    ImageNotificationListener,
+    record_image_change,
+)
+from manage_breast_screening.gateway.tests.factories import GatewayActionFactory
+
+from .factories import ImageFactory
+
+
+@pytest.mark.django_db
+class TestRecordImageChange:
+    def test_gives_each_change_the_next_revision_for_the_action(self):
+        action = GatewayActionFactory.create()
+        first, second = ImageFactory.build_batch(2)
+
+        record_image_change(first, str(action.id))
+        record_image_change(second, str(action.id))
+        record_image_change(first, str(action.id))
+
+        assert (first.revision, second.revision) == (3, 2)
+        action.refresh_from_db()
+        assert action.last_image_revision == 3
+
+    def test_ignores_source_message_ids_that_are_not_actions(self):
+        image = ImageFactory.build()
+
+        record_image_change(image, "not-a-uuid")
+
+        assert image.revision == 0
+
+
+@pytest.mark.django_db(transaction=True)
+class TestImageNotificationListener:
+    def test_returns_the_appointments_notified_about(self):
+        action = GatewayActionFactory.create()
+        other_action = GatewayActionFactory.create()
+
+        with ImageNotificationListener() as listener:
+            record_image_change(ImageFactory.build(), str(action.id))
+            record_image_change(ImageFactory.build(), str(other_action.id))
+
+            notified = listener.wait(timeout=5)
+            # Both may not have arrived in the same packet
+            notified |= listener.wait(timeout=0.1)
+
+        assert notified == {
+            str(action.appointment_id),
+            str(other_action.appointment_id),
+        }
+
+    def test_returns_bursts_together(self):
+        action = GatewayActionFactory.create()
+
+        with ImageNotificationListener() as listener:
+            for _ in range(3):
+                record_image_change(ImageFactory.build(), str(action.id))
+
+            assert listener.wait(timeout=5) == {str(action.appointment_id)}
+            assert listener.wait(timeout=0.1) == set()
+
+    def test_returns_nothing_when_no_notifications_arrive(self):
+        with ImageNotificationListener() as listener:
+            assert listener.wait(timeout=0.1) == set()
@@ -0,0 +1,39 @@
+import pydicom
+from pydicom.sequence import Sequence
+
+from manage_breast_screening.dicom.metadata import extract_metadata
+
+
+class TestExtractMetadata:
+    def test_extracts_values_as_json(self, dataset):
+        dataset.KVP = "29.5"
+        dataset.Exposure = "120"
+        dataset.Manufacturer = "HOLOGIC, Inc."
+        dataset.AcquisitionDate = "20240101"
+        dataset.ImageType = ["ORIGINAL", "PRIMARY"]
+
+        assert extract_metadata(
+            dataset,
+            ["KVP", "Exposure", "Manufacturer", "AcquisitionDate", "ImageType"],
+        ) == {
+            "KVP": 29.5,
+            "Exposure": 120,
+            "Manufacturer": "HOLOGIC, Inc.",
+            "AcquisitionDate": "20240101",
+            "ImageType": ["ORIGINAL", "PRIMARY"],
+        }
+
+    def test_leaves_out_missing_and_empty_values(self, dataset):
+        dataset.KVP = None
+
+        assert extract_metadata(dataset, ["KVP", "CompressionForce"]) == {}
+
+    def test_leaves_out_sequences_and_binary_values(self, dataset):
+        dataset.ViewCodeSequence = Sequence([pydicom.Dataset()])
+
+        assert extract_metadata(dataset, ["ViewCodeSequence", "PixelData"]) == {}
+
+    def test_uses_setting_by_default(self, dataset, settings):
+        settings.DICOM_METADATA_TAGS = ["Modality"]
+
+        assert extract_metadata(dataset) == {"Modality": "MG"}
@@ -1,6 +1,8 @@
 import pytest
+from django.db import models
+from django.db.models import Avg
 
-from manage_breast_screening.dicom.models import Study
+from manage_breast_screening.dicom.models import Image, Study
 from manage_breast_screening.dicom.tests.factories import (
     ImageFactory,
     SeriesFactory,
@@ -66,28 +68,6 @@ class TestSeries:
 
         assert series.extra_count == 0
 
-    def test_series_laterality(self):
-        series = SeriesFactory.create()
-        ImageFactory.create(series=series, laterality="R")
-
-        assert series.laterality == "R"
-
-    def test_series_laterality_no_images(self):
-        series = SeriesFactory.create()
-
-        assert series.laterality == ""
-
-    def test_series_view_position(self):
-        series = SeriesFactory.create()
-        ImageFactory.create(series=series, view_position="MLO")
-
-        assert series.view_position == "MLO"
-
-    def test_series_view_position_no_images(self):
-        series = SeriesFactory.create()
-
-        assert series.view_position == ""
-
 
 @pytest.mark.django_db
 class TestImage:
@@ -108,6 +88,60 @@ class TestImage:
 
         assert image.laterality_and_view == expected
 
+    def test_srcset(self):
+        image = ImageFactory.build(
+            columns=3328,
+            image_file="full.jpeg",
+            screen_file="screen.jpeg",
+            thumbnail_file="thumbnail.jpeg",
+        )
+
+        assert image.srcset == (
+            "/dicom/thumbnail.jpeg 256w, /dicom/screen.jpeg 1024w, /dicom/full.jpeg 3328w"
+        )
+
+    def test_srcset_skips_renditions_no_smaller_than_the_image(self):
+        image = ImageFactory.build(
+            columns=800,
+            image_file="full.jpeg",
+            screen_file="screen.jpeg",
+            thumbnail_file="thumbnail.jpeg",
+        )
+
+        assert image.srcset == "/dicom/thumbnail.jpeg 256w, /dicom/screen.jpeg 800w"
+
+    def test_srcset_without_renditions(self):
+        image = ImageFactory.build(columns=None)
+
+        assert image.srcset == ""
+
     def test_image_str_representation(self):
         image = ImageFactory.build(laterality="R", view_position="MLO")
         assert str(image) == "RMLO"
+
+
+@pytest.mark.django_db
+class TestImageQuerySet:
+    def test_with_metadata(self):
+        hologic = ImageFactory.create(metadata={"Manufacturer": "HOLOGIC", "KVP": 29.0})
+        ImageFactory.create(metadata={"Manufacturer": "GE", "KVP": 29.0})
+
+        assert list(Image.objects.with_metadata(Manufacturer="HOLOGIC", KVP=29.0)) == [
+            hologic
+        ]
+
+    def test_has_metadata(self):
+        with_force = ImageFactory.create(metadata={"CompressionForce": 100})
+        ImageFactory.create(metadata={})
+
+        assert list(Image.objects.has_metadata("CompressionForce")) == [with_force]
+
+    def test_annotate_metadata(self):
+        ImageFactory.create(metadata={"KVP": 28.0})
+        ImageFactory.create(metadata={"KVP": 31.0})
+        ImageFactory.create(metadata={})
+
+        images = Image.objects.annotate_metadata("KVP", models.FloatField())
+
+        assert images.filter(KVP__gt=29).count() == 1
+        assert images.aggregate(average=Avg("KVP")) == {"average": 29.5}
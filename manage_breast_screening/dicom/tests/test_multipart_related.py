@@ -0,0 +1,78 @@
+import hashlib
+import io
+
+import pytest
+
+from manage_breast_screening.dicom import multipart_related
+from manage_breast_screening.dicom.multipart_related import (
+    MultipartRelatedError,
+    boundary_for,
+    iter_parts,
+)
+
+
+def multipart_body(*parts: bytes, boundary=b"BOUNDARY") -> bytes:
+    body = b"preamble\r\n"
+    for part in parts:
+        body += b"--" + boundary + b"\r\nContent-Type: application/dicom\r\n\r\n"
+        body += part + b"\r\n"
+    return body + b"--" + boundary + b"--\r\n"
+
+
+def read_parts(body: bytes, boundary=b"BOUNDARY"):
+    return [
+        (part.headers, part.content.read())
+        for part in iter_parts(io.BytesIO(body), boundary)
+    ]
+
+
+class TestBoundaryFor:
+    def test_returns_boundary(self):
+        content_type = 'multipart/related; type="application/dicom"; boundary=abc123'
+
+        assert boundary_for(content_type, "application/dicom") == b"abc123"
+
+    @pytest.mark.parametrize(
+        "content_type",
+        [
+            "multipart/form-data; boundary=abc123",
+            "multipart/related; type=application/json; boundary=abc123",
+            "multipart/related; boundary=abc123",
+            "multipart/related; type=application/dicom",
+        ],
+    )
+    def test_rejects_other_content_types(self, content_type):
+        with pytest.raises(MultipartRelatedError):
+            boundary_for(content_type, "application/dicom")
+
+
+class TestIterParts:
+    def test_reads_each_part(self):
+        parts = read_parts(multipart_body(b"first", b"second\r\nline"))
+
+        assert parts == [
+            ({"content-type": "application/dicom"}, b"first"),
+            ({"content-type": "application/dicom"}, b"second\r\nline"),
+        ]
+
+    def test_reads_parts_split_across_chunks(self, monkeypatch):
+        monkeypatch.setattr(multipart_related, "CHUNK_SIZE", 3)
+        content = bytes(range(256)) * 10
+
+        parts = read_parts(multipart_body(content, b"-- not the boundary"))
+
+        assert [part for _, part in parts] == [content, b"-- not the boundary"]
+
+    def test_computes_digest_of_each_part(self):
+        parts = list(iter_parts(io.BytesIO(multipart_body(b"first")), b"BOUNDARY"))
+
+        assert parts[0].sha256 == hashlib.sha256(b"first").hexdigest()
+
+    def test_reads_empty_body(self):
+        assert read_parts(b"--BOUNDARY--\r\n") == []
+
+    def test_raises_if_body_ends_early(self):
+        body = multipart_body(b"first")[:-20]
+
+        with pytest.raises(MultipartRelatedError):
+            read_parts(body)
@@ -0,0 +1,83 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+
+from manage_breast_screening.dicom.management.commands import (
+    render_dicom_derivatives,
+)
+from manage_breast_screening.dicom.models import DerivativeJob, DerivativeJobStatus
+from manage_breast_screening.dicom.tests.factories import ImageFactory
+
+
+class FakePool:
+    """Runs nothing, and either succeeds or breaks for every job."""
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        if self.broken:
+            future.set_exception(BrokenProcessPool("A worker died"))
+        else:
+            future.set_result(None)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.mark.django_db
+class TestRenderDicomDerivatives:
+    def test_replaces_a_broken_pool_and_retries_its_jobs(self):
+        jobs = [
+            DerivativeJob.objects.create(image=image)
+            for image in ImageFactory.create_batch(2)
+        ]
+        broken_pool = FakePool(broken=True)
+        new_pool = FakePool()
+
+        with patch.object(
+            render_dicom_derivatives,
+            "ProcessPoolExecutor",
+            side_effect=[broken_pool, new_pool],
+        ):
+            call_command(
+                "render_dicom_derivatives",
+                "--once",
+                "--workers",
+                "1",
+                stdout=StringIO(),
+            )
+
+        assert broken_pool.shut_down
+        assert new_pool.shut_down
+        for job in jobs:
+            job.refresh_from_db()
+            assert job.status == DerivativeJobStatus.COMPLETE
+            assert job.attempts == 2
+
+    def test_fails_jobs_that_keep_breaking_the_pool(self):
+        job = DerivativeJob.objects.create(image=ImageFactory.create())
+
+        with patch.object(
+            render_dicom_derivatives,
+            "ProcessPoolExecutor",
+            side_effect=lambda **kwargs: FakePool(broken=True),
+        ):
+            call_command(
+                "render_dicom_derivatives",
+                "--once",
+                "--workers",
+                "1",
+                stdout=StringIO(),
+            )
+
+        job.refresh_from_db()
+        assert job.status == DerivativeJobStatus.FAILED
+        assert job.last_error == "A worker died"
@@ -0,0 +1,137 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pydicom
+import pytest
+from pynetdicom import AE
+from pynetdicom.sop_class import (
+    DigitalMammographyXRayImageStorageForPresentation,  # type: ignore
+)
+
+from manage_breast_screening.dicom.models import Image
+from manage_breast_screening.dicom.storage_scp import (
+    STATUS_CANNOT_UNDERSTAND,
+    STATUS_REJECTED,
+    STATUS_SUCCESS,
+    StorageSCP,
+    record_dataset,
+)
+from manage_breast_screening.gateway.tests.factories import GatewayActionFactory
+from manage_breast_screening.participants.models.appointment import (
+    AppointmentStatusNames,
+)
+from manage_breast_screening.participants.tests.factories import AppointmentFactory
+
+
+@pytest.fixture
+def gateway_action():
+    return GatewayActionFactory(
+        accession_number="ACC123",
+        appointment=AppointmentFactory(
+            current_status=AppointmentStatusNames.IN_PROGRESS
+        ),
+    )
+
+
+@pytest.fixture
+def store_event(dataset, tmp_path):
+    def store_event(ds=dataset):
+        path = tmp_path / "received.dcm"
+        pydicom.dcmwrite(path, ds, enforce_file_format=True)
+        return SimpleNamespace(
+            dataset_path=Path(path),
+            assoc=SimpleNamespace(requestor=SimpleNamespace(ae_title="MODALITY")),
+        )
+
+    return store_event
+
+
+@pytest.mark.django_db
+class TestRecordDataset:
+    def test_records_image_for_accession_number(
+        self, dataset, gateway_action, store_event
+    ):
+        dataset.AccessionNumber = "ACC123"
+
+        assert record_dataset(store_event()) == STATUS_SUCCESS
+
+        image = Image.objects.get(sop_instance_uid=dataset.SOPInstanceUID)
+        assert image.series.study.source_message_id == str(gateway_action.id)
+        assert image.dicom_file.size > 0
+
+    def test_rejects_unknown_accession_number(
+        self, dataset, gateway_action, store_event
+    ):
+        dataset.AccessionNumber = "UNKNOWN"
+
+        assert record_dataset(store_event()) == STATUS_REJECTED
+        assert not Image.objects.exists()
+
+    def test_rejects_missing_accession_number(self, gateway_action, store_event):
+        assert record_dataset(store_event()) == STATUS_REJECTED
+        assert not Image.objects.exists()
+
+    def test_rejects_appointment_not_in_progress(self, dataset, store_event):
+        GatewayActionFactory(
+            accession_number="ACC123",
+            appointment=AppointmentFactory(
+                current_status=AppointmentStatusNames.SCREENED
+            ),
+        )
+        dataset.AccessionNumber = "ACC123"
+
+        assert record_dataset(store_event()) == STATUS_REJECTED
+        assert not Image.objects.exists()
+
+    def test_missing_uids(self, dataset, gateway_action, store_event):
+        dataset.AccessionNumber = "ACC123"
+        del dataset.SeriesInstanceUID
+
+        assert record_dataset(store_event()) == STATUS_CANNOT_UNDERSTAND
+
+
+@pytest.mark.django_db(transaction=True)
+def test_receives_images_over_concurrent_associations(dataset, gateway_action):
+    dataset.AccessionNumber = "ACC123"
+    dataset.SOPClassUID = DigitalMammographyXRayImageStorageForPresentation
+
+    server = StorageSCP(ae_title="MANAGE").start(("127.0.0.1", 0), block=False)
+    try:
+        port = server.server_address[1]
+        scu = AE(ae_title="MODALITY")
+        scu.add_requested_context(
+            DigitalMammographyXRayImageStorageForPresentation,
+            pydicom.uid.ExplicitVRLittleEndian,
+        )
+
+        associations = [
+            scu.associate("127.0.0.1", port, ae_title="MANAGE") for _ in range(2)
+        ]
+        statuses = []
+        for instance_number, assoc in enumerate(associations, start=1):
+            assert assoc.is_established
+            dataset.SOPInstanceUID = pydicom.uid.generate_uid()
+            dataset.InstanceNumber = instance_number
+            statuses.append(assoc.send_c_store(dataset).Status)
+
+        for assoc in associations:
+            assoc.release()
+    finally:
+        server.shutdown()
+
+    assert statuses == [STATUS_SUCCESS, STATUS_SUCCESS]
+    assert Image.objects.count() == 2
+
+
+def test_rejects_association_to_another_ae_title():
+    server = StorageSCP(ae_title="MANAGE").start(("127.0.0.1", 0), block=False)
+    try:
+        scu = AE(ae_title="MODALITY")
+        scu.add_requested_context(DigitalMammographyXRayImageStorageForPresentation)
+        assoc = scu.associate(
+            "127.0.0.1", server.server_address[1], ae_title="SOMEONE_ELSE"
+        )
+
+        assert assoc.is_rejected
+    finally:
+        server.shutdown()
@@ -0,0 +1,36 @@
+import hashlib
+from contextlib import suppress
+
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.test import RequestFactory
+
+from manage_breast_screening.dicom.upload_handlers import (
+    Sha256MemoryFileUploadHandler,
+    Sha256TemporaryFileUploadHandler,
+)
+
+
+def upload(handler, chunks, content_length):
+    handler.handle_raw_input(None, {}, content_length, "boundary")
+    with suppress(StopFutureHandlers):
+        handler.new_file("file", "image.dcm", "application/dicom", content_length)
+    for chunk in chunks:
+        handler.receive_data_chunk(chunk, 0)
+    return handler.file_complete(content_length)
+
+
+class TestSha256UploadHandlers:
+    def test_memory_handler_sets_digest(self):
+        handler = Sha256MemoryFileUploadHandler(RequestFactory().post("/"))
+
+        file = upload(handler, [b"first ", b"second"], 12)
+
+        assert file.sha256 == hashlib.sha256(b"first second").hexdigest()
+
+    def test_temporary_file_handler_sets_digest(self):
+        handler = Sha256TemporaryFileUploadHandler(RequestFactory().post("/"))
+
+        file = upload(handler, [b"first ", b"second"], 12)
+
+        assert file.sha256 == hashlib.sha256(b"first second").hexdigest()
+        file.close()
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from pydicom import Dataset
+
+from manage_breast_screening.dicom.windowing import (
+    UnsupportedPixelDataError,
+    display_lut,
+    to_display,
+)
+
+
+@pytest.fixture
+def ds():
+    ds = Dataset()
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.PixelRepresentation = 0
+    ds.BitsStored = 12
+    return ds
+
+
+class TestToDisplay:
+    def test_stretches_image_range_without_window(self, ds):
+        pixels = np.array([[100, 200], [300, 500]], dtype=np.uint16)
+
+        assert to_display(ds, pixels).tolist() == [[0, 64], [128, 255]]
+
+    def test_applies_linear_window(self, ds):
+        ds.WindowCenter = 2048
+        ds.WindowWidth = 1025
+        pixels = np.array([[0, 1536], [2048, 4095]], dtype=np.uint16)
+
+        assert to_display(ds, pixels).tolist() == [[0, 0], [128, 255]]
+
+    def test_uses_first_window_when_there_are_several(self, ds):
+        ds.WindowCenter = [1000, 3000]
+        ds.WindowWidth = [2, 2]
+        pixels = np.array([999, 1001], dtype=np.uint16)
+
+        assert to_display(ds, pixels).tolist() == [0, 255]
+
+    def test_applies_sigmoid_window(self, ds):
+        ds.WindowCenter = 2048
+        ds.WindowWidth = 1024
+        ds.VOILUTFunction = "SIGMOID"
+        pixels = np.array([0, 2048, 4095], dtype=np.uint16)
+
+        assert to_display(ds, pixels).tolist() == [0, 128, 255]
+
+    def test_applies_rescale_before_window(self, ds):
+        ds.RescaleSlope = 2
+        ds.RescaleIntercept = -100
+        ds.WindowCenter = 100
+        ds.WindowWidth = 2
+        pixels = np.array([99, 101], dtype=np.uint16)
+
+        assert to_display(ds, pixels).tolist() == [0, 255]
+
+    def test_applies_voi_lut_sequence_in_preference_to_window(self, ds):
+        item = Dataset()
+        item.LUTDescriptor = [4, 10, 16]
+        item.LUTData = [0, 21845, 43690, 65535]
+        ds.VOILUTSequence = [item]
+        ds.WindowCenter = 0
+        ds.WindowWidth = 1
+        pixels = np.array([0, 11, 12, 13, 100], dtype=np.uint16)
+
+        assert to_display(ds, pixels).tolist() == [0, 85, 170, 255, 255]
+
+    def test_inverts_monochrome1(self, ds):
+        ds.PhotometricInterpretation = "MONOCHROME1"
+        pixels = np.array([100, 300, 500], dtype=np.uint16)
+
+        assert to_display(ds, pixels).tolist() == [255, 127, 0]
+
+    def test_signed_pixels(self, ds):
+        ds.PixelRepresentation = 1
+        pixels = np.array([-1000, 0, 1000], dtype=np.int16)
+
+        assert to_display(ds, pixels).tolist() == [0, 128, 255]
+
+    def test_flat_image(self, ds):
+        pixels = np.full((2, 2), 7, dtype=np.uint16)
+
+        assert to_display(ds, pixels).tolist() == [[0, 0], [0, 0]]
+
+    def test_rejects_float_pixels(self, ds):
+        with pytest.raises(UnsupportedPixelDataError):
+            to_display(ds, np.zeros(2, dtype=np.float32))
+
+
+class TestDisplayLut:
+    def test_covers_every_stored_value(self, ds):
+        lut = display_lut(ds, np.array([0, 1], dtype=np.uint16))
+
+        assert lut.dtype == np.uint8
+        assert lut.shape == (65536,)
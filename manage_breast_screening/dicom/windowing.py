@@ -0,0 +1,110 @@
+"""
+Map stored DICOM pixel values to 8-bit greyscale for display.
+
+Rather than transforming the full pixel array in floating point, a lookup
+table is built over every possible stored value (at most 65536 entries for
+16-bit data) and applied to the image in a single indexing pass. The table
+applies the modality LUT or rescale, then the dataset's VOI LUT or window,
+then MONOCHROME1 inversion, so previews match what the modality displays.
+"""
+
+import numpy as np
+import pydicom
+from pydicom.pixels import apply_modality_lut, apply_voi
+
+MAX_DISPLAY_VALUE = 255
+
+
+class UnsupportedPixelDataError(ValueError):
+    pass
+
+
+def to_display(ds: pydicom.Dataset, pixel_array: np.ndarray) -> np.ndarray:
+    """Convert a pixel array from ds to a uint8 array ready to encode."""
+    if pixel_array.dtype.kind not in "iu" or pixel_array.dtype.itemsize > 2:
+        raise UnsupportedPixelDataError(
+            f"Cannot display pixel data of type {pixel_array.dtype}"
+        )
+
+    # Index the table by the unsigned bit pattern of each stored value, so
+    # signed data needs no offset and the lookup allocates only the output.
+    index_dtype = np.dtype(f"u{pixel_array.dtype.itemsize}")
+    lut = display_lut(ds, pixel_array)
+    return lut[pixel_array.view(index_dtype)]
+
+
+def display_lut(ds: pydicom.Dataset, pixel_array: np.ndarray) -> np.ndarray:
+    """
+    Build a table mapping every stored value of pixel_array's type to 0-255.
+
+    pixel_array is only read when the dataset has no VOI LUT or window, in
+    which case the image's own range is stretched to fill the display range.
+    """
+    index_dtype = np.dtype(f"u{pixel_array.dtype.itemsize}")
+    stored_values = np.arange(np.iinfo(index_dtype).max + 1, dtype=index_dtype).view(
+        pixel_array.dtype
+    )
+
+    values = apply_modality_lut(stored_values, ds)
+
+    if ds.get("VOILUTSequence"):
+        lut = _apply_voi_lut_sequence(values, ds)
+    elif "WindowCenter" in ds and "WindowWidth" in ds:
+        lut = _apply_window(values, ds)
+    else:
+        lut = _stretch_to_image_range(values, stored_values, pixel_array)
+
+    lut = np.clip(np.round(lut), 0, MAX_DISPLAY_VALUE).astype(np.uint8)
+
+    if getattr(ds, "PhotometricInterpretation", "") == "MONOCHROME1":
+        np.subtract(MAX_DISPLAY_VALUE, lut, out=lut)
+
+    return lut
+
+
+def _first_value(ds: pydicom.Dataset, keyword: str) -> float:
+    """Window centre and width may be multi-valued; the first is the default view."""
+    elem = ds[keyword]
+    return float(elem.value[0] if elem.VM > 1 else elem.value)
+
+
+def _apply_voi_lut_sequence(values: np.ndarray, ds: pydicom.Dataset) -> np.ndarray:
+    if values.dtype.kind == "f":
+        values = np.rint(values).astype(np.int64)
+
+    bits_per_entry = ds.VOILUTSequence[0].LUTDescriptor[2]
+    return apply_voi(values, ds) * (MAX_DISPLAY_VALUE / (2**bits_per_entry - 1))
+
+
+def _apply_window(values: np.ndarray, ds: pydicom.Dataset) -> np.ndarray:
+    """Apply the VOI LUT Function from PS3.3 C.11.2.1.2 with a 0-255 output range."""
+    center = _first_value(ds, "WindowCenter")
+    width = _first_value(ds, "WindowWidth")
+    function = str(getattr(ds, "VOILUTFunction", "LINEAR")).upper()
+    values = values.astype(np.float64)
+
+    if function == "SIGMOID":
+        return MAX_DISPLAY_VALUE / (1 + np.exp(-4 * (values - center) / width))
+
+    if function == "LINEAR_EXACT":
+        return ((values - center) / width + 0.5) * MAX_DISPLAY_VALUE
+
+    # LINEAR, which requires a width of at least 1
+    width = max(width, 1)
+    if width == 1:
+        return np.where(values < center - 0.5, 0, MAX_DISPLAY_VALUE)
+    return ((values - (center - 0.5)) / (width - 1) + 0.5) * MAX_DISPLAY_VALUE
+
+
+def _stretch_to_image_range(
+    values: np.ndarray, stored_values: np.ndarray, pixel_array: np.ndarray
+) -> np.ndarray:
+    in_image = (stored_values >= pixel_array.min()) & (
+        stored_values <= pixel_array.max()
+    )
+    low = values[in_image].min()
+    high = values[in_image].max()
+    values = values.astype(np.float64)
+    if high == low:
+        return np.zeros_like(values)
+    return (values - low) / (high - low) * MAX_DISPLAY_VALUE
@@ -0,0 +1,34 @@
+from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from manage_breast_screening.core.admin import admin_site
+
+from .models import Relay
+from .relay_health import RELAY_PROBE_RETENTION, RelayHealth
+
+
+class RelayAdmin(admin.ModelAdmin):
+    list_display = ["id", "setting", "namespace", "hybrid_connection_name"]
+
+    def get_urls(self):
+        return [
+            path(
+                "health/",
+                self.admin_site.admin_view(self.health_view),
+                name="gateway_relay_health",
+            ),
+        ] + super().get_urls()
+
+    def health_view(self, request):
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Gateway health",
+            "relays": RelayHealth.for_relays(),
+            "retention_hours": int(RELAY_PROBE_RETENTION.total_seconds() // 3600),
+        }
+        return TemplateResponse(request, "admin/gateway/relay/health.html", context)
+
+
+admin_site.register(Relay, RelayAdmin)
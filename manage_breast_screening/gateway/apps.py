@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GatewayConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "manage_breast_screening.gateway"
+
+    def ready(self):
+        from . import signals  # noqa: F401
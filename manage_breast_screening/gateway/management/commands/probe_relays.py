@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from manage_breast_screening.gateway.relay_health import (
+    PROBE_INTERVAL_SECONDS,
+    RelayProber,
+)
+
+
+class Command(BaseCommand):
+    help = "Send an echo to every relay and record how long each one took"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help=(
+                "Keep probing, waiting this many seconds between rounds "
+                f"(for example {PROBE_INTERVAL_SECONDS}), instead of probing once"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        prober = RelayProber()
+
+        while True:
+            for probe in prober.run():
+                if probe.succeeded:
+                    self.stdout.write(
+                        f"Relay {probe.relay.id}: handshake "
+                        f"{probe.handshake_ms:.0f}ms, round trip "
+                        f"{probe.round_trip_ms:.0f}ms"
+                    )
+                else:
+                    self.stderr.write(f"Relay {probe.relay.id}: {probe.error}")
+            prober.prune()
+
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from manage_breast_screening.gateway.relay_sender import (
+    BATCH_SIZE,
+    RELAY_CONCURRENCY,
+    RelaySender,
+)
+
+
+class Command(BaseCommand):
+    help = "Send pending gateway actions to their relays, retrying failures"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Actions to claim at a time",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=RELAY_CONCURRENCY,
+            help="Actions to send to each relay at the same time",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling for due actions again",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no actions are due instead of polling for more",
+        )
+
+    def handle(self, *args, **options):
+        sender = RelaySender(
+            batch_size=options["batch_size"], concurrency=options["concurrency"]
+        )
+
+        while True:
+            if sender.send_batch():
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["poll_interval"])
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.3 on 2026-10-18 09:12
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gateway', '0005_relay_provider_to_setting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelayProbe',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('succeeded', models.BooleanField()),
+                ('handshake_ms', models.FloatField(blank=True, null=True)),
+                ('round_trip_ms', models.FloatField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('relay', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='probes', to='gateway.relay')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['relay', 'created_at'], name='gateway_rel_relay_i_a555f5_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gateway', '0006_relayprobe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gatewayaction',
+            name='last_image_revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
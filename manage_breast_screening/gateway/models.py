@@ -5,6 +5,8 @@ from django.utils.functional import cached_property
 
 from manage_breast_screening.core.models import BaseModel
 
+from . import relay_cache
+
 
 class GatewayActionStatus(models.TextChoices):
     PENDING = "pending", "Pending"
@@ -43,6 +45,8 @@ class GatewayAction(BaseModel):
     retry_count = models.IntegerField(default=0)
     next_retry_at = models.DateTimeField(null=True, blank=True)
     last_error = models.TextField(blank=True)
+    # The revision most recently given to one of this action's images
+    last_image_revision = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["-created_at"]
@@ -75,11 +79,24 @@ class Relay(BaseModel):
 
     @classmethod
     def for_setting(cls, setting):
-        return cls.objects.filter(setting=setting).first()
+        """The relay for a setting or setting id, cached by relay_cache."""
+        return relay_cache.get(
+            getattr(setting, "pk", setting),
+            lambda setting_id: cls.objects.filter(setting=setting_id).first(),
+            cls.version_stamp,
+        )
+
+    @classmethod
+    def version_stamp(cls):
+        """A value that changes whenever a relay is saved or deleted."""
+        stamp = cls.objects.aggregate(
+            count=models.Count("pk"), latest=models.Max("updated_at")
+        )
+        return (stamp["count"], stamp["latest"])
 
     @classmethod
     def for_appointment(cls, appointment):
-        return cls.for_setting(appointment.clinic_slot.clinic.setting)
+        return cls.for_setting(appointment.clinic_slot.clinic.setting_id)
 
     @cached_property
     def shared_access_key(self) -> str:
@@ -87,3 +104,23 @@ class Relay(BaseModel):
 
     def __str__(self):
         return f"{self.id}"
+
+
+class RelayProbe(BaseModel):
+    """The outcome of one echo sent to a relay by the probe_relays command."""
+
+    relay = models.ForeignKey(Relay, on_delete=models.CASCADE, related_name="probes")
+    succeeded = models.BooleanField()
+    # Time to open the WebSocket connection, including the SAS handshake
+    handshake_ms = models.FloatField(null=True, blank=True)
+    # Time from sending the echo to receiving the gateway's response
+    round_trip_ms = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["relay", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.relay} at {self.created_at}"
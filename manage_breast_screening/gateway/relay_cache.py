@@ -0,0 +1,67 @@
+"""
+In-process cache of the Relay for each clinic setting.
+
+Relays change rarely, but pages in the appointment workflow look them up on
+every render. Each process keeps the relays it has looked up for
+RELAY_CACHE_TTL_SECONDS. Entries are tagged with a version stamp read from
+the relay table, which changes whenever a relay is saved or deleted. Each
+process checks the stamp at most every VERSION_CHECK_SECONDS, so changes
+made by another worker are picked up within that time. Saving or deleting
+a relay clears this process's entries straight away.
+"""
+
+import threading
+import time
+
+RELAY_CACHE_TTL_SECONDS = 60
+VERSION_CHECK_SECONDS = 5
+
+_relays: dict = {}
+_version = None
+_version_checked_at = None
+_lock = threading.Lock()
+
+
+def shared_version(load_version):
+    """The stamp from load_version(), reloaded once it is VERSION_CHECK_SECONDS old."""
+    global _version, _version_checked_at
+
+    now = time.monotonic()
+    if (
+        _version_checked_at is None
+        or now >= _version_checked_at + VERSION_CHECK_SECONDS
+    ):
+        version = load_version()
+        with _lock:
+            _version, _version_checked_at = version, now
+    return _version
+
+
+def get(setting_id, load, load_version):
+    """
+    Return the cached relay for setting_id, calling load(setting_id) on a miss.
+
+    load_version() returns a stamp that changes whenever any relay changes.
+    """
+    version = shared_version(load_version)
+    now = time.monotonic()
+
+    cached = _relays.get(setting_id)
+    if cached is not None:
+        relay, cached_version, expires_at = cached
+        if cached_version == version and now < expires_at:
+            return relay
+
+    relay = load(setting_id)
+    with _lock:
+        _relays[setting_id] = (relay, version, now + RELAY_CACHE_TTL_SECONDS)
+    return relay
+
+
+def invalidate():
+    """Forget cached relays in this process, and check the stamp again on next use."""
+    global _version_checked_at
+
+    with _lock:
+        _relays.clear()
+        _version_checked_at = None
@@ -0,0 +1,272 @@
+"""
+Long-lived WebSocket connections to Azure Relay, shared by every action sent
+to the same Relay.
+
+Opening a connection means a SAS-signed WebSocket handshake with Azure Relay,
+which costs several round trips. A RelayClient keeps one connection per
+Relay open between actions and sends each action over it, matching responses
+to requests so several actions can be in flight at once.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+from websockets.asyncio.client import connect
+
+from .models import Relay
+from .relay_service import (
+    OPEN_CONNECTION_TIMEOUT_SECONDS,
+    SAS_TOKEN_REFRESH_MARGIN_SECONDS,
+    RelayURI,
+)
+
+logger = logging.getLogger(__name__)
+
+# After a failed connection attempt, wait this long before the next one,
+# doubling with each consecutive failure up to the maximum
+RECONNECT_BACKOFF_SECONDS = 1
+MAX_RECONNECT_BACKOFF_SECONDS = 60
+
+
+class RelayUnavailableError(ConnectionError):
+    pass
+
+
+class RelayConnection:
+    """
+    One WebSocket connection to a Relay.
+
+    Responses are matched to requests by their action_id. A response
+    without one is matched to the oldest unanswered request, as the gateway
+    answers messages on a connection in the order they were sent. That only
+    holds while every request gets its response, so the connection is closed
+    as soon as a request is abandoned, e.g. after timing out.
+    """
+
+    def __init__(self, websocket, expires_at: float):
+        self.websocket = websocket
+        self.expires_at = expires_at
+        self.pending: dict[str, asyncio.Future] = {}
+        self.retired = False
+        self.reader = asyncio.create_task(self._read())
+
+    @classmethod
+    async def open(cls, relay: Relay) -> "RelayConnection":
+        relay_uri = RelayURI(relay)
+        token_expires_at = relay_uri.sas_token().expires_at
+        websocket = await connect(
+            relay_uri.connection_url(),
+            compression=None,
+            open_timeout=OPEN_CONNECTION_TIMEOUT_SECONDS,
+        )
+        return cls(websocket, time.monotonic() + token_expires_at - time.time())
+
+    @property
+    def is_open(self) -> bool:
+        return not self.reader.done()
+
+    def expires_soon(self) -> bool:
+        return time.monotonic() >= self.expires_at - SAS_TOKEN_REFRESH_MARGIN_SECONDS
+
+    async def send(self, message: dict, correlation_id: str) -> asyncio.Future:
+        """Send message, returning a future for the response to it."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending[correlation_id] = future
+        future.add_done_callback(lambda f: self._forget(correlation_id, f))
+        try:
+            await self.websocket.send(json.dumps(message))
+        except BaseException:
+            future.cancel()
+            raise
+        return future
+
+    def retire(self):
+        """Close the connection once every request sent on it has been answered."""
+        self.retired = True
+        if not self.pending:
+            asyncio.create_task(self.close())
+
+    async def close(self):
+        await self.websocket.close()
+
+    def _forget(self, correlation_id: str, future: asyncio.Future):
+        self.pending.pop(correlation_id, None)
+        if not self.is_open:
+            return
+        if future.cancelled():
+            # The response may still arrive, and would be paired with a later
+            # request if it has no action_id
+            logger.warning(
+                "Closing relay connection after request %s was abandoned",
+                correlation_id,
+            )
+            self.retired = True
+            asyncio.create_task(self.close())
+        elif self.retired and not self.pending:
+            asyncio.create_task(self.close())
+
+    def _response_future(self, response: dict) -> asyncio.Future | None:
+        action_id = response.get("action_id")
+        if action_id is not None:
+            return self.pending.get(str(action_id))
+        return next(
+            (future for future in self.pending.values() if not future.done()),
+            None,
+        )
+
+    async def _read(self):
+        try:
+            async for message in self.websocket:
+                response = json.loads(message)
+                future = self._response_future(response)
+                if future is None or future.done():
+                    logger.warning("Unexpected response from relay: %s", response)
+                    continue
+                future.set_result(response)
+        except Exception as e:
+            logger.warning("Relay connection closed: %s", e)
+        finally:
+            for future in list(self.pending.values()):
+                if not future.done():
+                    future.set_exception(ConnectionError("Relay connection closed"))
+
+
+class RelayClient:
+    """
+    Sends messages to one Relay over a shared connection.
+
+    The connection is opened on first use, replaced with one using a fresh
+    SAS token before the current token expires, and reopened after it drops.
+    Failed attempts to connect back off exponentially, and sends fail fast
+    with RelayUnavailableError until the next attempt is due.
+    """
+
+    def __init__(self, relay: Relay):
+        self.relay = relay
+        self.connection: RelayConnection | None = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def send(self, message: dict, correlation_id: str) -> asyncio.Future:
+        connection = await self._connected()
+        return await connection.send(message, correlation_id)
+
+    async def close(self):
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
+    async def _connected(self) -> RelayConnection:
+        async with self._lock:
+            current = self.connection
+            if (
+                current
+                and current.is_open
+                and not current.retired
+                and not current.expires_soon()
+            ):
+                return current
+
+            if time.monotonic() < self.retry_at:
+                raise RelayUnavailableError(
+                    f"Relay {self.relay.id} is unavailable after "
+                    f"{self.failures} failed connection attempts"
+                )
+
+            try:
+                connection = await RelayConnection.open(self.relay)
+            except Exception:
+                self.failures += 1
+                backoff = min(
+                    RECONNECT_BACKOFF_SECONDS * 2 ** (self.failures - 1),
+                    MAX_RECONNECT_BACKOFF_SECONDS,
+                )
+                self.retry_at = time.monotonic() + backoff
+                raise
+
+            logger.info("Connected to relay %s", self.relay.id)
+            self.failures = 0
+            self.retry_at = 0.0
+            if current is not None and current.is_open:
+                current.retire()
+            self.connection = connection
+            return connection
+
+
+class RelayClientPool:
+    """The RelayClient for each Relay, for use within one event loop."""
+
+    def __init__(self):
+        self.clients: dict[tuple, RelayClient] = {}
+
+    def client_for(self, relay: Relay) -> RelayClient:
+        # Changing a relay's connection details starts a new client
+        key = (
+            relay.pk,
+            relay.namespace,
+            relay.hybrid_connection_name,
+            relay.key_name,
+            relay.shared_access_key,
+        )
+        client = self.clients.get(key)
+        if client is None:
+            for stale_key in [k for k in self.clients if k[0] == relay.pk]:
+                asyncio.create_task(self.clients.pop(stale_key).close())
+            client = self.clients[key] = RelayClient(relay)
+        return client
+
+    async def close(self):
+        clients = list(self.clients.values())
+        self.clients.clear()
+        for client in clients:
+            await client.close()
+
+
+_pools: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def relay_clients() -> RelayClientPool:
+    """Return the RelayClientPool for the running event loop."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = RelayClientPool()
+    return pool
+
+
+class BackgroundEventLoop:
+    """
+    An event loop running in a daemon thread, so synchronous code such as
+    views can use connections that outlive a single call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+
+    def run(self, coroutine):
+        """Run coroutine on the background loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(
+            coroutine, self._running_loop()
+        ).result()
+
+    def _running_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # A forked worker process doesn't inherit the parent's thread
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                threading.Thread(
+                    target=self._loop.run_forever, name="relay-clients", daemon=True
+                ).start()
+            return self._loop
+
+
+background_loop = BackgroundEventLoop()
@@ -0,0 +1,213 @@
+"""
+Probes each Relay with an echo to measure how long the connection handshake
+and a round trip to the gateway take, and how often they fail.
+
+Probe results are recorded as OpenTelemetry metrics, which go to Application
+Insights wherever Azure Monitor is configured, and stored as RelayProbe rows
+for a short rolling window so the gateway health admin page can read them.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db.models import Aggregate, Count, FloatField, Q
+from django.utils import timezone
+from opentelemetry import metrics
+from websockets.asyncio.client import connect
+
+from .models import Relay, RelayProbe
+from .relay_service import (
+    OPEN_CONNECTION_TIMEOUT_SECONDS,
+    RECEIVE_TIMEOUT_SECONDS,
+    RelayURI,
+)
+
+logger = logging.getLogger(__name__)
+
+RELAY_PROBE_RETENTION = timedelta(days=2)
+PROBE_INTERVAL_SECONDS = 60
+
+meter = metrics.get_meter(__name__)
+handshake_duration = meter.create_histogram(
+    "gateway.relay.handshake.duration",
+    unit="ms",
+    description="Time to open a WebSocket connection to a relay",
+)
+round_trip_duration = meter.create_histogram(
+    "gateway.relay.round_trip.duration",
+    unit="ms",
+    description="Time for the gateway to answer an echo sent through a relay",
+)
+probe_failures = meter.create_counter(
+    "gateway.relay.probe.failures",
+    description="Echoes to a relay that failed or weren't answered in time",
+)
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+class RelayProber:
+    async def probe(self, relay: Relay) -> RelayProbe:
+        """Open a new connection to relay and time an echo over it."""
+        probe = RelayProbe(relay=relay, succeeded=False)
+        try:
+            url = RelayURI(relay).connection_url()
+            started = time.perf_counter()
+            async with connect(
+                url, compression=None, open_timeout=OPEN_CONNECTION_TIMEOUT_SECONDS
+            ) as conn:
+                probe.handshake_ms = _elapsed_ms(started)
+
+                started = time.perf_counter()
+                await conn.send(
+                    json.dumps(
+                        {
+                            "action_type": "echo",
+                            "timestamp": datetime.now(dt_timezone.utc).isoformat(),
+                        }
+                    )
+                )
+                response = json.loads(
+                    await asyncio.wait_for(conn.recv(), timeout=RECEIVE_TIMEOUT_SECONDS)
+                )
+                probe.round_trip_ms = _elapsed_ms(started)
+
+            if response.get("status") == "error":
+                probe.error = response.get("error") or "Gateway returned an error"
+            else:
+                probe.succeeded = True
+        except asyncio.TimeoutError:
+            probe.error = "Timed out waiting for the gateway to answer"
+        except Exception as e:
+            probe.error = str(e) or type(e).__name__
+
+        if not probe.succeeded:
+            logger.warning("Probe of relay %s failed: %s", relay.id, probe.error)
+        return probe
+
+    async def probe_all(self, relays: list[Relay]) -> list[RelayProbe]:
+        return await asyncio.gather(*(self.probe(relay) for relay in relays))
+
+    def run(self) -> list[RelayProbe]:
+        """Probe every relay at once, then record and return the results."""
+        relays = list(Relay.objects.select_related("setting"))
+        probes = asyncio.run(self.probe_all(relays))
+        self.record(probes)
+        return probes
+
+    def record(self, probes: list[RelayProbe]):
+        RelayProbe.objects.bulk_create(probes)
+        for probe in probes:
+            attributes = {
+                "relay.id": str(probe.relay.id),
+                "relay.namespace": probe.relay.namespace,
+                "relay.setting": probe.relay.setting.name,
+            }
+            if probe.handshake_ms is not None:
+                handshake_duration.record(probe.handshake_ms, attributes)
+            if probe.round_trip_ms is not None:
+                round_trip_duration.record(probe.round_trip_ms, attributes)
+            if not probe.succeeded:
+                probe_failures.add(1, attributes)
+
+    @staticmethod
+    def prune() -> int:
+        """Delete probes older than the retention window."""
+        deleted, _ = RelayProbe.objects.filter(
+            created_at__lt=timezone.now() - RELAY_PROBE_RETENTION
+        ).delete()
+        return deleted
+
+
+class PercentileCont(Aggregate):
+    """
+    PostgreSQL's percentile_cont, which interpolates between the closest
+    values as statistics.quantiles does with method="inclusive".
+    """
+
+    function = "PERCENTILE_CONT"
+    template = "%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, percent: int, **extra):
+        super().__init__(expression, fraction=percent / 100, **extra)
+
+
+@dataclass
+class RelayHealth:
+    """A summary of one relay's probes within the retention window."""
+
+    relay: Relay
+    probes: int
+    failures: int
+    handshake_p50_ms: float | None
+    handshake_p95_ms: float | None
+    round_trip_p50_ms: float | None
+    round_trip_p95_ms: float | None
+    last_probe: RelayProbe | None
+    last_failure: RelayProbe | None
+
+    @property
+    def success_rate(self) -> float | None:
+        if not self.probes:
+            return None
+        return (self.probes - self.failures) / self.probes
+
+    @classmethod
+    def for_relays(cls, since: datetime | None = None) -> list["RelayHealth"]:
+        """
+        Summarise each relay's probes since a time, in a fixed number of
+        queries, aggregating in the database rather than loading every probe.
+        """
+        since = since or timezone.now() - RELAY_PROBE_RETENTION
+        relays = Relay.objects.select_related("setting").order_by("setting__name")
+        recent = RelayProbe.objects.filter(created_at__gte=since)
+
+        summaries = {
+            summary.pop("relay"): summary
+            for summary in recent.order_by()
+            .values("relay")
+            .annotate(
+                probes=Count("pk"),
+                failures=Count("pk", filter=Q(succeeded=False)),
+                handshake_p50_ms=PercentileCont("handshake_ms", 50),
+                handshake_p95_ms=PercentileCont("handshake_ms", 95),
+                round_trip_p50_ms=PercentileCont("round_trip_ms", 50),
+                round_trip_p95_ms=PercentileCont("round_trip_ms", 95),
+            )
+        }
+        no_probes = {
+            "probes": 0,
+            "failures": 0,
+            "handshake_p50_ms": None,
+            "handshake_p95_ms": None,
+            "round_trip_p50_ms": None,
+            "round_trip_p95_ms": None,
+        }
+        last_probes = cls.latest_by_relay(recent)
+        last_failures = cls.latest_by_relay(recent.filter(succeeded=False))
+
+        return [
+            cls(
+                relay=relay,
+                last_probe=last_probes.get(relay.pk),
+                last_failure=last_failures.get(relay.pk),
+                **summaries.get(relay.pk, no_probes),
+            )
+            for relay in relays
+        ]
+
+    @staticmethod
+    def latest_by_relay(probes) -> dict:
+        """The most recent of probes for each relay, by relay id."""
+        return {
+            probe.relay_id: probe
+            for probe in probes.order_by("relay", "-created_at").distinct("relay")
+        }
@@ -0,0 +1,135 @@
+"""
+Sends pending gateway actions to their relays, outside of the web request
+that created them.
+
+Each batch is claimed with SELECT ... FOR UPDATE SKIP LOCKED and leased by
+moving its next_retry_at into the future, so several senders can run at
+once without sending the same action twice. An action whose sender dies
+before recording the outcome becomes due again when the lease runs out.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import GatewayAction, GatewayActionStatus, Relay
+from .relay_client import background_loop
+from .relay_service import (
+    OPEN_CONNECTION_TIMEOUT_SECONDS,
+    RECEIVE_TIMEOUT_SECONDS,
+    RelayService,
+    SendActionResult,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+# Actions in flight at once to each relay
+RELAY_CONCURRENCY = 8
+# Long enough to send a whole batch, after which claimed actions are due again
+CLAIM_LEASE_SECONDS = 4 * (OPEN_CONNECTION_TIMEOUT_SECONDS + RECEIVE_TIMEOUT_SECONDS)
+MAX_SEND_ATTEMPTS = 8
+RETRY_BACKOFF_SECONDS = 30
+MAX_RETRY_BACKOFF_SECONDS = 3600
+
+
+def retry_backoff(retry_count: int) -> timedelta:
+    """How long to wait before the next attempt, after retry_count failures."""
+    return timedelta(
+        seconds=min(
+            RETRY_BACKOFF_SECONDS * 2 ** (retry_count - 1), MAX_RETRY_BACKOFF_SECONDS
+        )
+    )
+
+
+class RelaySender:
+    def __init__(self, batch_size: int = BATCH_SIZE, concurrency=RELAY_CONCURRENCY):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.relay_service = RelayService()
+
+    @staticmethod
+    def due_actions():
+        now = timezone.now()
+        return GatewayAction.objects.filter(
+            Q(next_retry_at__isnull=True) | Q(next_retry_at__lte=now),
+            status__in=[GatewayActionStatus.PENDING, GatewayActionStatus.FAILED],
+            retry_count__lt=MAX_SEND_ATTEMPTS,
+        )
+
+    def claim(self) -> list[GatewayAction]:
+        """Lease a batch of due actions, oldest first."""
+        with transaction.atomic():
+            actions = list(
+                self.due_actions()
+                .select_for_update(skip_locked=True, of=("self",))
+                .select_related("appointment__clinic_slot__clinic")
+                .order_by("created_at")[: self.batch_size]
+            )
+            lease_until = timezone.now() + timedelta(seconds=CLAIM_LEASE_SECONDS)
+            GatewayAction.objects.filter(pk__in=[a.pk for a in actions]).update(
+                next_retry_at=lease_until
+            )
+        for action in actions:
+            action.next_retry_at = lease_until
+        return actions
+
+    def send_batch(self) -> int:
+        """Claim and send one batch of actions, returning how many were sent."""
+        actions = self.claim()
+        if not actions:
+            return 0
+
+        relays = {}
+        to_send = []
+        for action in actions:
+            setting_id = action.appointment.clinic_slot.clinic.setting_id
+            if setting_id not in relays:
+                relays[setting_id] = Relay.for_setting(setting_id)
+            relay = relays[setting_id]
+            if relay is None:
+                result = SendActionResult()
+                result.failed(f"No relay for action {action.id}")
+                self.record_result(action, result)
+            else:
+                to_send.append((relay, action))
+
+        results = background_loop.run(self.send_all(to_send))
+        for (_, action), result in zip(to_send, results):
+            self.record_result(action, result)
+
+        return len(actions)
+
+    async def send_all(self, to_send: list[tuple[Relay, GatewayAction]]):
+        limits = {}
+
+        async def send(relay, action):
+            limit = limits.setdefault(relay.pk, asyncio.Semaphore(self.concurrency))
+            async with limit:
+                return await self.relay_service.async_send_action(relay, action)
+
+        return await asyncio.gather(*(send(relay, action) for relay, action in to_send))
+
+    def record_result(self, action: GatewayAction, result: SendActionResult):
+        """Update the action, scheduling another attempt if it failed."""
+        if result.status == GatewayActionStatus.FAILED:
+            action.retry_count += 1
+            if action.retry_count < MAX_SEND_ATTEMPTS:
+                action.next_retry_at = timezone.now() + retry_backoff(
+                    action.retry_count
+                )
+            else:
+                logger.error(
+                    "Giving up on action %s after %s attempts",
+                    action.id,
+                    action.retry_count,
+                )
+                action.next_retry_at = None
+        else:
+            action.next_retry_at = None
+
+        self.relay_service.update_gateway_action(action, result)
@@ -4,10 +4,13 @@ import hashlib
 import hmac
 import json
 import logging
+import threading
 import time
 import urllib.parse
 from datetime import datetime, timezone
+from typing import NamedTuple
 
+from django.conf import settings
 from websockets.asyncio.client import connect
 
 from .models import GatewayAction, GatewayActionStatus, Relay
@@ -15,10 +18,40 @@ from .models import GatewayAction, GatewayActionStatus, Relay
 logger = logging.getLogger(__name__)
 
 SAS_TOKEN_EXPIRY_SECONDS = 3600
+# Stop using a token, or a connection opened with it, this long before it expires
+SAS_TOKEN_REFRESH_MARGIN_SECONDS = 300
 OPEN_CONNECTION_TIMEOUT_SECONDS = 30
 RECEIVE_TIMEOUT_SECONDS = 30
 
 
+class SasToken(NamedTuple):
+    token: str
+    # Seconds since the epoch
+    expires_at: float
+
+
+# Tokens by (relay id, hybrid connection name), with the relay config each
+# token was signed for. The lock is a gevent lock when gevent has patched
+# threading, so this is safe for both threads and greenlets.
+_sas_tokens: dict[tuple, tuple[tuple, SasToken]] = {}
+_sas_tokens_lock = threading.Lock()
+
+
+def clear_sas_tokens(relay_id=None):
+    """Forget cached tokens for one relay, or all of them."""
+    with _sas_tokens_lock:
+        for key in [k for k in _sas_tokens if relay_id is None or k[0] == relay_id]:
+            del _sas_tokens[key]
+
+
+def _is_fresh(cached, config, now) -> bool:
+    return (
+        cached is not None
+        and cached[0] == config
+        and now < cached[1].expires_at - SAS_TOKEN_REFRESH_MARGIN_SECONDS
+    )
+
+
 class RelayURI:
     def __init__(self, relay: Relay):
         self.relay = relay
@@ -41,10 +74,37 @@ class RelayURI:
             f"&se={expiry}&skn={self.relay.key_name}"
         )
 
+    def sas_token(self) -> SasToken:
+        """
+        Return a SAS token for the relay, reusing one created earlier by this
+        process until it is within SAS_TOKEN_REFRESH_MARGIN_SECONDS of expiry.
+        """
+        relay = self.relay
+        key = (relay.pk, relay.hybrid_connection_name)
+        config = (
+            relay.namespace,
+            relay.key_name,
+            relay.shared_access_key_variable_name,
+        )
+        now = time.time()
+
+        cached = _sas_tokens.get(key)
+        if not _is_fresh(cached, config, now):
+            with _sas_tokens_lock:
+                # Another thread may have refreshed the token while we waited
+                cached = _sas_tokens.get(key)
+                if not _is_fresh(cached, config, now):
+                    token = SasToken(
+                        self.create_sas_token(), int(now + SAS_TOKEN_EXPIRY_SECONDS)
+                    )
+                    cached = _sas_tokens[key] = (config, token)
+        return cached[1]
+
     def connection_url(self) -> str:
-        token = self.create_sas_token()
+        token = self.sas_token().token
         return (
-            f"wss://{self.relay.namespace}/$hc/{self.relay.hybrid_connection_name}"
+            f"{settings.RELAY_URL_SCHEME}://{self.relay.namespace}"
+            f"/$hc/{self.relay.hybrid_connection_name}"
             f"?sb-hc-action=connect&sb-hc-token={urllib.parse.quote_plus(token)}"
         )
 
@@ -117,35 +177,43 @@ class RelayService:
         """
         Synchronous wrapper around async_send_action.
         Updates the GatewayAction based on the eventloop outcome.
+
+        The action is sent from a background event loop, so the connection to
+        the relay stays open for the next action.
         """
-        result = asyncio.run(self.async_send_action(relay, action))
+        from .relay_client import background_loop
+
+        result = background_loop.run(self.async_send_action(relay, action))
         self.update_gateway_action(action, result)
 
     async def async_send_action(
         self, relay: Relay, action: GatewayAction
     ) -> SendActionResult:
+        """
+        Send the action over the running event loop's connection to the relay,
+        opening one if needed, and wait for the gateway's response.
+        """
+        from .relay_client import relay_clients
+
         result = SendActionResult()
 
         try:
-            relay_uri = RelayURI(relay)
-            url = relay_uri.connection_url()
-            async with connect(
-                url, compression=None, open_timeout=OPEN_CONNECTION_TIMEOUT_SECONDS
-            ) as conn:
-                await conn.send(json.dumps(action.payload))
-                result.sent(f"Sent action {action.id} to relay {relay.id}")
-
-                response = await asyncio.wait_for(
-                    conn.recv(), timeout=RECEIVE_TIMEOUT_SECONDS
+            client = relay_clients().client_for(relay)
+            response = await client.send(
+                action.payload, action.payload.get("action_id", str(action.id))
+            )
+            result.sent(f"Sent action {action.id} to relay {relay.id}")
+
+            response_data = await asyncio.wait_for(
+                response, timeout=RECEIVE_TIMEOUT_SECONDS
+            )
+
+            if response_data.get("status") in ("created", "processed"):
+                result.confirmed(f"Action {action.id} confirmed by gateway")
+            else:
+                result.failed(
+                    f"Unexpected response status from gateway: {response_data}"
                 )
-                response_data = json.loads(response)
-
-                if response_data.get("status") in ("created", "processed"):
-                    result.confirmed(f"Action {action.id} confirmed by gateway")
-                else:
-                    result.failed(
-                        f"Unexpected response status from gateway: {response_data}"
-                    )
 
         except asyncio.TimeoutError:
             result.failed(f"Timeout waiting for response from gateway {relay.id}")
@@ -161,11 +229,21 @@ class RelayService:
         if result.status == GatewayActionStatus.FAILED:
             action.last_error = result.error
             action.failed_at = result.failed_at
-            action.save(update_fields=["status", "last_error"])
+            action.save(
+                update_fields=[
+                    "status",
+                    "last_error",
+                    "failed_at",
+                    "retry_count",
+                    "next_retry_at",
+                ]
+            )
         elif result.status == GatewayActionStatus.SENT:
             action.sent_at = result.sent_at
-            action.save(update_fields=["status", "sent_at"])
+            action.save(update_fields=["status", "sent_at", "next_retry_at"])
         elif result.status == GatewayActionStatus.CONFIRMED:
             action.sent_at = result.sent_at
             action.confirmed_at = result.confirmed_at
-            action.save(update_fields=["status", "sent_at", "confirmed_at"])
+            action.save(
+                update_fields=["status", "sent_at", "confirmed_at", "next_retry_at"]
+            )
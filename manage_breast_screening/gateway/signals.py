@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from manage_breast_screening.clinics.models import ClinicStatus
+
+from . import relay_cache
+from .models import Relay
+from .relay_service import clear_sas_tokens
+from .worklist_item_service import WorklistItemService
+
+
+@receiver(post_save, sender=ClinicStatus)
+def push_worklist_when_clinic_opens(sender, instance, created, **kwargs):
+    """
+    Queue worklist items for the whole clinic as soon as it opens.
+
+    The clinic has already opened by the time this runs, so a failure is
+    logged rather than failing the request; the worklist can be sent again
+    from the clinic page.
+    """
+    if created and instance.state == ClinicStatus.IN_PROGRESS:
+        transaction.on_commit(
+            lambda: WorklistItemService.create_for_clinic(instance.clinic),
+            robust=True,
+        )
+
+
+@receiver([post_save, post_delete], sender=Relay)
+def clear_relay_sas_tokens(sender, instance, **kwargs):
+    """Stop using tokens signed with the relay's old config."""
+    clear_sas_tokens(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Relay)
+def invalidate_relay_cache(sender, instance, **kwargs):
+    relay_cache.invalidate()
+    # Other workers could cache the old relay again before this commits
+    transaction.on_commit(relay_cache.invalidate)
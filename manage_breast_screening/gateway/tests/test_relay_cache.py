@@ -0,0 +1,112 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from manage_breast_screening.clinics.tests.factories import SettingFactory
+from manage_breast_screening.gateway import relay_cache
+from manage_breast_screening.gateway.models import Relay
+from manage_breast_screening.participants.tests.factories import AppointmentFactory
+
+from .factories import RelayFactory
+
+
+@pytest.mark.django_db
+class TestRelayForSetting:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        relay_cache.invalidate()
+
+    def test_caches_relay(self, django_assert_num_queries):
+        relay = RelayFactory()
+
+        # The version stamp, then the relay
+        with django_assert_num_queries(2):
+            assert Relay.for_setting(relay.setting) == relay
+            assert Relay.for_setting(relay.setting_id) == relay
+
+    def test_caches_missing_relay(self, django_assert_num_queries):
+        setting = SettingFactory()
+
+        with django_assert_num_queries(2):
+            assert Relay.for_setting(setting) is None
+            assert Relay.for_setting(setting) is None
+
+    def test_for_appointment_uses_cache(self, django_assert_num_queries):
+        appointment = AppointmentFactory()
+        relay = RelayFactory(setting=appointment.clinic_slot.clinic.setting)
+        Relay.for_appointment(appointment)
+
+        with django_assert_num_queries(0):
+            assert Relay.for_appointment(appointment) == relay
+
+    def test_saving_relay_invalidates_cache(self):
+        setting = SettingFactory()
+        assert Relay.for_setting(setting) is None
+
+        relay = RelayFactory(setting=setting)
+
+        assert Relay.for_setting(setting) == relay
+
+    def test_deleting_relay_invalidates_cache(self):
+        relay = RelayFactory()
+        Relay.for_setting(relay.setting)
+
+        relay.delete()
+
+        assert Relay.for_setting(relay.setting) is None
+
+    def test_refreshes_when_another_process_changes_a_relay(
+        self, django_assert_num_queries
+    ):
+        relay = RelayFactory()
+        other_relay = RelayFactory()
+        now = time.monotonic()
+        with patch.object(relay_cache.time, "monotonic", return_value=now):
+            Relay.for_setting(relay.setting)
+
+        # As if another worker had saved a relay, so this process's signal
+        # handlers don't run
+        Relay.objects.filter(pk=other_relay.pk).update(
+            updated_at=other_relay.updated_at + timedelta(seconds=1)
+        )
+
+        with (
+            patch.object(relay_cache.time, "monotonic", return_value=now + 1),
+            django_assert_num_queries(0),
+        ):
+            Relay.for_setting(relay.setting)
+
+        later = now + relay_cache.VERSION_CHECK_SECONDS
+        with (
+            patch.object(relay_cache.time, "monotonic", return_value=later),
+            django_assert_num_queries(2),
+        ):
+            Relay.for_setting(relay.setting)
+
+    def test_keeps_cache_when_no_relay_changed(self, django_assert_num_queries):
+        relay = RelayFactory()
+        now = time.monotonic()
+        with patch.object(relay_cache.time, "monotonic", return_value=now):
+            Relay.for_setting(relay.setting)
+
+        later = now + relay_cache.VERSION_CHECK_SECONDS
+        with (
+            patch.object(relay_cache.time, "monotonic", return_value=later),
+            django_assert_num_queries(1),
+        ):
+            Relay.for_setting(relay.setting)
+
+    def test_refreshes_after_ttl(self, django_assert_num_queries):
+        relay = RelayFactory()
+        now = time.monotonic()
+        with patch.object(relay_cache.time, "monotonic", return_value=now):
+            Relay.for_setting(relay.setting)
+
+        later = now + relay_cache.RELAY_CACHE_TTL_SECONDS + 1
+        with (
+            patch.object(relay_cache.time, "monotonic", return_value=later),
+            django_assert_num_queries(2),
+        ):
+            Relay.for_setting(relay.setting)
@@ -0,0 +1,230 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from manage_breast_screening.gateway import relay_client
+from manage_breast_screening.gateway.relay_client import (
+    RelayClient,
+    RelayClientPool,
+    RelayUnavailableError,
+    relay_clients,
+)
+
+from .factories import RelayFactory
+
+
+class FakeWebSocket:
+    """Answers each message with respond(message), unless it returns None."""
+
+    def __init__(self, respond=None):
+        self.respond = respond
+        self.sent = []
+        self.closed = False
+        self.responses = asyncio.Queue()
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+        if self.respond and (response := self.respond(json.loads(message))):
+            self.reply(response)
+
+    def reply(self, response):
+        self.responses.put_nowait(json.dumps(response))
+
+    async def close(self):
+        self.closed = True
+        self.responses.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.responses.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+
+def echo_action_id(message):
+    return {"status": "created", "action_id": message["action_id"]}
+
+
+@pytest.fixture
+def mock_connect():
+    with patch.object(relay_client, "connect", new_callable=AsyncMock) as connect:
+        yield connect
+
+
+@pytest.mark.asyncio
+class TestRelayClient:
+    @pytest.fixture
+    def relay(self):
+        return RelayFactory.build()
+
+    async def test_reuses_connection_between_sends(self, relay, mock_connect):
+        websocket = FakeWebSocket(echo_action_id)
+        mock_connect.return_value = websocket
+        client = RelayClient(relay)
+
+        first = await client.send({"action_id": "a1"}, "a1")
+        second = await client.send({"action_id": "a2"}, "a2")
+
+        assert await first == {"status": "created", "action_id": "a1"}
+        assert await second == {"status": "created", "action_id": "a2"}
+        assert mock_connect.await_count == 1
+        await client.close()
+
+    async def test_matches_responses_by_action_id(self, relay, mock_connect):
+        websocket = FakeWebSocket()
+        mock_connect.return_value = websocket
+        client = RelayClient(relay)
+
+        first = await client.send({"action_id": "a1"}, "a1")
+        second = await client.send({"action_id": "a2"}, "a2")
+        websocket.reply({"status": "created", "action_id": "a2"})
+        websocket.reply({"status": "processed", "action_id": "a1"})
+
+        assert (await first)["status"] == "processed"
+        assert (await second)["status"] == "created"
+        await client.close()
+
+    async def test_matches_responses_without_action_id_in_order(
+        self, relay, mock_connect
+    ):
+        websocket = FakeWebSocket()
+        mock_connect.return_value = websocket
+        client = RelayClient(relay)
+
+        first = await client.send({"action_id": "a1"}, "a1")
+        second = await client.send({"action_id": "a2"}, "a2")
+        websocket.reply({"status": "first"})
+        websocket.reply({"status": "second"})
+
+        assert (await first)["status"] == "first"
+        assert (await second)["status"] == "second"
+        await client.close()
+
+    async def test_drops_responses_for_unknown_action_ids(self, relay, mock_connect):
+        websocket = FakeWebSocket()
+        mock_connect.return_value = websocket
+        client = RelayClient(relay)
+
+        response = await client.send({"action_id": "a2"}, "a2")
+        websocket.reply({"status": "created", "action_id": "a1"})
+        await asyncio.sleep(0)
+
+        assert not response.done()
+        websocket.reply({"status": "processed", "action_id": "a2"})
+        assert (await response)["status"] == "processed"
+        await client.close()
+
+    async def test_late_reply_does_not_answer_the_next_request(
+        self, relay, mock_connect
+    ):
+        timed_out = FakeWebSocket()
+        mock_connect.side_effect = [timed_out, FakeWebSocket()]
+        client = RelayClient(relay)
+
+        response = await client.send({"action_id": "a1"}, "a1")
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(response, timeout=0.01)
+        await asyncio.sleep(0)
+        next_response = await client.send({"action_id": "a2"}, "a2")
+        timed_out.reply({"status": "created"})
+        await asyncio.sleep(0)
+
+        assert timed_out.closed
+        assert not next_response.done()
+        assert mock_connect.await_count == 2
+        await client.close()
+
+    async def test_fails_pending_requests_when_connection_drops(
+        self, relay, mock_connect
+    ):
+        websocket = FakeWebSocket()
+        mock_connect.return_value = websocket
+        client = RelayClient(relay)
+
+        response = await client.send({"action_id": "a1"}, "a1")
+        await websocket.close()
+
+        with pytest.raises(ConnectionError):
+            await response
+
+    async def test_reconnects_after_connection_drops(self, relay, mock_connect):
+        dropped = FakeWebSocket()
+        mock_connect.side_effect = [dropped, FakeWebSocket(echo_action_id)]
+        client = RelayClient(relay)
+
+        await client.send({"action_id": "a1"}, "a1")
+        await dropped.close()
+        await asyncio.sleep(0)
+        response = await client.send({"action_id": "a2"}, "a2")
+
+        assert (await response)["action_id"] == "a2"
+        assert mock_connect.await_count == 2
+        await client.close()
+
+    async def test_refreshes_token_before_it_expires(self, relay, mock_connect):
+        old = FakeWebSocket()
+        mock_connect.side_effect = [old, FakeWebSocket(echo_action_id)]
+        client = RelayClient(relay)
+
+        pending = await client.send({"action_id": "a1"}, "a1")
+        client.connection.expires_at = 0
+        response = await client.send({"action_id": "a2"}, "a2")
+
+        assert (await response)["action_id"] == "a2"
+        assert mock_connect.await_count == 2
+        assert not old.closed
+
+        # The old connection closes once its last request is answered
+        old.reply({"status": "created", "action_id": "a1"})
+        await pending
+        await asyncio.sleep(0)
+        assert old.closed
+        await client.close()
+
+    async def test_backs_off_after_failing_to_connect(self, relay, mock_connect):
+        mock_connect.side_effect = OSError("unreachable")
+        client = RelayClient(relay)
+
+        with pytest.raises(OSError):
+            await client.send({"action_id": "a1"}, "a1")
+        with pytest.raises(RelayUnavailableError):
+            await client.send({"action_id": "a1"}, "a1")
+
+        assert mock_connect.await_count == 1
+
+        mock_connect.side_effect = None
+        mock_connect.return_value = FakeWebSocket(echo_action_id)
+        client.retry_at = 0
+        response = await client.send({"action_id": "a1"}, "a1")
+
+        assert (await response)["action_id"] == "a1"
+        assert client.failures == 0
+        await client.close()
+
+
+@pytest.mark.asyncio
+class TestRelayClientPool:
+    async def test_returns_one_client_per_relay(self):
+        relay = RelayFactory.build()
+        pool = RelayClientPool()
+
+        assert pool.client_for(relay) is pool.client_for(relay)
+        assert pool.client_for(relay) is not pool.client_for(RelayFactory.build())
+
+    async def test_replaces_client_when_relay_changes(self):
+        relay = RelayFactory.build()
+        pool = RelayClientPool()
+        client = pool.client_for(relay)
+
+        relay.namespace = "other.servicebus.windows.net"
+
+        assert pool.client_for(relay) is not client
+        assert len(pool.clients) == 1
+
+    async def test_relay_clients_is_per_event_loop(self):
+        assert relay_clients() is relay_clients()
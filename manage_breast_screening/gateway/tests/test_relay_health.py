@@ -0,0 +1,204 @@
+import asyncio
+import json
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+import time_machine
+from django.urls import reverse
+from django.utils import timezone
+
+from manage_breast_screening.gateway import relay_health
+from manage_breast_screening.gateway.models import RelayProbe
+from manage_breast_screening.gateway.relay_health import (
+    RELAY_PROBE_RETENTION,
+    RelayHealth,
+    RelayProber,
+)
+
+from .factories import RelayFactory
+
+
+class FakeConnection:
+    def __init__(self, response=None):
+        self.response = response
+        self.sent = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+    async def recv(self):
+        if self.response is None:
+            await asyncio.sleep(60)
+        return json.dumps(self.response)
+
+
+@pytest.fixture
+def mock_connect():
+    with patch.object(relay_health, "connect") as connect:
+        yield connect
+
+
+def probe(relay, **kwargs):
+    return RelayProbe.objects.create(relay=relay, **{"succeeded": True, **kwargs})
+
+
+@pytest.mark.asyncio
+class TestProbe:
+    async def test_times_a_successful_echo(self, mock_connect):
+        connection = FakeConnection({"status": "ok"})
+        mock_connect.return_value = connection
+
+        result = await RelayProber().probe(RelayFactory.build())
+
+        assert result.succeeded
+        assert result.handshake_ms >= 0
+        assert result.round_trip_ms >= 0
+        assert result.error == ""
+        assert connection.sent[0]["action_type"] == "echo"
+
+    async def test_records_error_responses(self, mock_connect):
+        mock_connect.return_value = FakeConnection(
+            {"status": "error", "error": "Gateway unavailable"}
+        )
+
+        result = await RelayProber().probe(RelayFactory.build())
+
+        assert not result.succeeded
+        assert result.error == "Gateway unavailable"
+        assert result.round_trip_ms is not None
+
+    async def test_records_connection_failures(self, mock_connect):
+        mock_connect.side_effect = OSError("unreachable")
+
+        result = await RelayProber().probe(RelayFactory.build())
+
+        assert not result.succeeded
+        assert result.error == "unreachable"
+        assert result.handshake_ms is None
+
+    async def test_records_timeouts(self, mock_connect):
+        mock_connect.return_value = FakeConnection()
+
+        with patch.object(relay_health, "RECEIVE_TIMEOUT_SECONDS", 0.01):
+            result = await RelayProber().probe(RelayFactory.build())
+
+        assert not result.succeeded
+        assert "Timed out" in result.error
+        assert result.handshake_ms is not None
+        assert result.round_trip_ms is None
+
+
+@pytest.mark.django_db
+class TestRelayProber:
+    def test_probes_every_relay_and_records_metrics(self, mock_connect):
+        ok, failing = RelayFactory.create_batch(2)
+        mock_connect.side_effect = lambda url, **kwargs: (
+            FakeConnection({"status": "error", "error": "down"})
+            if failing.namespace in url
+            else FakeConnection({"status": "ok"})
+        )
+
+        with (
+            patch.object(relay_health, "handshake_duration", MagicMock()) as handshake,
+            patch.object(relay_health, "round_trip_duration", MagicMock()),
+            patch.object(relay_health, "probe_failures", MagicMock()) as failures,
+        ):
+            probes = RelayProber().run()
+
+        assert len(probes) == 2
+        assert RelayProbe.objects.filter(relay=ok, succeeded=True).count() == 1
+        assert RelayProbe.objects.filter(relay=failing, succeeded=False).count() == 1
+        assert handshake.record.call_count == 2
+        failures.add.assert_called_once_with(
+            1,
+            {
+                "relay.id": str(failing.id),
+                "relay.namespace": failing.namespace,
+                "relay.setting": failing.setting.name,
+            },
+        )
+
+    def test_prune_deletes_probes_outside_retention(self, time_machine):
+        relay = RelayFactory.create()
+        time_machine.move_to(timezone.now() - RELAY_PROBE_RETENTION - timedelta(1))
+        probe(relay)
+        time_machine.move_to(timezone.now() + RELAY_PROBE_RETENTION)
+        recent = probe(relay)
+
+        assert RelayProber.prune() == 1
+        assert list(RelayProbe.objects.all()) == [recent]
+
+
+@pytest.mark.django_db
+class TestRelayHealth:
+    def test_summarises_probes_per_relay(self):
+        relay = RelayFactory.create()
+        idle = RelayFactory.create()
+        with time_machine.travel(timezone.now() - timedelta(hours=1), tick=False):
+            for ms in [10.0, 20.0, 30.0]:
+                probe(relay, handshake_ms=ms, round_trip_ms=ms * 2)
+        failure = probe(relay, succeeded=False, handshake_ms=40.0, error="down")
+
+        health = {h.relay: h for h in RelayHealth.for_relays()}
+
+        assert health[relay].probes == 4
+        assert health[relay].failures == 1
+        assert health[relay].success_rate == 0.75
+        assert health[relay].handshake_p50_ms == pytest.approx(25.0)
+        assert health[relay].round_trip_p50_ms == pytest.approx(40.0)
+        assert health[relay].last_probe == failure
+        assert health[relay].last_failure == failure
+        assert health[idle].probes == 0
+        assert health[idle].success_rate is None
+        assert health[idle].last_probe is None
+
+    def test_interpolates_percentiles(self):
+        relay = RelayFactory.create()
+        for ms in range(1, 101):
+            probe(relay, handshake_ms=float(ms))
+
+        [health] = RelayHealth.for_relays()
+
+        assert health.handshake_p50_ms == pytest.approx(50.5)
+        assert health.handshake_p95_ms == pytest.approx(95.05)
+        assert health.round_trip_p50_ms is None
+
+    def test_summarises_in_a_fixed_number_of_queries(self, django_assert_num_queries):
+        for relay in RelayFactory.create_batch(3):
+            probe(relay)
+            probe(relay, succeeded=False, error="down")
+
+        # Relays, summaries, last probes and last failures
+        with django_assert_num_queries(4):
+            RelayHealth.for_relays()
+
+
+@pytest.mark.django_db
+class TestGatewayHealthAdmin:
+    def test_shows_relay_health(self, superuser_client):
+        superuser_client.user.is_staff = True
+        superuser_client.user.save()
+        relay = RelayFactory.create()
+        probe(relay, succeeded=False, error="Gateway unavailable")
+
+        response = superuser_client.http.get(reverse("admin:gateway_relay_health"))
+
+        assert response.status_code == 200
+        assert relay.namespace in response.text
+        assert "Gateway unavailable" in response.text
+
+    def test_relay_list_links_to_health(self, superuser_client):
+        superuser_client.user.is_staff = True
+        superuser_client.user.save()
+
+        response = superuser_client.http.get(reverse("admin:gateway_relay_changelist"))
+
+        assert response.status_code == 200
+        assert reverse("admin:gateway_relay_health") in response.text
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+from datetime import timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import time_machine
+from django.db import connection, transaction
+from django.utils import timezone
+
+from manage_breast_screening.gateway.models import GatewayAction, GatewayActionStatus
+from manage_breast_screening.gateway.relay_sender import (
+    CLAIM_LEASE_SECONDS,
+    MAX_SEND_ATTEMPTS,
+    RelaySender,
+    retry_backoff,
+)
+from manage_breast_screening.gateway.relay_service import (
+    RelayService,
+    SendActionResult,
+)
+
+from .factories import GatewayActionFactory, RelayFactory
+
+
+def confirmed_result():
+    result = SendActionResult()
+    result.sent("sent")
+    result.confirmed("confirmed")
+    return result
+
+
+def failed_result():
+    result = SendActionResult()
+    result.failed("relay unreachable")
+    return result
+
+
+def action_with_relay(**kwargs):
+    action = GatewayActionFactory.create(**kwargs)
+    RelayFactory.create(setting=action.appointment.clinic_slot.clinic.setting)
+    return action
+
+
+def test_retry_backoff_doubles_up_to_maximum():
+    assert retry_backoff(1) == timedelta(seconds=30)
+    assert retry_backoff(2) == timedelta(seconds=60)
+    assert retry_backoff(20) == timedelta(hours=1)
+
+
+@pytest.mark.django_db
+class TestClaim:
+    @time_machine.travel("2025-06-15 10:30:00", tick=False)
+    def test_claims_due_actions(self):
+        now = timezone.now()
+        pending = GatewayActionFactory.create()
+        retry_due = GatewayActionFactory.create(
+            status=GatewayActionStatus.FAILED,
+            retry_count=1,
+            next_retry_at=now - timedelta(seconds=1),
+        )
+        GatewayActionFactory.create(
+            status=GatewayActionStatus.FAILED,
+            retry_count=1,
+            next_retry_at=now + timedelta(seconds=1),
+        )
+        GatewayActionFactory.create(
+            status=GatewayActionStatus.FAILED, retry_count=MAX_SEND_ATTEMPTS
+        )
+        GatewayActionFactory.create(status=GatewayActionStatus.CONFIRMED)
+
+        claimed = RelaySender().claim()
+
+        assert {action.pk for action in claimed} == {pending.pk, retry_due.pk}
+        lease_until = now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+        assert all(action.next_retry_at == lease_until for action in claimed)
+        pending.refresh_from_db()
+        assert pending.next_retry_at == lease_until
+
+    def test_does_not_claim_leased_actions_again(self):
+        GatewayActionFactory.create()
+        sender = RelaySender()
+
+        assert len(sender.claim()) == 1
+        assert sender.claim() == []
+
+    def test_claims_up_to_batch_size(self):
+        GatewayActionFactory.create_batch(3)
+
+        assert len(RelaySender(batch_size=2).claim()) == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_skips_actions_locked_by_another_sender(self):
+        locked = GatewayActionFactory.create()
+        free = GatewayActionFactory.create()
+        is_locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            with transaction.atomic():
+                GatewayAction.objects.select_for_update().get(pk=locked.pk)
+                is_locked.set()
+                release.wait(timeout=10)
+            connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            is_locked.wait(timeout=10)
+            claimed = RelaySender().claim()
+        finally:
+            release.set()
+            thread.join()
+
+        assert [action.pk for action in claimed] == [free.pk]
+
+
+@pytest.mark.django_db
+class TestSendBatch:
+    def test_records_confirmed_actions(self):
+        action = action_with_relay()
+
+        with patch.object(
+            RelayService, "async_send_action", return_value=confirmed_result()
+        ) as mock_send:
+            assert RelaySender().send_batch() == 1
+
+        mock_send.assert_awaited_once()
+        action.refresh_from_db()
+        assert action.status == GatewayActionStatus.CONFIRMED
+        assert action.next_retry_at is None
+        assert action.retry_count == 0
+
+    @time_machine.travel("2025-06-15 10:30:00", tick=False)
+    def test_schedules_retry_of_failed_actions(self):
+        action = action_with_relay()
+
+        with patch.object(
+            RelayService, "async_send_action", return_value=failed_result()
+        ):
+            RelaySender().send_batch()
+
+        action.refresh_from_db()
+        assert action.status == GatewayActionStatus.FAILED
+        assert action.retry_count == 1
+        assert action.next_retry_at == timezone.now() + retry_backoff(1)
+        assert action.failed_at == timezone.now()
+        assert action.last_error == "relay unreachable"
+
+    def test_gives_up_after_max_attempts(self):
+        action = action_with_relay(
+            status=GatewayActionStatus.FAILED, retry_count=MAX_SEND_ATTEMPTS - 1
+        )
+
+        with patch.object(
+            RelayService, "async_send_action", return_value=failed_result()
+        ):
+            RelaySender().send_batch()
+
+        action.refresh_from_db()
+        assert action.retry_count == MAX_SEND_ATTEMPTS
+        assert action.next_retry_at is None
+        assert RelaySender().claim() == []
+
+    def test_fails_actions_without_a_relay(self):
+        action = GatewayActionFactory.create()
+
+        with patch.object(RelayService, "async_send_action") as mock_send:
+            RelaySender().send_batch()
+
+        mock_send.assert_not_called()
+        action.refresh_from_db()
+        assert action.status == GatewayActionStatus.FAILED
+        assert action.retry_count == 1
+
+    def test_returns_zero_when_nothing_is_due(self):
+        assert RelaySender().send_batch() == 0
+
+
+@pytest.mark.asyncio
+class TestSendAll:
+    async def test_limits_concurrency_per_relay(self):
+        relays = [RelayFactory.build(), RelayFactory.build()]
+        actions = [GatewayActionFactory.build() for _ in range(6)]
+        in_flight = {relay.pk: 0 for relay in relays}
+        most_in_flight = {relay.pk: 0 for relay in relays}
+
+        async def send(relay, action):
+            in_flight[relay.pk] += 1
+            most_in_flight[relay.pk] = max(
+                most_in_flight[relay.pk], in_flight[relay.pk]
+            )
+            await asyncio.sleep(0.01)
+            in_flight[relay.pk] -= 1
+            return confirmed_result()
+
+        sender = RelaySender(concurrency=2)
+        with patch.object(
+            RelayService, "async_send_action", AsyncMock(side_effect=send)
+        ):
+            results = await sender.send_all(
+                [(relays[i % 2], action) for i, action in enumerate(actions)]
+            )
+
+        assert len(results) == 6
+        assert most_in_flight == {relays[0].pk: 2, relays[1].pk: 2}
@@ -1,22 +1,27 @@
-import asyncio
 import base64
 import hashlib
 import hmac
 import json
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import AsyncMock, patch
 
 import pytest
 import time_machine
 from websockets.asyncio.client import ClientConnection
 
+from manage_breast_screening.gateway import relay_client
+from manage_breast_screening.gateway.relay_client import background_loop
 from manage_breast_screening.gateway.relay_service import (
     SAS_TOKEN_EXPIRY_SECONDS,
+    SAS_TOKEN_REFRESH_MARGIN_SECONDS,
     RelayService,
     RelayURI,
+    clear_sas_tokens,
 )
 
 from .factories import GatewayActionFactory, RelayFactory
+from .test_relay_client import FakeWebSocket
 
 
 class TestRelayService:
@@ -90,20 +95,21 @@ class TestRelayService:
             json.dumps({"action_type": "echo", "timestamp": "2024-01-01T00:00:00"})
         )
 
+    @pytest.fixture
+    def mock_connect(self):
+        with patch.object(relay_client, "connect", new_callable=AsyncMock) as connect:
+            yield connect
+
     @pytest.mark.django_db(transaction=True)
-    def test_send_action_success(self, relay, gateway_action):
+    def test_send_action_success(self, relay, gateway_action, mock_connect):
         subject = RelayService()
 
-        mock_ws = AsyncMock(spec=ClientConnection)
-        mock_ws.recv.return_value = json.dumps({"status": "created"})
+        mock_ws = FakeWebSocket(lambda message: {"status": "created"})
+        mock_connect.return_value = mock_ws
 
-        with patch(f"{RelayService.__module__}.connect") as mock_connect:
-            mock_connect.return_value.__aenter__.return_value = mock_ws
-            subject.send_action(relay, gateway_action)
+        subject.send_action(relay, gateway_action)
 
-        mock_ws.send.assert_called_once_with(
-            json.dumps({"action_id": "a1", "type": "test"})
-        )
+        assert mock_ws.sent == [{"action_id": "a1", "type": "test"}]
 
         gateway_action.refresh_from_db()
         assert gateway_action.status == "confirmed"
@@ -112,62 +118,152 @@ class TestRelayService:
         assert gateway_action.confirmed_at is not None
 
     @pytest.mark.django_db(transaction=True)
-    def test_send_action_timeout(self, relay, gateway_action):
+    def test_send_action_reuses_connection(self, relay, mock_connect):
         subject = RelayService()
+        mock_connect.return_value = FakeWebSocket(lambda message: {"status": "created"})
+        actions = GatewayActionFactory.create_batch(
+            2,
+            payload={"type": "test"},
+            appointment__clinic_slot__clinic__setting=relay.setting,
+        )
 
-        mock_ws = AsyncMock(spec=ClientConnection)
-        mock_ws.recv.side_effect = asyncio.TimeoutError
+        for action in actions:
+            subject.send_action(relay, action)
 
-        with patch(f"{RelayService.__module__}.connect") as mock_connect:
-            mock_connect.return_value.__aenter__.return_value = mock_ws
+        assert mock_connect.await_count == 1
+        for action in actions:
+            action.refresh_from_db()
+            assert action.status == "confirmed"
+
+    @pytest.mark.django_db(transaction=True)
+    def test_send_action_timeout(self, relay, gateway_action, mock_connect):
+        subject = RelayService()
+
+        mock_ws = FakeWebSocket()
+        mock_connect.return_value = mock_ws
+
+        with patch(f"{RelayService.__module__}.RECEIVE_TIMEOUT_SECONDS", 0.01):
             subject.send_action(
                 relay,
                 gateway_action,
             )
 
-        mock_ws.send.assert_called_once_with(
-            json.dumps({"action_id": "a1", "type": "test"})
-        )
+        assert mock_ws.sent == [{"action_id": "a1", "type": "test"}]
 
         gateway_action.refresh_from_db()
         assert gateway_action.status == "failed"
         assert "Timeout waiting for response" in gateway_action.last_error
 
     @pytest.mark.django_db(transaction=True)
-    def test_send_action_bad_response(self, relay, gateway_action):
+    def test_send_action_bad_response(self, relay, gateway_action, mock_connect):
         subject = RelayService()
 
-        mock_ws = AsyncMock(spec=ClientConnection)
-        mock_ws.recv.return_value = json.dumps({"unexpected": "data"})
-
-        with patch(f"{RelayService.__module__}.connect") as mock_connect:
-            mock_connect.return_value.__aenter__.return_value = mock_ws
-            subject.send_action(
-                relay,
-                gateway_action,
-            )
+        mock_ws = FakeWebSocket(lambda message: {"unexpected": "data"})
+        mock_connect.return_value = mock_ws
 
-        mock_ws.send.assert_called_once_with(
-            json.dumps({"action_id": "a1", "type": "test"})
+        subject.send_action(
+            relay,
+            gateway_action,
         )
 
+        assert mock_ws.sent == [{"action_id": "a1", "type": "test"}]
+
         gateway_action.refresh_from_db()
         assert gateway_action.status == "failed"
         assert "Unexpected response status from gateway" in gateway_action.last_error
 
+    @pytest.mark.django_db(transaction=True)
+    def test_send_action_connection_error(self, relay, gateway_action, mock_connect):
+        subject = RelayService()
+        mock_connect.side_effect = OSError("unreachable")
+
+        subject.send_action(relay, gateway_action)
+
+        gateway_action.refresh_from_db()
+        assert gateway_action.status == "failed"
+        assert "unreachable" in gateway_action.last_error
+
     def test_send_action(self, relay, gateway_action):
         subject = RelayService()
 
-        with patch.object(
-            asyncio,
-            "run",
-        ) as mock_asyncio_run:
+        with patch.object(background_loop, "run") as mock_run:
             subject.send_action(relay, gateway_action)
 
-        assert mock_asyncio_run.call_count == 1
-        coro = mock_asyncio_run.call_args[0][0]
-        assert (
-            mock_asyncio_run.call_args[0][0].__qualname__
-            == "RelayService.async_send_action"
-        )
+        assert mock_run.call_count == 1
+        coro = mock_run.call_args[0][0]
+        assert coro.__qualname__ == "RelayService.async_send_action"
         coro.close()
+
+
+class TestSasTokenCache:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        clear_sas_tokens()
+        yield
+        clear_sas_tokens()
+
+    @pytest.fixture
+    def create_sas_token(self):
+        with patch.object(
+            RelayURI, "create_sas_token", autospec=True, side_effect=lambda uri: "TOKEN"
+        ) as create_sas_token:
+            yield create_sas_token
+
+    def test_reuses_token_across_instances(self, create_sas_token):
+        relay = RelayFactory.build()
+
+        first = RelayURI(relay).sas_token()
+        second = RelayURI(relay).sas_token()
+
+        assert first == second
+        assert create_sas_token.call_count == 1
+
+    def test_refreshes_token_near_expiry(self, create_sas_token):
+        relay = RelayFactory.build()
+
+        with time_machine.travel(0, tick=False) as traveller:
+            first = RelayURI(relay).sas_token()
+            traveller.shift(
+                SAS_TOKEN_EXPIRY_SECONDS - SAS_TOKEN_REFRESH_MARGIN_SECONDS - 1
+            )
+            assert RelayURI(relay).sas_token() == first
+
+            traveller.shift(1)
+            second = RelayURI(relay).sas_token()
+
+        assert second.expires_at > first.expires_at
+        assert create_sas_token.call_count == 2
+
+    def test_refreshes_token_when_relay_config_changes(self, create_sas_token):
+        relay = RelayFactory.build()
+        RelayURI(relay).sas_token()
+
+        relay.key_name = "AnotherKey"
+        RelayURI(relay).sas_token()
+
+        assert create_sas_token.call_count == 2
+
+    def test_keeps_a_token_per_relay(self, create_sas_token):
+        RelayURI(RelayFactory.build()).sas_token()
+        RelayURI(RelayFactory.build()).sas_token()
+
+        assert create_sas_token.call_count == 2
+
+    @pytest.mark.django_db
+    def test_saving_relay_clears_its_token(self, create_sas_token):
+        relay = RelayFactory.create()
+        RelayURI(relay).sas_token()
+
+        relay.save()
+        RelayURI(relay).sas_token()
+
+        assert create_sas_token.call_count == 2
+
+    def test_creates_one_token_for_concurrent_callers(self, create_sas_token):
+        relay = RelayFactory.build()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            tokens = set(executor.map(lambda _: RelayURI(relay).sas_token(), range(32)))
+
+        assert len(tokens) == 1
+        assert create_sas_token.call_count == 1
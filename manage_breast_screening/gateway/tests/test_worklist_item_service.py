@@ -5,6 +5,11 @@ from unittest.mock import patch
 import pytest
 import time_machine
 
+from manage_breast_screening.clinics.models import ClinicStatus
+from manage_breast_screening.clinics.tests.factories import (
+    ClinicFactory,
+    ClinicStatusFactory,
+)
 from manage_breast_screening.gateway.models import (
     GatewayAction,
     GatewayActionStatus,
@@ -12,9 +17,12 @@ from manage_breast_screening.gateway.models import (
 )
 from manage_breast_screening.gateway.relay_service import RelayService
 from manage_breast_screening.gateway.worklist_item_service import WorklistItemService
+from manage_breast_screening.participants.models.appointment import (
+    AppointmentStatusNames,
+)
 from manage_breast_screening.participants.tests.factories import AppointmentFactory
 
-from .factories import RelayFactory
+from .factories import GatewayActionFactory, RelayFactory
 
 
 @pytest.mark.django_db
@@ -41,13 +49,14 @@ class TestWorklistItemService:
 
         assert re.match(r"^ACC20250615[A-F0-9]{4}$", action.accession_number)
 
-    def test_send_action_is_called(self, mock_send_action):
+    def test_action_is_left_for_relay_sender(self, mock_send_action):
         appointment = AppointmentFactory()
-        relay = RelayFactory(setting=appointment.clinic_slot.clinic.setting)
+        RelayFactory(setting=appointment.clinic_slot.clinic.setting)
 
         action = WorklistItemService.create(appointment)
 
-        mock_send_action.assert_called_once_with(relay, action)
+        assert action.next_retry_at is None
+        mock_send_action.assert_not_called()
 
     def test_no_relay_does_not_create_action(self, mock_send_action):
         appointment = AppointmentFactory()
@@ -114,9 +123,7 @@ class TestWorklistItemService:
         assert worklist_item["scheduled"]["date"] == "20250710"
         assert worklist_item["scheduled"]["time"] == "143000"
 
-    def test_create_action_does_not_duplicate_for_same_appointment(
-        self, mock_send_action
-    ):
+    def test_create_action_does_not_duplicate_for_same_appointment(self, _):
         appointment = AppointmentFactory()
         RelayFactory(setting=appointment.clinic_slot.clinic.setting)
 
@@ -124,4 +131,120 @@ class TestWorklistItemService:
         action = WorklistItemService.create(appointment)
 
         assert action is None
-        mock_send_action.assert_called_once()
+        assert appointment.gateway_actions.count() == 1
+
+    def test_create_action_does_not_duplicate_confirmed_action(self, _):
+        appointment = AppointmentFactory()
+        RelayFactory(setting=appointment.clinic_slot.clinic.setting)
+        GatewayActionFactory(
+            appointment=appointment, status=GatewayActionStatus.CONFIRMED
+        )
+
+        assert WorklistItemService.create(appointment) is None
+
+
+@pytest.mark.django_db
+class TestCreateForClinic:
+    @pytest.fixture
+    def clinic(self):
+        clinic = ClinicFactory()
+        RelayFactory(setting=clinic.setting)
+        return clinic
+
+    def appointment(self, clinic, status=AppointmentStatusNames.SCHEDULED):
+        return AppointmentFactory(clinic_slot__clinic=clinic, current_status=status)
+
+    def test_creates_actions_for_remaining_appointments(self, clinic):
+        scheduled = self.appointment(clinic)
+        checked_in = self.appointment(clinic, AppointmentStatusNames.CHECKED_IN)
+        self.appointment(clinic, AppointmentStatusNames.IN_PROGRESS)
+        self.appointment(ClinicFactory(setting=clinic.setting))
+
+        actions = WorklistItemService.create_for_clinic(clinic)
+
+        assert {action.appointment for action in actions} == {scheduled, checked_in}
+        assert GatewayAction.objects.count() == 2
+        for action in GatewayAction.objects.all():
+            assert action.status == GatewayActionStatus.PENDING
+            assert action.payload["action_id"] == str(action.id)
+            assert (
+                action.payload["parameters"]["worklist_item"]["accession_number"]
+                == action.accession_number
+            )
+
+    def test_inserts_actions_in_one_query(self, clinic, django_assert_max_num_queries):
+        for _ in range(5):
+            self.appointment(clinic)
+
+        # Relay version stamp and lookup, clinic lock, appointments,
+        # accession number check, insert and savepoints
+        with django_assert_max_num_queries(8):
+            actions = WorklistItemService.create_for_clinic(clinic)
+
+        assert len(actions) == 5
+
+    def test_avoids_accession_numbers_already_in_use(self, clinic):
+        existing = GatewayActionFactory(accession_number="ACC20250101AAAA")
+        self.appointment(clinic)
+
+        with patch.object(
+            WorklistItemService,
+            "_generate_accession_number",
+            side_effect=[existing.accession_number, "ACC20250101BBBB"],
+        ):
+            actions = WorklistItemService.create_for_clinic(clinic)
+
+        assert [action.accession_number for action in actions] == ["ACC20250101BBBB"]
+
+    def test_skips_appointments_already_on_the_worklist(self, clinic):
+        pending = self.appointment(clinic)
+        GatewayActionFactory(appointment=pending)
+        failed = self.appointment(clinic)
+        GatewayActionFactory(appointment=failed, status=GatewayActionStatus.FAILED)
+
+        actions = WorklistItemService.create_for_clinic(clinic)
+
+        assert [action.appointment for action in actions] == [failed]
+        assert WorklistItemService.create_for_clinic(clinic) == []
+
+    def test_no_relay_does_not_create_actions(self):
+        clinic = ClinicFactory()
+        self.appointment(clinic)
+
+        assert WorklistItemService.create_for_clinic(clinic) == []
+        assert not GatewayAction.objects.exists()
+
+    def test_creates_actions_when_clinic_opens(
+        self, clinic, django_capture_on_commit_callbacks
+    ):
+        appointment = self.appointment(clinic)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ClinicStatusFactory(clinic=clinic, state=ClinicStatus.IN_PROGRESS)
+
+        assert GatewayAction.objects.get().appointment == appointment
+
+    def test_does_not_create_actions_for_other_clinic_statuses(
+        self, clinic, django_capture_on_commit_callbacks
+    ):
+        self.appointment(clinic)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ClinicStatusFactory(clinic=clinic, state=ClinicStatus.CLOSED)
+
+        assert not GatewayAction.objects.exists()
+
+    def test_logs_failures_when_clinic_opens(
+        self, clinic, django_capture_on_commit_callbacks
+    ):
+        self.appointment(clinic)
+
+        with (
+            patch.object(
+                WorklistItemService, "create_for_clinic", side_effect=RuntimeError
+            ),
+            django_capture_on_commit_callbacks(execute=True),
+        ):
+            status = ClinicStatusFactory(clinic=clinic, state=ClinicStatus.IN_PROGRESS)
+
+        assert ClinicStatus.objects.filter(pk=status.pk).exists()
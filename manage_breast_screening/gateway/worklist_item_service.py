@@ -4,16 +4,25 @@ import logging
 import uuid
 from datetime import datetime, timezone
 
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
 
+from manage_breast_screening.clinics.models import Clinic
 from manage_breast_screening.dicom.models import Image
 from manage_breast_screening.participants.models import Appointment
 
 from .models import GatewayAction, GatewayActionStatus, GatewayActionType, Relay
-from .relay_service import RelayService
 
 logger = logging.getLogger(__name__)
 
+# An appointment with an action in one of these statuses already has, or is
+# about to have, an item on the modality worklist
+ACTIVE_STATUSES = [
+    GatewayActionStatus.PENDING,
+    GatewayActionStatus.SENT,
+    GatewayActionStatus.CONFIRMED,
+]
+
 
 def get_images_for_appointment(appointment: Appointment):
     """
@@ -57,12 +66,81 @@ class WorklistItemService:
         service = cls(appointment)
         return service._create_action()
 
-    def _generate_accession_number(self) -> str:
+    @classmethod
+    def create_for_clinic(cls, clinic: Clinic) -> list[GatewayAction]:
+        """
+        Create worklist item actions for every remaining appointment in the
+        clinic that doesn't have one yet, in a single insert.
+
+        Returns the new GatewayActions with status PENDING. The relay sender
+        sends them together over one connection per relay, so worklists are
+        ready on the modalities before participants arrive.
+        """
+        if not Relay.for_setting(clinic.setting_id):
+            logger.info(
+                "No relay found for clinic %s, skipping worklist push", clinic.pk
+            )
+            return []
+
+        with transaction.atomic():
+            # Serialise pushes for a clinic, so no appointment gets two actions
+            Clinic.objects.select_for_update().get(pk=clinic.pk)
+
+            appointments = (
+                clinic.appointments.remaining()
+                .exclude(
+                    Exists(
+                        GatewayAction.objects.filter(
+                            appointment=OuterRef("pk"),
+                            type=GatewayActionType.WORKLIST_CREATE,
+                            status__in=ACTIVE_STATUSES,
+                        )
+                    )
+                )
+                .select_related("clinic_slot", "screening_episode__participant")
+                .order_by("clinic_slot__starts_at")
+            )
+
+            services = [cls(appointment) for appointment in appointments]
+            accession_numbers = cls._unused_accession_numbers(len(services))
+            actions = [
+                service._build_action(accession_number)
+                for service, accession_number in zip(services, accession_numbers)
+            ]
+
+            GatewayAction.objects.bulk_create(actions)
+
+        logger.info("Created %s gateway actions for clinic %s", len(actions), clinic.pk)
+        return actions
+
+    @staticmethod
+    def _generate_accession_number() -> str:
         """Generate unique accession number (max 16 chars per DICOM SH limit)."""
         timestamp = datetime.now(timezone.utc).strftime("%Y%m%d")
         random_suffix = uuid.uuid4().hex[:4].upper()
         return f"ACC{timestamp}{random_suffix}"
 
+    @classmethod
+    def _unused_accession_numbers(cls, count: int) -> list[str]:
+        """
+        Generate count accession numbers that clash neither with each other
+        nor with existing actions. There are only 65,536 suffixes a day, so
+        clashes with earlier clinics' numbers are likely on a busy day.
+        """
+        accession_numbers = set()
+        while len(accession_numbers) < count:
+            candidates = {
+                cls._generate_accession_number()
+                for _ in range(count - len(accession_numbers))
+            } - accession_numbers
+            candidates -= set(
+                GatewayAction.objects.filter(
+                    accession_number__in=candidates
+                ).values_list("accession_number", flat=True)
+            )
+            accession_numbers |= candidates
+        return list(accession_numbers)
+
     def _build_payload(self, action_id: uuid.UUID, accession_number: str) -> dict:
         """Build the worklist create payload."""
         participant = self.participant
@@ -123,38 +201,36 @@ class WorklistItemService:
 
         if self.appointment.gateway_actions.filter(
             type=GatewayActionType.WORKLIST_CREATE,
-            status__in=[GatewayActionStatus.PENDING, GatewayActionStatus.SENT],
+            status__in=ACTIVE_STATUSES,
         ).exists():
             logger.info(
                 f"Gateway action already exists for appointment {self.appointment.pk}, skipping creation"
             )
             return None
 
-        action_id = uuid.uuid4()
-        accession_number = self._generate_accession_number()
-        payload = self._build_payload(action_id, accession_number)
+        action = self._build_action(self._generate_accession_number())
 
         try:
-            action = GatewayAction.objects.create(
-                id=action_id,
-                appointment=self.appointment,
-                type=GatewayActionType.WORKLIST_CREATE,
-                accession_number=accession_number,
-                payload=payload,
-                status=GatewayActionStatus.PENDING,
-            )
+            action.save(force_insert=True)
         except IntegrityError as e:
             raise GatewayActionAlreadyExistsError(
                 f"Gateway action already exists for appointment {self.appointment.pk}"
             ) from e
 
         logger.info(
-            f"Created gateway action {action_id} for appointment {self.appointment.pk}"
+            f"Created gateway action {action.id} for appointment {self.appointment.pk}"
         )
 
-        try:
-            RelayService().send_action(relay, action)
-        except Exception as e:
-            logger.error(f"Failed to send gateway action {action_id} to relay: {e}")
-
         return action
+
+    def _build_action(self, accession_number: str) -> GatewayAction:
+        """Build an unsaved worklist create action."""
+        action_id = uuid.uuid4()
+        return GatewayAction(
+            id=action_id,
+            appointment=self.appointment,
+            type=GatewayActionType.WORKLIST_CREATE,
+            accession_number=accession_number,
+            payload=self._build_payload(action_id, accession_number),
+            status=GatewayActionStatus.PENDING,
+        )
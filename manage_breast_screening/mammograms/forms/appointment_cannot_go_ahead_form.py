@@ -103,6 +103,6 @@ class AppointmentCannotGoAheadForm(forms.Form):
                 reasons_json[field_name] = value
         self.instance.stopped_reasons = reasons_json
         self.instance.reinvite = self.cleaned_data["decision"]
-        self.instance.save()
+        self.instance.save(update_fields=["stopped_reasons", "reinvite"])
 
         return self.instance
@@ -117,7 +117,9 @@ class RecallService:
         # Currently this is just a boolean flag; when we implement appointment
         # scheduling then this will need to store the reason for the reinvite.
         self.appointment.reinvite = True
-        self.appointment.save()
+        # Only write this field, so a status set since the appointment was
+        # loaded isn't overwritten with a stale copy
+        self.appointment.save(update_fields=["reinvite"])
 
 
 class AppointmentWorkflowService:
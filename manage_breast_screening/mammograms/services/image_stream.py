@@ -0,0 +1,245 @@
+"""
+Server-Sent Events for the images arriving for an appointment.
+
+Every image stream in the process subscribes to one ImageStreamHub. The hub
+listens for image notifications on a single database connection, and keeps
+one AppointmentImageWatcher per appointment that somebody is viewing. When
+an appointment's images change, its watcher queries and renders the changed
+images once and sends the events to each of its subscribers, so the
+database work doesn't depend on how many pages are open.
+"""
+
+import json
+import logging
+import queue
+import threading
+from collections.abc import Iterator
+
+from django.db import close_old_connections, connection
+from django.template.loader import render_to_string
+
+from manage_breast_screening.dicom.image_notifications import (
+    ImageNotificationListener,
+)
+from manage_breast_screening.gateway.worklist_item_service import (
+    get_images_for_appointment,
+)
+
+logger = logging.getLogger(__name__)
+
+# How often the hub checks whether it has been stopped while waiting for
+# notifications
+LISTEN_TIMEOUT_SECONDS = 1
+# After losing its connection, wait this long before listening again,
+# doubling with each consecutive failure up to the maximum
+RELISTEN_BACKOFF_SECONDS = 1
+MAX_RELISTEN_BACKOFF_SECONDS = 30
+KEEPALIVE = ": keepalive\n\n"
+
+
+def format_sse_event(event: str, data: str, event_id=None) -> str:
+    """Format data as a Server-Sent Event."""
+    lines = "\n".join(f"data: {line}" for line in data.splitlines())
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\n{lines}\n\n"
+
+
+def format_image_event(image) -> str:
+    """
+    An SSE event for one image, with the image's revision as its id.
+
+    image-added is sent once the DICOM file is stored, and image-ready once
+    the previews have been rendered.
+    """
+    html = render_to_string(
+        "mammograms/_image_thumbnail.jinja",
+        {"image": image, "laterality": image.laterality_and_view},
+    )
+    data = json.dumps(
+        {"id": str(image.id), "view": image.laterality_and_view, "html": html}
+    )
+    event = "image-ready" if image.image_file else "image-added"
+    return format_sse_event(event, data, event_id=image.revision)
+
+
+class ImageStreamSubscription:
+    """One open image stream, receiving events from its watcher."""
+
+    def __init__(self, hub: "ImageStreamHub", watcher: "AppointmentImageWatcher"):
+        self.hub = hub
+        self.watcher = watcher
+        self.queue = queue.Queue()
+
+    def events(self, keepalive_seconds: float) -> Iterator[str]:
+        """
+        Yield events as they arrive, and a keepalive comment whenever none
+        has for keepalive_seconds.
+        """
+        while True:
+            try:
+                yield self.queue.get(timeout=keepalive_seconds)
+            except queue.Empty:
+                yield KEEPALIVE
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class AppointmentImageWatcher:
+    """
+    The image events for one appointment, shared by all its subscribers.
+
+    Only the latest event for each image is kept, so a subscriber can be
+    sent everything after its last event id without querying again.
+    """
+
+    def __init__(self, appointment):
+        self.appointment = appointment
+        self.revision = 0
+        self.latest_events: dict[str, tuple[int, str]] = {}
+        self.subscribers: set[ImageStreamSubscription] = set()
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def subscribe(
+        self, subscription: ImageStreamSubscription, last_event_id: int
+    ) -> None:
+        with self._lock:
+            if not self._loaded:
+                self._refresh()
+            for revision, event in sorted(self.latest_events.values()):
+                if revision > last_event_id:
+                    subscription.queue.put(event)
+            self.subscribers.add(subscription)
+
+    def unsubscribe(self, subscription: ImageStreamSubscription) -> None:
+        with self._lock:
+            self.subscribers.discard(subscription)
+
+    def refresh(self):
+        """Send subscribers an event for each image changed since the last."""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        images = (
+            get_images_for_appointment(self.appointment)
+            .filter(revision__gt=self.revision)
+            .order_by("revision")
+        )
+        for image in images:
+            event = format_image_event(image)
+            self.latest_events[str(image.id)] = (image.revision, event)
+            self.revision = image.revision
+            for subscription in self.subscribers:
+                subscription.queue.put(event)
+        self._loaded = True
+
+
+class ImageStreamHub:
+    """
+    Fans image events out to every image stream open in this process.
+
+    The hub listens in a background thread, which is a greenlet under
+    gevent, started when the first stream subscribes.
+    """
+
+    def __init__(self):
+        self.watchers: dict[str, AppointmentImageWatcher] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._listening = threading.Event()
+
+    def subscribe(self, appointment, last_event_id: int) -> ImageStreamSubscription:
+        """Subscribe to events for images changed after last_event_id."""
+        self.start()
+
+        # Holding the lock stops the watcher being removed by another stream
+        # unsubscribing before this one has been added
+        with self._lock:
+            watcher = self.watchers.get(str(appointment.pk))
+            if watcher is None:
+                watcher = self.watchers[str(appointment.pk)] = AppointmentImageWatcher(
+                    appointment
+                )
+            subscription = ImageStreamSubscription(self, watcher)
+            watcher.subscribe(subscription, last_event_id)
+        return subscription
+
+    def unsubscribe(self, subscription: ImageStreamSubscription):
+        watcher = subscription.watcher
+        watcher.unsubscribe(subscription)
+        with self._lock:
+            key = str(watcher.appointment.pk)
+            if not watcher.subscribers and self.watchers.get(key) is watcher:
+                del self.watchers[key]
+
+    def refresh(self, appointment_ids):
+        for appointment_id in appointment_ids:
+            watcher = self.watchers.get(appointment_id)
+            if watcher is not None:
+                watcher.refresh()
+
+    def start(self):
+        """Start listening, if not already, and wait until the hub is ready."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._listening.clear()
+                self._thread = threading.Thread(
+                    target=self._listen, name="image-stream-hub", daemon=True
+                )
+                self._thread.start()
+        # Notifications sent before the hub is listening would be missed
+        self._listening.wait(timeout=LISTEN_TIMEOUT_SECONDS)
+
+    def stop(self):
+        """Stop listening and forget every watcher."""
+        thread = self._thread
+        self._stopping.set()
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            self._thread = None
+            self.watchers.clear()
+
+    def _listen(self):
+        failures = 0
+        try:
+            while not self._stopping.is_set():
+                try:
+                    with ImageNotificationListener() as listener:
+                        self._listening.set()
+                        # Catch up on anything missed while reconnecting
+                        if failures:
+                            with self._lock:
+                                appointment_ids = list(self.watchers)
+                            self._refresh(appointment_ids)
+                        failures = 0
+                        while not self._stopping.is_set():
+                            if notified := listener.wait(LISTEN_TIMEOUT_SECONDS):
+                                self._refresh(notified)
+                except Exception:
+                    failures += 1
+                    self._listening.clear()
+                    logger.exception("Image stream hub lost its connection")
+                    self._stopping.wait(
+                        min(
+                            RELISTEN_BACKOFF_SECONDS * 2 ** (failures - 1),
+                            MAX_RELISTEN_BACKOFF_SECONDS,
+                        )
+                    )
+        finally:
+            connection.close()
+
+    def _refresh(self, appointment_ids):
+        # This thread outlives any request, so manages its own connection
+        close_old_connections()
+        try:
+            self.refresh(appointment_ids)
+        finally:
+            close_old_connections()
+
+
+image_stream_hub = ImageStreamHub()
@@ -1,12 +1,20 @@
 import pytest
 
 from manage_breast_screening.mammograms.services.appointment_services import StepNames
+from manage_breast_screening.mammograms.services.image_stream import image_stream_hub
 from manage_breast_screening.participants.models.appointment import (
     AppointmentStatusNames,
 )
 from manage_breast_screening.participants.tests.factories import AppointmentFactory
 
 
+@pytest.fixture(autouse=True)
+def stop_image_stream_hub():
+    # The hub's listening connection would stop the test database being dropped
+    yield
+    image_stream_hub.stop()
+
+
 @pytest.fixture
 def appointment(clinical_user_client):
     return AppointmentFactory.create(
@@ -142,10 +142,8 @@ class TestMultipleImagesInformationForm:
         """Tests for DICOM series with count == 2 (single additional image)."""
 
         def test_no_data_requires_repeat_type(self):
-            series = dicom_factories.SeriesFactory()
-            dicom_factories.ImageFactory.create_batch(
-                2, series=series, laterality="R", view_position="MLO"
-            )
+            series = dicom_factories.SeriesFactory(laterality="R", view_position="MLO")
+            dicom_factories.ImageFactory.create_batch(2, series=series)
             study = series.study
 
             fingerprint = get_fingerprint(study)
@@ -163,10 +161,8 @@ class TestMultipleImagesInformationForm:
             }
 
         def test_all_repeats_requires_reasons(self):
-            series = dicom_factories.SeriesFactory()
-            dicom_factories.ImageFactory.create_batch(
-                2, series=series, laterality="R", view_position="MLO"
-            )
+            series = dicom_factories.SeriesFactory(laterality="R", view_position="MLO")
+            dicom_factories.ImageFactory.create_batch(2, series=series)
             study = series.study
             fingerprint = get_fingerprint(study)
 
@@ -188,10 +184,8 @@ class TestMultipleImagesInformationForm:
             }
 
         def test_no_repeats_does_not_require_reasons(self):
-            series = dicom_factories.SeriesFactory()
-            dicom_factories.ImageFactory.create_batch(
-                2, series=series, laterality="R", view_position="MLO"
-            )
+            series = dicom_factories.SeriesFactory(laterality="R", view_position="MLO")
+            dicom_factories.ImageFactory.create_batch(2, series=series)
             study = series.study
             fingerprint = get_fingerprint(study)
 
@@ -208,10 +202,8 @@ class TestMultipleImagesInformationForm:
             assert form.is_valid()
 
         def test_all_repeats_with_reasons_saves_data(self):
-            series = dicom_factories.SeriesFactory()
-            dicom_factories.ImageFactory.create_batch(
-                2, series=series, laterality="R", view_position="MLO"
-            )
+            series = dicom_factories.SeriesFactory(laterality="R", view_position="MLO")
+            dicom_factories.ImageFactory.create_batch(2, series=series)
             study = series.study
             fingerprint = get_fingerprint(study)
 
@@ -492,10 +484,8 @@ class TestMultipleImagesInformationForm:
         """Tests for series with count > 2 (multiple additional images)."""
 
         def test_some_repeats_requires_count_and_reasons(self):
-            series = dicom_factories.SeriesFactory()
-            dicom_factories.ImageFactory.create_batch(
-                3, series=series, laterality="L", view_position="CC"
-            )
+            series = dicom_factories.SeriesFactory(laterality="L", view_position="CC")
+            dicom_factories.ImageFactory.create_batch(3, series=series)
             study = series.study
             fingerprint = get_fingerprint(study)
 
@@ -514,10 +504,8 @@ class TestMultipleImagesInformationForm:
             assert "lcc_some_repeats_reasons" in form.errors
 
         def test_all_repeats_does_not_require_count(self):
-            series = dicom_factories.SeriesFactory()
-            dicom_factories.ImageFactory.create_batch(
-                3, series=series, laterality="L", view_position="CC"
-            )
+            series = dicom_factories.SeriesFactory(laterality="L", view_position="CC")
+            dicom_factories.ImageFactory.create_batch(3, series=series)
             study = series.study
             fingerprint = get_fingerprint(study)
 
@@ -535,10 +523,8 @@ class TestMultipleImagesInformationForm:
             assert form.is_valid()
 
         def test_some_repeats_with_count_and_reasons_saves_data(self):
-            series = dicom_factories.SeriesFactory()
-            dicom_factories.ImageFactory.create_batch(
-                3, series=series, laterality="L", view_position="CC"
-            )
+            series = dicom_factories.SeriesFactory(laterality="L", view_position="CC")
+            dicom_factories.ImageFactory.create_batch(3, series=series)
             study = series.study
             fingerprint = get_fingerprint(study)
 
@@ -681,10 +667,8 @@ class TestMultipleImagesInformationForm:
 
     class TestStaleFormDetectionWithDicomSeries:
         def test_is_stale_returns_true_when_series_count_changes(self):
-            series = dicom_factories.SeriesFactory()
-            dicom_factories.ImageFactory.create_batch(
-                2, series=series, laterality="R", view_position="MLO"
-            )
+            series = dicom_factories.SeriesFactory(laterality="R", view_position="MLO")
+            dicom_factories.ImageFactory.create_batch(2, series=series)
             study = series.study
 
             # Get fingerprint for original state
@@ -692,9 +676,7 @@ class TestMultipleImagesInformationForm:
             old_fingerprint = initial_form.initial["series_fingerprint"]
 
             # Change the series count by adding a new image
-            dicom_factories.ImageFactory(
-                series=series, laterality="R", view_position="MLO"
-            )
+            dicom_factories.ImageFactory(series=series)
 
             # Form with old fingerprint submitted, but series has changed
             form = MultipleImagesInformationForm(
@@ -710,10 +692,8 @@ class TestMultipleImagesInformationForm:
             assert form.is_stale()
 
         def test_is_stale_returns_true_when_new_series_appears(self):
-            series = dicom_factories.SeriesFactory()
-            dicom_factories.ImageFactory.create_batch(
-                2, series=series, laterality="R", view_position="MLO"
-            )
+            series = dicom_factories.SeriesFactory(laterality="R", view_position="MLO")
+            dicom_factories.ImageFactory.create_batch(2, series=series)
             study = series.study
 
             # Get fingerprint for original state (only series1)
@@ -721,10 +701,10 @@ class TestMultipleImagesInformationForm:
             old_fingerprint = initial_form.initial["series_fingerprint"]
 
             # New series appears
-            new_series = dicom_factories.SeriesFactory(study=study)
-            dicom_factories.ImageFactory.create_batch(
-                2, series=new_series, laterality="L", view_position="MLO"
+            new_series = dicom_factories.SeriesFactory(
+                study=study, laterality="L", view_position="MLO"
             )
+            dicom_factories.ImageFactory.create_batch(2, series=new_series)
 
             # Form with old fingerprint, but new series in DB
             form = MultipleImagesInformationForm(
@@ -8,6 +8,7 @@ from manage_breast_screening.mammograms.services.appointment_services import (
 )
 from manage_breast_screening.participants.models.appointment import (
     ActionPerformedByDifferentUser,
+    Appointment,
     AppointmentMachine,
     AppointmentStatusNames,
     AppointmentWorkflowStepCompletion,
@@ -268,6 +269,19 @@ class TestRecallService:
 
         assert appointment.reinvite
 
+    def test_reinvite_keeps_a_status_set_since_loading(self, clinical_user):
+        appointment = AppointmentFactory(reinvite=False)
+        loaded = Appointment.objects.get(pk=appointment.pk)
+        AppointmentStatusFactory(
+            appointment=appointment, name=AppointmentStatusNames.CHECKED_IN
+        )
+
+        RecallService(loaded, clinical_user).reinvite()
+        appointment.refresh_from_db()
+
+        assert appointment.reinvite
+        assert appointment.current_status_name == AppointmentStatusNames.CHECKED_IN
+
 
 @pytest.mark.django_db
 class TestAppointmentWorkflowService:
@@ -0,0 +1,140 @@
+import json
+import queue
+from unittest.mock import patch
+
+import pytest
+from django.db import transaction
+
+from manage_breast_screening.dicom.image_notifications import record_image_change
+from manage_breast_screening.dicom.tests import factories as dicom_factories
+from manage_breast_screening.gateway.tests.factories import GatewayActionFactory
+from manage_breast_screening.gateway.worklist_item_service import (
+    get_images_for_appointment,
+)
+from manage_breast_screening.mammograms.services.image_stream import (
+    KEEPALIVE,
+    ImageStreamHub,
+)
+from manage_breast_screening.participants.tests.factories import AppointmentFactory
+
+
+def event_ids(subscription):
+    ids = []
+    while True:
+        try:
+            event = subscription.queue.get_nowait()
+        except queue.Empty:
+            return ids
+        ids.append(int(event.splitlines()[0].removeprefix("id: ")))
+
+
+@pytest.fixture
+def appointment():
+    return AppointmentFactory.create()
+
+
+@pytest.fixture
+def series(appointment):
+    series = dicom_factories.SeriesFactory(laterality="R", view_position="CC")
+    GatewayActionFactory.create(
+        id=str(series.study.source_message_id), appointment=appointment
+    )
+    return series
+
+
+@pytest.mark.django_db
+class TestImageStreamHub:
+    @pytest.fixture
+    def hub(self):
+        # The listening thread is covered by the transactional test below
+        with patch.object(ImageStreamHub, "start"):
+            yield ImageStreamHub()
+
+    def test_replays_images_after_the_last_event_id(self, hub, appointment, series):
+        for revision in (1, 2, 3):
+            dicom_factories.ImageFactory.create(series=series, revision=revision)
+
+        subscription = hub.subscribe(appointment, last_event_id=1)
+
+        assert event_ids(subscription) == [2, 3]
+
+    def test_shares_a_watcher_between_subscribers(self, hub, appointment, series):
+        first = hub.subscribe(appointment, last_event_id=0)
+        second = hub.subscribe(appointment, last_event_id=0)
+        assert first.watcher is second.watcher
+
+        dicom_factories.ImageFactory.create(series=series, revision=1)
+        with patch(
+            "manage_breast_screening.mammograms.services.image_stream"
+            ".get_images_for_appointment",
+            wraps=get_images_for_appointment,
+        ) as get_images:
+            hub.refresh([str(appointment.pk)])
+
+        get_images.assert_called_once()
+        assert event_ids(first) == [1]
+        assert event_ids(second) == [1]
+
+    def test_replays_only_the_latest_event_for_each_image(
+        self, hub, appointment, series
+    ):
+        image = dicom_factories.ImageFactory.create(
+            series=series, revision=1, image_file=None
+        )
+        first = hub.subscribe(appointment, last_event_id=0)
+        image.image_file = dicom_factories.ImageFactory.build().image_file
+        image.revision = 2
+        image.save()
+        hub.refresh([str(appointment.pk)])
+
+        second = hub.subscribe(appointment, last_event_id=0)
+
+        assert event_ids(first) == [1, 2]
+        assert event_ids(second) == [2]
+
+    def test_ignores_appointments_nobody_is_watching(self, hub, appointment, series):
+        subscription = hub.subscribe(appointment, last_event_id=0)
+        other = AppointmentFactory.create()
+
+        with patch.object(subscription.watcher, "refresh") as refresh:
+            hub.refresh([str(other.pk)])
+
+        refresh.assert_not_called()
+
+    def test_forgets_the_watcher_after_the_last_subscriber_leaves(
+        self, hub, appointment
+    ):
+        first = hub.subscribe(appointment, last_event_id=0)
+        second = hub.subscribe(appointment, last_event_id=0)
+
+        first.close()
+        assert str(appointment.pk) in hub.watchers
+        second.close()
+        assert hub.watchers == {}
+
+    def test_sends_keepalives_while_nothing_changes(self, hub, appointment):
+        events = hub.subscribe(appointment, last_event_id=0).events(0.01)
+
+        assert next(events) == KEEPALIVE
+
+
+@pytest.mark.django_db(transaction=True)
+def test_streams_images_recorded_by_ingest(appointment, series):
+    hub = ImageStreamHub()
+    try:
+        subscription = hub.subscribe(appointment, last_event_id=0)
+        events = subscription.events(keepalive_seconds=5)
+
+        image = dicom_factories.ImageFactory.build(series=series)
+        with transaction.atomic():
+            record_image_change(image, series.study.source_message_id)
+            image.save()
+
+        event = next(events)
+        subscription.close()
+    finally:
+        hub.stop()
+
+    assert event.startswith("id: 1\nevent: image-ready\n")
+    data = json.loads(event.splitlines()[2].removeprefix("data: "))
+    assert data["id"] == str(image.id)
@@ -1,3 +1,4 @@
+import json
 from unittest.mock import patch
 
 import pytest
@@ -17,7 +18,11 @@ from pytest_django.asserts import (
 import manage_breast_screening.dicom.tests.factories as dicom_factories
 from manage_breast_screening.core.models import AuditLog
 from manage_breast_screening.dicom.models import Study as DicomStudy
-from manage_breast_screening.gateway.models import GatewayAction, GatewayActionType
+from manage_breast_screening.gateway.models import (
+    GatewayAction,
+    GatewayActionStatus,
+    GatewayActionType,
+)
 from manage_breast_screening.gateway.tests.factories import (
     GatewayActionFactory,
     RelayFactory,
@@ -224,7 +229,7 @@ class TestRecordMedicalInformation:
     def test_creates_gateway_action(
         self, mock_send_action, clinical_user_client, confirmed_identity_appointment
     ):
-        relay = RelayFactory.create(
+        RelayFactory.create(
             setting=confirmed_identity_appointment.clinic_slot.clinic.setting
         )
         clinical_user_client.http.post(
@@ -239,13 +244,16 @@ class TestRecordMedicalInformation:
             action.payload["parameters"]["worklist_item"]["participant"]["nhs_number"]
             == confirmed_identity_appointment.participant.nhs_number
         )
-        mock_send_action.assert_called_once_with(relay, action)
+        assert action.status == GatewayActionStatus.PENDING
+        mock_send_action.assert_not_called()
 
     def test_redirects_to_gateway_images_when_enabled(
         self, clinical_user_client, monkeypatch, confirmed_identity_appointment
     ):
         monkeypatch.setenv("GATEWAY_IMAGES_ENABLED", "true")
-        RelayFactory.create(setting=confirmed_identity_appointment.clinic_slot.clinic.setting)
+        RelayFactory.create(
+            setting=confirmed_identity_appointment.clinic_slot.clinic.setting
+        )
 
         with patch(
             "manage_breast_screening.gateway.relay_service.RelayService.send_action"
@@ -437,6 +445,23 @@ class TestGatewayImages:
         )
         assert response.status_code == 200
 
+    def test_streams_images_after_those_rendered(
+        self, clinical_user_client, reviewed_appointment
+    ):
+        series = dicom_factories.SeriesFactory()
+        GatewayActionFactory.create(
+            id=str(series.study.source_message_id),
+            appointment=reviewed_appointment,
+        )
+        dicom_factories.ImageFactory.create(series=series, revision=4)
+        dicom_factories.ImageFactory.create(series=series, revision=9)
+
+        response = clinical_user_client.http.get(
+            reverse("mammograms:gateway_images", kwargs={"pk": reviewed_appointment.pk})
+        )
+
+        assert 'data-last-event-id="9"' in response.text
+
     @patch(
         "manage_breast_screening.mammograms.presenters.appointment_presenters.gateway_images_enabled",
         return_value=True,
@@ -588,6 +613,79 @@ class TestAppointmentImagesStream:
         assert response.status_code == 200
         assert response["Content-Type"] == "text/event-stream"
 
+    @pytest.fixture
+    def images(self, in_progress_appointment):
+        series = dicom_factories.SeriesFactory(laterality="R", view_position="CC")
+        GatewayActionFactory.create(
+            id=str(series.study.source_message_id),
+            appointment=in_progress_appointment,
+        )
+        return [
+            dicom_factories.ImageFactory.create(series=series, revision=1),
+            dicom_factories.ImageFactory.create(
+                series=series, revision=2, image_file=None
+            ),
+            dicom_factories.ImageFactory.create(series=series, revision=3),
+        ]
+
+    def stream(self, client, appointment, **kwargs):
+        response = client.http.get(
+            reverse(
+                "mammograms:appointment_images_stream",
+                kwargs={"pk": appointment.pk},
+            ),
+            **kwargs,
+        )
+        return response, iter(response.streaming_content)
+
+    def test_sends_an_event_per_image_then_keepalives(
+        self, clinical_user_client, in_progress_appointment, images
+    ):
+        response, stream = self.stream(clinical_user_client, in_progress_appointment)
+
+        with patch(
+            "manage_breast_screening.mammograms.views.appointment_workflow_views"
+            ".IMAGES_STREAM_KEEPALIVE_SECONDS",
+            0.01,
+        ):
+            events = [next(stream).decode() for _ in range(3)]
+            assert next(stream) == b": keepalive\n\n"
+        response.close()
+
+        assert [event.splitlines()[:2] for event in events] == [
+            ["id: 1", "event: image-ready"],
+            ["id: 2", "event: image-added"],
+            ["id: 3", "event: image-ready"],
+        ]
+        data = json.loads(events[0].splitlines()[2].removeprefix("data: "))
+        assert data["id"] == str(images[0].id)
+        assert data["view"] == "RCC"
+        assert f'data-image-id="{images[0].id}"' in data["html"]
+
+    def test_resumes_after_last_event_id(
+        self, clinical_user_client, in_progress_appointment, images
+    ):
+        response, stream = self.stream(
+            clinical_user_client,
+            in_progress_appointment,
+            headers={"Last-Event-ID": "2"},
+        )
+
+        assert next(stream).startswith(b"id: 3\n")
+        response.close()
+
+    def test_resumes_after_last_event_id_in_query_string(
+        self, clinical_user_client, in_progress_appointment, images
+    ):
+        response, stream = self.stream(
+            clinical_user_client,
+            in_progress_appointment,
+            query_params={"last_event_id": "1"},
+        )
+
+        assert next(stream).startswith(b"id: 2\n")
+        response.close()
+
     def test_returns_404_for_unknown_appointment(self, clinical_user_client):
         import uuid
 
@@ -88,6 +88,7 @@ def assert_attended_not_screened_flow(client, appointment):
             kwargs={"pk": appointment.clinic_slot.clinic.pk},
         ),
     )
+    appointment.refresh_from_db()
     assert (
         appointment.current_status.name == AppointmentStatusNames.ATTENDED_NOT_SCREENED
     )
@@ -732,6 +733,7 @@ class TestCompleteScreening:
             """,
         )
 
+        appointment.refresh_from_db()
         assert appointment.current_status.name == AppointmentStatusNames.SCREENED
         assertQuerySetEqual(
             appointment.completed_workflow_steps.filter(
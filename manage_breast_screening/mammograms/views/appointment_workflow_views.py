@@ -1,5 +1,4 @@
 import logging
-import time
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
@@ -8,7 +7,6 @@ from django.db import DatabaseError, IntegrityError, transaction
 from django.forms import Form
 from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import redirect
-from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.html import escape, mark_safe
 from django.views import View
@@ -16,7 +14,7 @@ from django.views.decorators.http import require_http_methods
 from django.views.generic import FormView, TemplateView
 
 from manage_breast_screening.auth.models import Permission
-from manage_breast_screening.core.services.auditor import Auditor
+from manage_breast_screening.core.services.auditor import Auditor, buffered_audits
 from manage_breast_screening.core.utils.relative_redirects import (
     extract_relative_redirect_url,
 )
@@ -47,6 +45,9 @@ from manage_breast_screening.mammograms.services.appointment_services import (
     AppointmentWorkflowService,
     RecallService,
 )
+from manage_breast_screening.mammograms.services.image_stream import (
+    image_stream_hub,
+)
 from manage_breast_screening.mammograms.views import gateway_images_enabled
 from manage_breast_screening.manual_images.services import StudyService
 from manage_breast_screening.participants.models import (
@@ -67,6 +68,8 @@ from .mixins import InProgressAppointmentMixin, WorkflowSidebarMixin
 
 MAMMOGRAMS_RECORD_MEDICAL_INFORMATION_VIEWNAME = "mammograms:record_medical_information"
 CLINICS_SHOW_CLINIC_VIEWNAME = "clinics:show_clinic"
+# Seconds between comments sent to keep an idle image stream open
+IMAGES_STREAM_KEEPALIVE_SECONDS = 15
 
 logger = logging.getLogger(__name__)
 
@@ -271,7 +274,7 @@ class TakeImages(WorkflowSidebarMixin, FormView):
         )
         return context
 
-    @transaction.atomic
+    @buffered_audits()
     def form_valid(self, form):
         form.save(
             StudyService(appointment=self.appointment, current_user=self.request.user)
@@ -316,6 +319,10 @@ class GatewayImages(WorkflowSidebarMixin, FormView):
                 "page_title": title,
                 "images": DicomStudyService.images_by_laterality_and_view(images),
                 "image_count": len(images),
+                # The image stream sends changes made after the page was rendered
+                "last_image_revision": max(
+                    (image.revision for image in images), default=0
+                ),
                 "appointment_pk": self.appointment.pk,
                 "continue_button_text": "Confirm all images received",
                 "form_container_classes": "nhsuk-grid-column-full",
@@ -323,7 +330,7 @@ class GatewayImages(WorkflowSidebarMixin, FormView):
         )
         return context
 
-    @transaction.atomic
+    @buffered_audits()
     def form_valid(self, form):
         form.save(
             DicomStudyService(
@@ -566,10 +573,18 @@ class MarkSectionReviewed(InProgressAppointmentMixin, View):
             return HttpResponse(status=201)
 
 
-def format_sse_event(event: str, data: str) -> str:
-    """Format data as a Server-Sent Event."""
-    lines = "\n".join(f"data: {line}" for line in data.splitlines())
-    return f"event: {event}\n{lines}\n\n"
+def last_image_event_id(request) -> int:
+    """
+    The revision the client has already seen.
+
+    Browsers send Last-Event-ID when they reconnect. Before then the page
+    passes the last revision it rendered in the query string.
+    """
+    value = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id", "")
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        return 0
 
 
 @login_required
@@ -583,27 +598,15 @@ def appointment_images_stream(request, pk):
         raise Http404("Appointment not found")
 
     def event_stream():
-        last_image_ids = set()
-
-        while True:
-            images = get_images_for_appointment(appointment)
-            current_image_ids = set(str(img.id) for img in images)
-
-            if current_image_ids != last_image_ids:
-                html = render_to_string(
-                    "mammograms/_image_grid.jinja",
-                    {
-                        "images": DicomStudyService.images_by_laterality_and_view(
-                            images
-                        ),
-                        "image_count": len(images),
-                    },
-                    request=request,
-                )
-                yield format_sse_event("images", html)
-                last_image_ids = current_image_ids
-
-            time.sleep(1)
+        # Streams for the same appointment share one watcher in the hub
+        subscription = image_stream_hub.subscribe(
+            appointment, last_image_event_id(request)
+        )
+        try:
+            # The keepalive also ends the stream once the client has gone
+            yield from subscription.events(IMAGES_STREAM_KEEPALIVE_SECONDS)
+        finally:
+            subscription.close()
 
     response = StreamingHttpResponse(
         event_stream(),
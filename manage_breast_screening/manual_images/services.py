@@ -1,6 +1,4 @@
-from django.db import transaction
-
-from manage_breast_screening.core.services.auditor import Auditor
+from manage_breast_screening.core.services.auditor import Auditor, buffered_audits
 
 from .models import Series, Study
 
@@ -11,7 +9,7 @@ class StudyService:
         self.current_user = current_user
         self.auditor = Auditor(self.current_user)
 
-    @transaction.atomic
+    @buffered_audits()
     def create_with_default_series(self):
         self.delete_if_exists()
 
@@ -29,7 +27,7 @@ class StudyService:
 
         return study
 
-    @transaction.atomic
+    @buffered_audits()
     def create_or_update(
         self,
         series_data: list[dict],
@@ -57,7 +55,7 @@ class StudyService:
         study.save(update_fields=["additional_details"])
         self.auditor.audit_update(study)
 
-    @transaction.atomic
+    @buffered_audits()
     def delete_if_exists(self):
         if hasattr(self.appointment, "study"):
             self._delete_series()
@@ -0,0 +1,211 @@
+"""
+A local stand-in for an Azure Relay hybrid connection and the gateway behind
+it, for load testing relay code without an Azure Relay namespace.
+
+Senders connect to the URL that RelayURI.connection_url generates, with the
+relay's namespace set to the server's host:port and RELAY_URL_SCHEME set to
+"ws". Each echo and worklist.create_item message is answered the way the
+gateway answers it, after a configurable latency. A configurable share of
+messages is answered with an error, or not answered at all.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import random
+import re
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from websockets.asyncio.server import Server, ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+from manage_breast_screening.gateway.models import GatewayActionType
+
+logger = logging.getLogger(__name__)
+
+HYBRID_CONNECTION_PATH = re.compile(r"^/\$hc/(?P<name>[^/?]+)$")
+
+
+@dataclass
+class FakeRelayStats:
+    connections: int = 0
+    rejected_connections: int = 0
+    messages: int = 0
+    errors: int = 0
+    dropped: int = 0
+
+
+@dataclass
+class FakeRelay:
+    # Seconds to wait before answering each message, plus up to jitter more
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Share of messages, from 0 to 1, answered with an error or not at all
+    error_rate: float = 0.0
+    drop_rate: float = 0.0
+    # Reject connections whose SAS token wasn't signed with this key
+    shared_access_key: str | None = None
+    seed: int | None = None
+    stats: FakeRelayStats = field(default_factory=FakeRelayStats)
+
+    def __post_init__(self):
+        self.random = random.Random(self.seed)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> Server:
+        """Start listening, on a free port if port is 0."""
+        return await serve(
+            self.handle_connection,
+            host,
+            port,
+            compression=None,
+            process_request=self.check_request,
+        )
+
+    def check_request(self, connection: ServerConnection, request):
+        url = urllib.parse.urlsplit(request.path)
+        query = urllib.parse.parse_qs(url.query)
+
+        error = None
+        if not HYBRID_CONNECTION_PATH.match(url.path):
+            error = (HTTPStatus.NOT_FOUND, "Not a hybrid connection path")
+        elif query.get("sb-hc-action") != ["connect"]:
+            error = (HTTPStatus.BAD_REQUEST, "sb-hc-action must be connect")
+        elif not self.token_is_valid(query.get("sb-hc-token", [""])[0]):
+            error = (HTTPStatus.UNAUTHORIZED, "Invalid SAS token")
+
+        if error:
+            self.stats.rejected_connections += 1
+            return connection.respond(*error)
+        return None
+
+    def token_is_valid(self, token: str) -> bool:
+        prefix = "SharedAccessSignature "
+        if not token.startswith(prefix):
+            return False
+        if self.shared_access_key is None:
+            return True
+
+        try:
+            fields = dict(
+                part.split("=", 1) for part in token[len(prefix) :].split("&")
+            )
+            encoded_uri, signature = fields["sr"], fields["sig"]
+            expiry = int(fields["se"])
+        except (KeyError, ValueError):
+            return False
+
+        expected = base64.b64encode(
+            hmac.new(
+                self.shared_access_key.encode(),
+                f"{encoded_uri}\n{expiry}".encode(),
+                hashlib.sha256,
+            ).digest()
+        ).decode()
+        return (
+            hmac.compare_digest(urllib.parse.unquote_plus(signature), expected)
+            and expiry > time.time()
+        )
+
+    async def handle_connection(self, websocket: ServerConnection):
+        self.stats.connections += 1
+        answers = set()
+        try:
+            async for message in websocket:
+                # Answer concurrently, so latency doesn't hold up later messages
+                answer = asyncio.create_task(self.answer(websocket, message))
+                answers.add(answer)
+                answer.add_done_callback(answers.discard)
+        except ConnectionClosed:
+            pass
+        finally:
+            for answer in answers:
+                answer.cancel()
+
+    async def answer(self, websocket: ServerConnection, message):
+        self.stats.messages += 1
+        request = json.loads(message)
+
+        if self.random.random() < self.drop_rate:
+            self.stats.dropped += 1
+            return
+
+        await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+        response = self.response_for(request)
+        if response.get("status") == "error":
+            self.stats.errors += 1
+
+        try:
+            await websocket.send(json.dumps(response))
+        except ConnectionClosed:
+            pass
+
+    def response_for(self, request: dict) -> dict:
+        action_type = request.get("action_type")
+        action_id = request.get("action_id")
+
+        if self.random.random() < self.error_rate:
+            return {
+                "status": "error",
+                "action_id": action_id,
+                "error": "Simulated gateway error",
+            }
+        if action_type == "echo":
+            return {
+                "status": "ok",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            }
+        if action_type == GatewayActionType.WORKLIST_CREATE:
+            return {"status": "created", "action_id": action_id}
+        return {
+            "status": "error",
+            "action_id": action_id,
+            "error": f"Unknown action type {action_type}",
+        }
+
+
+def add_fake_relay_arguments(parser):
+    """Add options for the fake relay's behaviour to a management command."""
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds the gateway takes to answer each message",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="Up to this many seconds are added to the latency at random",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Share of messages answered with an error, from 0 to 1",
+    )
+    parser.add_argument(
+        "--drop-rate",
+        type=float,
+        default=0.0,
+        help="Share of messages never answered, from 0 to 1",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+
+
+def fake_relay_from_options(options, shared_access_key=None) -> FakeRelay:
+    return FakeRelay(
+        latency=options["latency"],
+        jitter=options["jitter"],
+        error_rate=options["error_rate"],
+        drop_rate=options["drop_rate"],
+        shared_access_key=shared_access_key,
+        seed=options["seed"],
+    )
@@ -0,0 +1,94 @@
+import timeit
+import uuid
+from datetime import date
+
+from django.conf import settings
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+
+from manage_breast_screening.core.services.auditor import make_snapshot
+from manage_breast_screening.participants.models import (
+    Participant,
+    ParticipantAddress,
+)
+
+
+def serializer_snapshot(obj):
+    """Snapshot an object with the python serializer, as the auditor used to."""
+    fields = [
+        field.name
+        for field in obj._meta.fields
+        if field.name not in settings.AUDIT_EXCLUDED_FIELDS
+    ]
+    return serializers.serialize("python", [obj], fields=fields)[0]["fields"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the time taken to snapshot objects for the audit log with the "
+        "python serializer and with the auditor's compiled snapshots. Nothing "
+        "is written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--objects", type=int, default=2000, help="Number of objects to snapshot"
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of timings to take the best of",
+        )
+
+    def handle(self, *args, **options):
+        objects = self.build_objects(options["objects"])
+
+        for obj in objects[:2]:
+            if make_snapshot(obj) != serializer_snapshot(obj):
+                raise CommandError(f"Snapshots differ for {type(obj).__name__}")
+
+        timings = {}
+        for name, snapshot in [
+            ("serializer", serializer_snapshot),
+            ("compiled", make_snapshot),
+        ]:
+            timings[name] = min(
+                timeit.repeat(
+                    lambda: [snapshot(obj) for obj in objects],
+                    number=1,
+                    repeat=options["repeat"],
+                )
+            )
+            self.stdout.write(
+                f"{name}: {timings[name] * 1_000_000 / len(objects):.1f}µs per object"
+            )
+
+        self.stdout.write(
+            f"Speed-up: {timings['serializer'] / timings['compiled']:.1f}x "
+            f"over {len(objects)} objects"
+        )
+
+    def build_objects(self, count):
+        objects = []
+        for index in range(count // 2):
+            participant = Participant(
+                id=uuid.uuid4(),
+                first_name="Janet",
+                last_name=f"Williams{index}",
+                gender="Female",
+                nhs_number=f"999{index:07d}",
+                phone="07700900829",
+                email="janet.williams@example.com",
+                date_of_birth=date(1959, 7, 22),
+                risk_level="Routine",
+                extra_needs={},
+            )
+            address = ParticipantAddress(
+                id=uuid.uuid4(),
+                participant=participant,
+                lines=["123 Generic Street", "Townsville"],
+                postcode="SW1A 1AA",
+            )
+            objects.extend([participant, address])
+        return objects
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import secrets
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from manage_breast_screening.gateway.models import (
+    GatewayAction,
+    GatewayActionStatus,
+    GatewayActionType,
+    Relay,
+)
+from manage_breast_screening.gateway.relay_client import background_loop
+from manage_breast_screening.gateway.relay_sender import RELAY_CONCURRENCY, RelaySender
+from manage_breast_screening.nonprod.fake_relay import (
+    add_fake_relay_arguments,
+    fake_relay_from_options,
+)
+
+KEY_VARIABLE_NAME = "BENCHMARK_RELAY_SHARED_ACCESS_KEY"
+
+
+class Command(BaseCommand):
+    help = (
+        "Send worklist actions through a local fake relay and report throughput "
+        "and latency. Nothing is written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--actions", type=int, default=5000, help="Number of actions to send"
+        )
+        parser.add_argument(
+            "--relays", type=int, default=1, help="Number of relays to spread them over"
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=RELAY_CONCURRENCY,
+            help="Actions in flight at once to each relay",
+        )
+        add_fake_relay_arguments(parser)
+
+    def handle(self, *args, **options):
+        # Logging every action would dominate the timings, and failures are
+        # counted in the report
+        logging.getLogger("manage_breast_screening.gateway").setLevel(logging.CRITICAL)
+
+        os.environ[KEY_VARIABLE_NAME] = secrets.token_urlsafe(32)
+        fake_relay = fake_relay_from_options(
+            options, shared_access_key=os.environ[KEY_VARIABLE_NAME]
+        )
+        port = self.start_in_thread(fake_relay)
+
+        # The client pool and the sender's per-relay limits are keyed by
+        # primary key, so each relay needs its own
+        relays = [
+            Relay(
+                id=uuid.uuid4(),
+                namespace=f"127.0.0.1:{port}",
+                hybrid_connection_name=f"benchmark-{index}",
+                key_name="benchmark",
+                shared_access_key_variable_name=KEY_VARIABLE_NAME,
+            )
+            for index in range(options["relays"])
+        ]
+        to_send = [
+            (relays[index % len(relays)], self.build_action(index))
+            for index in range(options["actions"])
+        ]
+
+        sender = RelaySender(concurrency=options["concurrency"])
+        with override_settings(RELAY_URL_SCHEME="ws"):
+            started = time.perf_counter()
+            results = background_loop.run(sender.send_all(to_send))
+            elapsed = time.perf_counter() - started
+
+        self.report(results, elapsed, fake_relay.stats)
+
+    def start_in_thread(self, fake_relay) -> int:
+        """Run the fake relay on its own event loop, returning its port."""
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(fake_relay.serve())
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        return server.sockets[0].getsockname()[1]
+
+    def build_action(self, index) -> GatewayAction:
+        action_id = uuid.uuid4()
+        return GatewayAction(
+            id=action_id,
+            type=GatewayActionType.WORKLIST_CREATE,
+            accession_number=f"BENCH{index:011d}",
+            payload={
+                "schema_version": 1,
+                "action_id": str(action_id),
+                "action_type": GatewayActionType.WORKLIST_CREATE,
+                "parameters": {"worklist_item": {"accession_number": f"BENCH{index}"}},
+            },
+        )
+
+    def report(self, results, elapsed, stats):
+        statuses = Counter(result.status for result in results)
+        latencies = [
+            (result.confirmed_at - result.sent_at).total_seconds() * 1000
+            for result in results
+            if result.status == GatewayActionStatus.CONFIRMED
+        ]
+
+        self.stdout.write(f"Sent {len(results)} actions in {elapsed:.2f}s")
+        self.stdout.write(f"Throughput: {len(results) / elapsed:.0f} actions/s")
+        for status, count in sorted(statuses.items()):
+            self.stdout.write(f"  {status}: {count}")
+
+        if len(latencies) >= 2:
+            percentiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                "Latency from send to confirmation: "
+                f"p50 {percentiles[49]:.1f}ms, p95 {percentiles[94]:.1f}ms, "
+                f"p99 {percentiles[98]:.1f}ms, max {max(latencies):.1f}ms"
+            )
+
+        self.stdout.write(
+            f"Fake relay: {stats.connections} connections, "
+            f"{stats.messages} messages, {stats.errors} errors, "
+            f"{stats.dropped} dropped"
+        )
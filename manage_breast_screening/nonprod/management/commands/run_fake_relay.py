@@ -0,0 +1,39 @@
+import asyncio
+import os
+
+from django.core.management.base import BaseCommand
+
+from manage_breast_screening.nonprod.fake_relay import (
+    add_fake_relay_arguments,
+    fake_relay_from_options,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a fake Azure Relay gateway for local development. Point a Relay at "
+        "it by setting its namespace to host:port and RELAY_URL_SCHEME to ws"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+        parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+        parser.add_argument(
+            "--shared-access-key-variable-name",
+            default=None,
+            help="Only accept SAS tokens signed with the key in this ENV var",
+        )
+        add_fake_relay_arguments(parser)
+
+    def handle(self, *args, **options):
+        key_variable = options["shared_access_key_variable_name"]
+        relay = fake_relay_from_options(
+            options,
+            shared_access_key=os.environ[key_variable] if key_variable else None,
+        )
+        asyncio.run(self.serve(relay, options["host"], options["port"]))
+
+    async def serve(self, relay, host, port):
+        server = await relay.serve(host, port)
+        self.stdout.write(f"Fake relay listening on {host}:{port}")
+        await server.serve_forever()
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import pytest
+
+from manage_breast_screening.gateway import relay_service
+from manage_breast_screening.gateway.models import GatewayActionStatus
+from manage_breast_screening.gateway.relay_client import relay_clients
+from manage_breast_screening.gateway.relay_service import RelayService
+from manage_breast_screening.gateway.tests.factories import (
+    GatewayActionFactory,
+    RelayFactory,
+)
+from manage_breast_screening.nonprod.fake_relay import FakeRelay
+
+
+@pytest.mark.asyncio
+class TestFakeRelay:
+    @pytest.fixture(autouse=True)
+    def plain_websockets(self, settings):
+        settings.RELAY_URL_SCHEME = "ws"
+
+    @pytest.fixture
+    def shared_access_key(self, monkeypatch):
+        monkeypatch.setenv("FAKE_RELAY_KEY", "secret")
+        return "secret"
+
+    async def send(self, fake_relay, shared_access_key_variable_name="FAKE_RELAY_KEY"):
+        server = await fake_relay.serve()
+        port = server.sockets[0].getsockname()[1]
+        relay = RelayFactory.build(
+            namespace=f"127.0.0.1:{port}",
+            shared_access_key_variable_name=shared_access_key_variable_name,
+        )
+        action = GatewayActionFactory.build(
+            payload={"action_type": "worklist.create_item"}
+        )
+        action.payload["action_id"] = str(action.id)
+        try:
+            return await RelayService().async_send_action(relay, action)
+        finally:
+            await relay_clients().close()
+            server.close()
+            await server.wait_closed()
+
+    async def test_confirms_worklist_actions(self, shared_access_key):
+        fake_relay = FakeRelay(shared_access_key=shared_access_key)
+
+        result = await self.send(fake_relay)
+
+        assert result.status == GatewayActionStatus.CONFIRMED
+        assert fake_relay.stats.connections == 1
+        assert fake_relay.stats.messages == 1
+
+    async def test_rejects_tokens_signed_with_another_key(self, monkeypatch):
+        monkeypatch.setenv("WRONG_KEY", "not the secret")
+        fake_relay = FakeRelay(shared_access_key="secret")
+
+        result = await self.send(fake_relay, "WRONG_KEY")
+
+        assert result.status == GatewayActionStatus.FAILED
+        assert fake_relay.stats.rejected_connections == 1
+
+    async def test_simulates_errors(self, shared_access_key):
+        fake_relay = FakeRelay(shared_access_key=shared_access_key, error_rate=1)
+
+        result = await self.send(fake_relay)
+
+        assert result.status == GatewayActionStatus.FAILED
+        assert "Simulated gateway error" in result.error
+
+    async def test_simulates_dropped_messages(self, shared_access_key):
+        fake_relay = FakeRelay(shared_access_key=shared_access_key, drop_rate=1)
+
+        with patch.object(relay_service, "RECEIVE_TIMEOUT_SECONDS", 0.05):
+            result = await self.send(fake_relay)
+
+        assert result.status == GatewayActionStatus.FAILED
+        assert "Timeout" in result.error
+        assert fake_relay.stats.dropped == 1
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from manage_breast_screening.participants.models import Appointment
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that each appointment's current status fields match its most "
+        "recent status, optionally correcting those that don't"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Copy the most recent status to the appointments that don't match",
+        )
+
+    def handle(self, *args, **options):
+        appointments = Appointment.objects.with_inconsistent_current_status()
+
+        count = 0
+        for appointment in appointments.only("pk").iterator():
+            count += 1
+            self.stdout.write(f"Appointment {appointment.pk} is inconsistent")
+            if options["fix"]:
+                with transaction.atomic():
+                    Appointment.objects.select_for_update().get(
+                        pk=appointment.pk
+                    ).update_current_status()
+
+        if options["fix"]:
+            self.stdout.write(f"Fixed {count} appointments")
+        elif count:
+            raise CommandError(
+                f"{count} appointments have an inconsistent current status"
+            )
@@ -93,7 +93,7 @@ class Migration(migrations.Migration):
     dependencies = [
         ('clinics', '0001_squashed_0021_alter_clinicstatus_options'),
         ('contenttypes', '__latest__'),
-        ('core', '__latest__'),
+        ('core', '0006_add_roles'),
         ('users', '__latest__'),
         migrations.swappable_dependency(settings.AUTH_USER_MODEL),
     ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.3 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copy_most_recent_status(apps, schema_editor):
+    Appointment = apps.get_model("participants", "Appointment")
+    AppointmentStatus = apps.get_model("participants", "AppointmentStatus")
+
+    most_recent_status = AppointmentStatus.objects.filter(
+        appointment=OuterRef("pk")
+    ).order_by("-created_at")[:1]
+    Appointment.objects.update(
+        current_status_name=Coalesce(
+            Subquery(most_recent_status.values("name")), Value("SCHEDULED")
+        ),
+        current_status_at=Subquery(most_recent_status.values("created_at")),
+        current_status_by=Subquery(most_recent_status.values("created_by")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinics', '0001_squashed_0021_alter_clinicstatus_options'),
+        ('participants', '0001_squashed_0067_participantreportedmammogram_created_by_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='current_status_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='current_status_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='current_status_name',
+            field=models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('CHECKED_IN', 'Checked in'), ('IN_PROGRESS', 'In progress'), ('CANCELLED', 'Cancelled'), ('DID_NOT_ATTEND', 'Did not attend'), ('SCREENED', 'Screened'), ('PARTIALLY_SCREENED', 'Partially screened'), ('ATTENDED_NOT_SCREENED', 'Attended not screened'), ('PAUSED', 'Paused')], default='SCHEDULED', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['clinic_slot', 'current_status_name'], name='participant_clinic__9505cd_idx'),
+        ),
+        migrations.RunPython(copy_most_recent_status, migrations.RunPython.noop),
+    ]
@@ -2,8 +2,9 @@ import uuid
 from datetime import date
 from logging import getLogger
 
-from django.db import models
-from django.db.models import OuterRef, Prefetch, Subquery
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from statemachine import Event, StateMachine
 from statemachine.states import States
 
@@ -16,25 +17,46 @@ from .screening_episode import ScreeningEpisode
 logger = getLogger(__name__)
 
 
+CURRENT_STATUS_FIELDS = [
+    "current_status_name",
+    "current_status_at",
+    "current_status_by",
+]
+
+
 class ActionPerformedByDifferentUser(Exception):
     """
     The action has already been performed, but by a different user.
     """
 
 
+class AppointmentStatusNames(models.TextChoices):
+    SCHEDULED = "SCHEDULED", "Scheduled"
+    CHECKED_IN = "CHECKED_IN", "Checked in"
+    IN_PROGRESS = "IN_PROGRESS", "In progress"
+    CANCELLED = "CANCELLED", "Cancelled"
+    DID_NOT_ATTEND = "DID_NOT_ATTEND", "Did not attend"
+    SCREENED = "SCREENED", "Screened"
+    PARTIALLY_SCREENED = "PARTIALLY_SCREENED", "Partially screened"
+    ATTENDED_NOT_SCREENED = "ATTENDED_NOT_SCREENED", "Attended not screened"
+    PAUSED = "PAUSED", "Paused"
+
+
+def _differs(field, other):
+    """
+    Match rows where two nullable values differ, treating nulls as equal.
+    """
+    return (
+        Q(**{f"{field}__isnull": False, f"{other}__isnull": False})
+        & ~Q(**{field: F(other)})
+        | Q(**{f"{field}__isnull": True, f"{other}__isnull": False})
+        | Q(**{f"{field}__isnull": False, f"{other}__isnull": True})
+    )
+
+
 class AppointmentQuerySet(models.QuerySet):
     def in_status(self, *statuses):
-        # Get the most recent status name for each appointment
-        most_recent_status = (
-            AppointmentStatus.objects.filter(appointment=OuterRef("pk"))
-            .order_by("-created_at")
-            .values("name")[:1]
-        )
-
-        # Filter appointments where the most recent status name is in the provided list
-        return self.annotate(current_status_name=Subquery(most_recent_status)).filter(
-            current_status_name__in=statuses
-        )
+        return self.filter(current_status_name__in=statuses)
 
     def remaining(self):
         return self.in_status(
@@ -82,14 +104,28 @@ class AppointmentQuerySet(models.QuerySet):
         )
 
     def prefetch_current_status(self):
-        return self.prefetch_related(
-            Prefetch(
-                "statuses",
-                queryset=AppointmentStatus.objects.select_related(
-                    "created_by"
-                ).order_by("-created_at")[:1],  # Limit to most recent
-                to_attr="_prefetched_current_status",  # Store in named attribute
-            )
+        return self.select_related("current_status_by")
+
+    def with_inconsistent_current_status(self):
+        """
+        Appointments whose current status fields don't match their most
+        recent status, e.g. because statuses were written without save().
+        """
+        most_recent_status = AppointmentStatus.objects.filter(
+            appointment=OuterRef("pk")
+        ).order_by("-created_at")[:1]
+
+        return self.annotate(
+            latest_status_name=Coalesce(
+                Subquery(most_recent_status.values("name")),
+                Value(AppointmentStatusNames.SCHEDULED),
+            ),
+            latest_status_at=Subquery(most_recent_status.values("created_at")),
+            latest_status_by=Subquery(most_recent_status.values("created_by")),
+        ).filter(
+            _differs("current_status_name", "latest_status_name")
+            | _differs("current_status_at", "latest_status_at")
+            | _differs("current_status_by", "latest_status_by")
         )
 
 
@@ -104,12 +140,35 @@ class Appointment(BaseModel):
     reinvite = models.BooleanField(default=False)
     stopped_reasons = models.JSONField(null=True, blank=True)
 
+    # Copied from the most recent status by AppointmentStatus.save(), so
+    # appointments can be filtered by status without joining the statuses
+    current_status_name = models.CharField(
+        choices=AppointmentStatusNames,
+        max_length=50,
+        default=AppointmentStatusNames.SCHEDULED,
+    )
+    current_status_at = models.DateTimeField(null=True, blank=True)
+    current_status_by = models.ForeignKey(
+        User, on_delete=models.PROTECT, null=True, blank=True, related_name="+"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["clinic_slot", "current_status_name"])]
+
     @classmethod
     def filter_counts_for_clinic(cls, clinic):
-        counts = {}
-        for filter in ["remaining", "checked_in", "in_progress", "complete", "all"]:
-            counts[filter] = clinic.appointments.for_filter(filter).count()
-        return counts
+        def count_in(*statuses):
+            return Count("pk", filter=Q(current_status_name__in=statuses))
+
+        return clinic.appointments.aggregate(
+            remaining=count_in(*AppointmentStatus.YET_TO_BEGIN_STATUSES),
+            checked_in=count_in(AppointmentStatusNames.CHECKED_IN),
+            in_progress=count_in(
+                AppointmentStatusNames.IN_PROGRESS, AppointmentStatusNames.PAUSED
+            ),
+            complete=count_in(*AppointmentStatus.FINAL_STATUSES),
+            all=Count("pk"),
+        )
 
     @property
     def provider(self):
@@ -122,37 +181,64 @@ class Appointment(BaseModel):
     @property
     def current_status(self) -> "AppointmentStatus":
         """
-        Fetch the most recent status associated with this appointment.
-        Check if a prefetched status is available, otherwise do a query.
+        The most recent status associated with this appointment, built from
+        the current status fields rather than fetched.
         If there are no statuses for any reason, assume the default one.
         """
-        prefetched_current_status = getattr(self, "_prefetched_current_status", None)
-        if prefetched_current_status:
-            return prefetched_current_status[0]
-
-        status = self.statuses.order_by("-created_at").first()
-        if status is None:
-            status = AppointmentStatus()
+        if self.current_status_at is None:
+            status = AppointmentStatus(appointment=self)
             logger.info(
                 f"Appointment {self.pk} has no statuses. Assuming {status.name}"
             )
+            return status
 
-        return status
+        return AppointmentStatus(
+            appointment=self,
+            name=self.current_status_name,
+            created_at=self.current_status_at,
+            created_by=self.current_status_by,
+        )
 
     @property
     def active(self):
         return self.current_status.active
 
     def set_status(self, status_name, created_by):
-        current_status = self.current_status
+        with transaction.atomic():
+            # Lock the appointment, so concurrent changes to its status are
+            # checked against each other's results
+            self.refresh_from_db(
+                fields=CURRENT_STATUS_FIELDS,
+                from_queryset=Appointment.objects.select_for_update(),
+            )
+            current_status = self.current_status
+
+            if status_name == current_status.name:
+                if current_status.created_by != created_by:
+                    raise ActionPerformedByDifferentUser(status_name)
+                else:
+                    return current_status
 
-        if status_name == current_status.name:
-            if current_status.created_by != created_by:
-                raise ActionPerformedByDifferentUser(status_name)
-            else:
-                return current_status
+            return self.statuses.create(name=status_name, created_by=created_by)
+
+    def update_current_status(self):
+        """
+        Copy the most recent status to the current status fields.
+        """
+        status = (
+            self.statuses.select_related("created_by").order_by("-created_at").first()
+        )
+        if status is None:
+            status = AppointmentStatus()
 
-        return self.statuses.create(name=status_name, created_by=created_by)
+        self.current_status_name = status.name
+        self.current_status_at = status.created_at
+        self.current_status_by = status.created_by
+        Appointment.objects.filter(pk=self.pk).update(
+            current_status_name=self.current_status_name,
+            current_status_at=self.current_status_at,
+            current_status_by=self.current_status_by,
+        )
 
     def series(self):
         """
@@ -186,18 +272,6 @@ class Appointment(BaseModel):
         return qs
 
 
-class AppointmentStatusNames(models.TextChoices):
-    SCHEDULED = "SCHEDULED", "Scheduled"
-    CHECKED_IN = "CHECKED_IN", "Checked in"
-    IN_PROGRESS = "IN_PROGRESS", "In progress"
-    CANCELLED = "CANCELLED", "Cancelled"
-    DID_NOT_ATTEND = "DID_NOT_ATTEND", "Did not attend"
-    SCREENED = "SCREENED", "Screened"
-    PARTIALLY_SCREENED = "PARTIALLY_SCREENED", "Partially screened"
-    ATTENDED_NOT_SCREENED = "ATTENDED_NOT_SCREENED", "Attended not screened"
-    PAUSED = "PAUSED", "Paused"
-
-
 class AppointmentStatus(models.Model):
     YET_TO_BEGIN_STATUSES = [
         AppointmentStatusNames.SCHEDULED,
@@ -247,6 +321,11 @@ class AppointmentStatus(models.Model):
     def is_final_status(self):
         return self.name in self.FINAL_STATUSES
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.appointment.update_current_status()
+
     def __str__(self):
         return self.name
 
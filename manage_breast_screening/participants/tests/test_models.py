@@ -1,7 +1,9 @@
 from datetime import datetime
 from datetime import timezone as tz
+from io import StringIO
 
 import pytest
+from django.core.management import CommandError, call_command
 from pytest_django.asserts import assertQuerySetEqual
 
 from manage_breast_screening.clinics.tests.factories import (
@@ -14,6 +16,7 @@ from manage_breast_screening.participants.models.appointment import (
 from manage_breast_screening.participants.models.medical_history.implanted_medical_device_history_item import (
     ImplantedMedicalDeviceHistoryItem,
 )
+from manage_breast_screening.users.tests.factories import UserFactory
 
 from .. import models
 from ..models import AppointmentStatus
@@ -229,7 +232,7 @@ class TestAppointment:
             ordered=False,
         )
 
-    def test_filter_counts_for_clinic(self):
+    def test_filter_counts_for_clinic(self, django_assert_num_queries):
         # Create a clinic and clinic slots
         clinic = ClinicFactory.create()
         clinic_slot1 = ClinicSlotFactory.create(clinic=clinic)
@@ -259,7 +262,8 @@ class TestAppointment:
             clinic_slot=other_slot, current_status=AppointmentStatusNames.SCHEDULED
         )
 
-        counts = models.Appointment.filter_counts_for_clinic(clinic)
+        with django_assert_num_queries(1):
+            counts = models.Appointment.filter_counts_for_clinic(clinic)
 
         assert counts["remaining"] == 3
         assert counts["checked_in"] == 1
@@ -374,17 +378,18 @@ class TestEagerLoadCurrentStatus:
             models.Appointment.objects.prefetch_current_status().get(pk=appointment.pk)
         )
 
-        prefetched_status = appointment_with_status._prefetched_current_status[0]
-        assert prefetched_status == latest_status
         # Verify no additional queries when accessing created_by
         with django_assert_num_queries(0):
-            assert prefetched_status.created_by is not None
-            prefetched_status.created_by.nhs_uid
+            current_status = appointment_with_status.current_status
+            assert current_status.name == AppointmentStatusNames.IN_PROGRESS
+            assert current_status.created_at == latest_status.created_at
+            assert current_status.created_by == latest_status.created_by
+            current_status.created_by.nhs_uid
 
 
 @pytest.mark.django_db
 class TestCurrentStatus:
-    def test_returns_prefetched_current_status_if_available(
+    def test_returns_current_status_without_querying_statuses(
         self, django_assert_num_queries
     ):
         appointment = AppointmentFactory.create()
@@ -399,36 +404,86 @@ class TestCurrentStatus:
             created_at=datetime(2025, 1, 1, 8, tzinfo=tz.utc),
         )
 
-        fetched_appointment = (
-            models.Appointment.objects.prefetch_current_status().first()
-        )
-        with django_assert_num_queries(0):
-            fetched_appointment.current_status.created_by
-        assert fetched_appointment.current_status == latest_status
+        fetched_appointment = models.Appointment.objects.first()
+        with django_assert_num_queries(1):
+            assert (
+                fetched_appointment.current_status.created_by
+                == latest_status.created_by
+            )
+        assert fetched_appointment.current_status.name == latest_status.name
 
-    def test_returns_current_status_even_if_not_prefetched(
-        self, django_assert_num_queries
-    ):
+    def test_returns_default_status_if_no_statuses(self, django_assert_num_queries):
         appointment = AppointmentFactory.create()
-        latest_status = AppointmentStatusFactory.create(
-            appointment=appointment,
-            name=AppointmentStatusNames.IN_PROGRESS,
-            created_at=datetime(2025, 1, 1, 9, tzinfo=tz.utc),
+        assert appointment.current_status.name == AppointmentStatusNames.SCHEDULED
+
+
+@pytest.mark.django_db
+class TestSetStatus:
+    def test_updates_the_current_status_fields(self, time_machine):
+        time_machine.move_to(datetime(2025, 1, 1, 10, tzinfo=tz.utc))
+        appointment = AppointmentFactory.create()
+        user = UserFactory.create()
+
+        status = appointment.set_status(AppointmentStatusNames.CHECKED_IN, user)
+
+        for instance in [appointment, models.Appointment.objects.get()]:
+            assert instance.current_status_name == AppointmentStatusNames.CHECKED_IN
+            assert instance.current_status_at == status.created_at
+            assert instance.current_status_by == user
+
+    def test_checks_the_status_saved_by_other_instances(self):
+        appointment = AppointmentFactory.create()
+        user = UserFactory.create()
+        models.Appointment.objects.get().set_status(
+            AppointmentStatusNames.CHECKED_IN, user
         )
-        AppointmentStatusFactory.create(
-            appointment=appointment,
-            name=AppointmentStatusNames.CHECKED_IN,
-            created_at=datetime(2025, 1, 1, 8, tzinfo=tz.utc),
+
+        with pytest.raises(models.appointment.ActionPerformedByDifferentUser):
+            appointment.set_status(
+                AppointmentStatusNames.CHECKED_IN, UserFactory.create()
+            )
+
+        assert appointment.statuses.count() == 1
+
+
+@pytest.mark.django_db
+class TestCheckAppointmentStatuses:
+    @pytest.fixture
+    def inconsistent(self):
+        appointment = AppointmentFactory.create(
+            current_status=AppointmentStatusNames.CHECKED_IN
+        )
+        AppointmentStatus.objects.bulk_create(
+            [
+                AppointmentStatus(
+                    appointment=appointment,
+                    name=AppointmentStatusNames.IN_PROGRESS,
+                    created_at=datetime(2040, 1, 1, tzinfo=tz.utc),
+                )
+            ]
         )
+        return appointment
 
-        fetched_appointment = models.Appointment.objects.first()
-        with django_assert_num_queries(2):
-            fetched_appointment.current_status.created_by
-        assert fetched_appointment.current_status == latest_status
+    def test_finds_inconsistent_appointments(self, inconsistent):
+        AppointmentFactory.create()
+        AppointmentFactory.create(current_status=AppointmentStatusNames.SCREENED)
 
-    def test_returns_default_status_if_no_statuses(self, django_assert_num_queries):
-        appointment = AppointmentFactory.create()
-        assert appointment.current_status.name == AppointmentStatusNames.SCHEDULED
+        assertQuerySetEqual(
+            models.Appointment.objects.with_inconsistent_current_status(),
+            [inconsistent],
+        )
+
+    def test_fails_when_appointments_are_inconsistent(self, inconsistent):
+        with pytest.raises(CommandError):
+            call_command("check_appointment_statuses", stdout=StringIO())
+
+    def test_fixes_inconsistent_appointments(self, inconsistent):
+        call_command("check_appointment_statuses", "--fix", stdout=StringIO())
+
+        inconsistent.refresh_from_db()
+        assert inconsistent.current_status_name == AppointmentStatusNames.IN_PROGRESS
+        assert inconsistent.current_status_by is None
+        assert not models.Appointment.objects.with_inconsistent_current_status()
 
 
 class TestAppointmentStatus: